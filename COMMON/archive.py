@@ -0,0 +1,268 @@
+"""
+Lotes de extratos em ZIP: cada PDF do arquivo vai direto para o extrator.
+
+Um contador envia um ano de extratos de uma vez num .zip. Os membros não são
+descompactados em disco: cada PDF é lido para a memória (com limite de
+tamanho) e entregue ao extrator como arquivo binário (`BytesIO`, aceito por
+`extract_rows`), com o resultado reportado por membro (`lote.zip/jan.pdf`).
+
+Proteções contra ZIP malicioso ou grande demais:
+
+- pelo diretório central, antes de ler qualquer membro: no máximo
+  `max_members` PDFs, `max_total_size` bytes descompactados no total e taxa
+  de compressão de até `max_ratio` (PDF já é comprimido; 1000:1 é bomba);
+- durante a leitura, de novo, porque o tamanho declarado pode mentir: cada
+  membro é lido em blocos e cortado em `max_member_size` ou no tamanho
+  declarado, o que vier primeiro.
+
+Pastas, `__MACOSX/` e arquivos ocultos são ignorados; outros arquivos que
+não são PDF voltam como formato inválido, sem derrubar o lote.
+"""
+from __future__ import annotations
+
+import io
+import os
+import sys
+import zipfile
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BASE_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.extraction import ExtractionError, extract_rows
+
+# A taxa de compressão só é conferida a partir deste tamanho (arquivos
+# pequenos de texto comprimem muito sem serem bombas)
+RATIO_MIN_SIZE = 1024 * 1024
+_READ_CHUNK = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class ArchiveLimits:
+    max_members: int = 100
+    max_member_size: int = 50 * 1024 * 1024
+    max_total_size: int = 200 * 1024 * 1024
+    max_ratio: float = 100.0
+
+
+DEFAULT_LIMITS = ArchiveLimits()
+
+
+class ArchiveError(ExtractionError):
+    """ZIP recusado por inteiro: inválido ou acima dos limites."""
+
+
+@dataclass
+class ArchiveMember:
+    """Um arquivo do ZIP: os bytes do PDF ou o erro que impediu a leitura."""
+    name: str
+    data: Optional[bytes] = None
+    error: Optional[Dict[str, str]] = None
+
+    def open(self) -> io.BytesIO:
+        stream = io.BytesIO(self.data or b'')
+        stream.name = self.name
+        return stream
+
+
+def is_archive(filename: str) -> bool:
+    return os.path.splitext(filename.lower())[1] == '.zip'
+
+
+def _ignored(name: str) -> bool:
+    parts = name.replace('\\', '/').split('/')
+    return parts[0] == '__MACOSX' or any(part.startswith('.') for part in parts if part)
+
+
+def _read_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo, limit: int) -> bytes:
+    """Lê o membro em blocos; nunca descompacta mais que `limit` + 1 bytes."""
+    buf = bytearray()
+    with zf.open(info) as f:
+        while True:
+            chunk = f.read(min(_READ_CHUNK, limit + 1 - len(buf)))
+            if not chunk:
+                return bytes(buf)
+            buf += chunk
+            if len(buf) > limit:
+                raise ArchiveError('zip_member_too_large',
+                                   f'{info.filename}: conteúdo maior que o declarado ou que o limite.')
+
+
+def _open_checked(source: Union[str, BinaryIO], limits: ArchiveLimits) -> Tuple[zipfile.ZipFile, List[zipfile.ZipInfo]]:
+    """Abre o ZIP e confere o diretório central; devolve o ZIP e os membros que contam."""
+    try:
+        zf = zipfile.ZipFile(source)
+    except (zipfile.BadZipFile, OSError) as exc:
+        raise ArchiveError('zip_invalid', f'ZIP inválido: {exc}') from exc
+
+    try:
+        infos = [i for i in zf.infolist() if not i.is_dir() and not _ignored(i.filename)]
+        if len(infos) > limits.max_members:
+            raise ArchiveError('zip_too_many_members',
+                               f'O ZIP tem {len(infos)} arquivos; o limite é {limits.max_members}.')
+        declared = sum(i.file_size for i in infos)
+        if declared > limits.max_total_size:
+            raise ArchiveError('zip_too_large',
+                               f'O ZIP descompactado tem {declared // (1024 * 1024)} MB; '
+                               f'o limite é {limits.max_total_size // (1024 * 1024)} MB.')
+        for info in infos:
+            if info.file_size >= RATIO_MIN_SIZE and info.file_size > info.compress_size * limits.max_ratio:
+                raise ArchiveError('zip_bomb', f'{info.filename}: taxa de compressão suspeita.')
+    except ArchiveError:
+        zf.close()
+        raise
+    return zf, infos
+
+
+def _member_error(info: zipfile.ZipInfo, limits: ArchiveLimits) -> Optional[Dict[str, str]]:
+    """Erro do membro que já aparece no diretório central (sem descompactar)."""
+    if os.path.splitext(info.filename.lower())[1] != '.pdf':
+        return {'code': 'invalid_format', 'message': 'Envie apenas arquivos .pdf'}
+    if info.flag_bits & 0x1:
+        return {'code': 'zip_encrypted', 'message': 'Arquivo protegido por senha.'}
+    if info.file_size > limits.max_member_size:
+        return {'code': 'zip_member_too_large',
+                'message': f'Maior que o limite de {limits.max_member_size // (1024 * 1024)} MB.'}
+    return None
+
+
+def scan_members(source: Union[str, BinaryIO], limits: ArchiveLimits = DEFAULT_LIMITS) -> List[Tuple[str, Optional[int]]]:
+    """
+    (nome, tamanho descompactado declarado) de cada membro que `iter_members`
+    vai devolver, só pelo diretório central: nenhum membro é descompactado.
+    O tamanho é None nos membros que voltam com erro (não PDF, protegido,
+    grande demais).
+
+    Raises:
+        ArchiveError: como em `iter_members`.
+    """
+    zf, infos = _open_checked(source, limits)
+    with zf:
+        return [(info.filename, None if _member_error(info, limits) else info.file_size) for info in infos]
+
+
+def iter_members(source: Union[str, BinaryIO], limits: ArchiveLimits = DEFAULT_LIMITS) -> Iterator[ArchiveMember]:
+    """
+    Membros do ZIP na ordem do arquivo, lidos um a um sob demanda.
+
+    Raises:
+        ArchiveError: ZIP inválido, com PDFs demais, grande demais ou com
+            taxa de compressão suspeita (levantado antes do primeiro membro).
+    """
+    zf, infos = _open_checked(source, limits)
+    with zf:
+        for info in infos:
+            name = info.filename
+            error = _member_error(info, limits)
+            if error:
+                yield ArchiveMember(name, error=error)
+                continue
+            try:
+                data = _read_member(zf, info, min(info.file_size, limits.max_member_size))
+            except ArchiveError as exc:
+                yield ArchiveMember(name, error=exc.to_dict())
+                continue
+            except (zipfile.BadZipFile, OSError, EOFError, NotImplementedError) as exc:
+                yield ArchiveMember(name, error={'code': 'zip_invalid', 'message': f'Membro ilegível: {exc}'})
+                continue
+            yield ArchiveMember(name, data=data)
+
+
+def ordered_map(fn: Callable[[Any], Any], items: Iterable[Any], workers: int = 1,
+                executor: Optional[Executor] = None) -> Iterator[Tuple[Any, Any]]:
+    """
+    Aplica `fn` aos itens em paralelo e devolve (item, resultado) na ordem de entrada.
+
+    No máximo `2 x workers` itens ficam em andamento, então `items` pode ser
+    um gerador (membros de ZIP lidos sob demanda) sem carregar tudo na
+    memória. Com `workers` <= 1 e sem `executor`, roda na thread atual.
+    Exceções de `fn` sobem no item em que ocorreram.
+    """
+    if executor is None and workers <= 1:
+        for item in items:
+            yield item, fn(item)
+        return
+
+    own = executor is None
+    if own:
+        executor = ThreadPoolExecutor(max_workers=workers)
+    window = 2 * max(1, workers)
+    pending: Deque[Tuple[Any, Any]] = deque()
+    try:
+        for item in items:
+            pending.append((item, executor.submit(fn, item)))
+            if len(pending) >= window:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+        if own:
+            executor.shutdown(wait=True)
+
+
+def expand_paths(paths: Iterable[str], limits: ArchiveLimits = DEFAULT_LIMITS
+                 ) -> Iterator[Tuple[str, Union[str, BinaryIO, None], Optional[Dict[str, str]]]]:
+    """
+    (nome, PDF, erro) de cada caminho, com cada ZIP aberto em um item por
+    membro (`lote.zip/jan.pdf`, PDF em memória). Em erro, o PDF é None.
+    """
+    for path in paths:
+        if not is_archive(path):
+            yield path, path, None
+            continue
+        try:
+            for member in iter_members(path, limits):
+                name = f'{path}/{member.name}'
+                if member.error:
+                    yield name, None, member.error
+                else:
+                    yield name, member.open(), None
+        except ArchiveError as exc:
+            yield path, None, exc.to_dict()
+
+
+def _extract_job(bank: str, source: Union[str, BinaryIO], options: Dict[str, Any]) -> Tuple[str, Any]:
+    """Roda no processo de extração; devolve ('ok', linhas) ou ('error', {code, message})."""
+    try:
+        rows, _ = extract_rows(bank, source, **options)
+    except ExtractionError as exc:
+        return 'error', exc.to_dict()
+    return 'ok', rows
+
+
+def _run_item(job: Tuple[str, str, Union[str, BinaryIO, None], Optional[Dict[str, str]], Dict[str, Any]]):
+    bank, _, source, error, options = job
+    if error:
+        return 'error', error
+    return _extract_job(bank, source, options)
+
+
+def extract_paths(bank: str, paths: Iterable[str], workers: int = 1, limits: ArchiveLimits = DEFAULT_LIMITS,
+                  **options) -> Iterator[Tuple[str, Union[str, BinaryIO, None], str, Any]]:
+    """
+    Extrai PDFs e ZIPs de PDFs para as ferramentas de linha de comando.
+
+    Com `workers` > 1 os arquivos rodam num pool de processos, no máximo
+    `2 x workers` em andamento. `options` vão para `extract_rows`.
+
+    Yields:
+        (nome, PDF, 'ok', linhas) ou (nome, PDF, 'error', {code, message}),
+        na ordem dos caminhos e dos membros de cada ZIP.
+    """
+    jobs = ((bank, name, source, error, options) for name, source, error in expand_paths(paths, limits))
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for (_, name, source, _, _), (status, result) in ordered_map(_run_item, jobs, workers, executor):
+            yield name, source, status, result
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
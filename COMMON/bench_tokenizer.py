@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: linhas/s do tokenizador compartilhado contra o parsing antigo.
+
+As funções `legacy_*` reproduzem o caminho por linha que os extratores usavam
+antes do tokenizador (várias buscas por regex, `re.escape` por linha e as
+substituições que limpavam a descrição), para comparação direta.
+
+Uso:
+    python COMMON/bench_tokenizer.py [--lines 200000]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from decimal import Decimal
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BASE_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.tokenizer import LineTokenizer
+from ITAU.itau_extractor import ItauExtractParser
+from SANTANDER.income_extractor import TOKENIZER as SANTANDER_TOKENIZER, is_incoming
+
+ITAU_DATE = re.compile(r'(\d{2}/\d{2}/(?:\d{4}|\d{2}))')
+ITAU_AMOUNT = re.compile(r'(\d{1,3}(?:\.\d{3})*,\d{2})')
+SANTANDER_AMOUNT = re.compile(r"(\d{1,3}(?:\.\d{3})*,\d{2})")
+SANTANDER_DATE = re.compile(r"\b(\d{2}/\d{2}/(?:\d{2,4}))\b")
+
+
+def legacy_itau(line: str):
+    collapsed = ' '.join(line.strip().split())
+    upper = collapsed.upper()
+    if collapsed.startswith('-') or '-R$' in collapsed:
+        return None
+    if not any(t in upper for t in ItauExtractParser.CREDIT_TYPES):
+        return None
+    date_match = ITAU_DATE.search(line)
+    amount_match = ITAU_AMOUNT.search(line)
+    if not date_match or not amount_match:
+        return None
+    amount = Decimal(amount_match.group(1).replace('.', '').replace(',', '.'))
+    if re.search(r'[-−]\s*' + re.escape(amount_match.group(1)), line):
+        return None
+    desc = ITAU_AMOUNT.sub('', line)
+    desc = ITAU_DATE.sub('', desc)
+    desc = re.sub(r'\s+', ' ', desc).strip()
+    return date_match.group(1), amount, desc
+
+
+def new_itau(parser: ItauExtractParser, line: str):
+    return parser.parse_line(line, 1)
+
+
+def legacy_santander(line: str):
+    amounts = SANTANDER_AMOUNT.findall(line)
+    if not amounts or not is_incoming(line):
+        return None
+    amount = amounts[-2] if len(amounts) >= 2 else amounts[0]
+    date_match = SANTANDER_DATE.search(line)
+    cleaned = SANTANDER_AMOUNT.sub('', line)
+    cleaned = re.sub(r"\b\d{5,}\b", '', cleaned)
+    cleaned = re.sub(r"N\s*[°º]\s*DOCUMENTO", '', cleaned, flags=re.IGNORECASE)
+    cleaned = re.sub(r"\s+", ' ', cleaned).strip(' -–—:;,.')
+    return date_match.group(1) if date_match else None, amount, cleaned
+
+
+def new_santander(tokenizer: LineTokenizer, line: str):
+    if not is_incoming(line):
+        return None
+    tokens = tokenizer.tokenize(line)
+    if not tokens.amounts:
+        return None
+    amount = tokens.amounts[-2].text if len(tokens.amounts) >= 2 else tokens.amounts[0].text
+    return tokens.find_date('/'), amount, tokens.description(keep_dates=True, strip_chars=' -–—:;,.')
+
+
+def sample_lines(n: int):
+    random.seed(42)
+    names = ['JOAO SILVA', 'MARIA SOUZA', 'EMPRESA XYZ LTDA', 'JOSE PEREIRA']
+    templates = [
+        '{d} PIX TRANSF {n} {v}',
+        '{d} TED RECEBIDA {n} {v} {s}',
+        '{d} SISPAG FORNECEDOR -{v} {s}',
+        '{d} PIX RECEBIDO {n} Nº DOCUMENTO 123456 {v} {s}',
+        'SALDO ANTERIOR {s}',
+    ]
+    lines = []
+    for _ in range(n):
+        d = f'{random.randint(1, 28):02d}/{random.randint(1, 12):02d}/2025'
+        v = f'{random.randint(1, 9)}.{random.randint(0, 999):03d},{random.randint(0, 99):02d}'
+        s = f'{random.randint(1, 99)}.{random.randint(0, 999):03d},00'
+        lines.append(random.choice(templates).format(d=d, n=random.choice(names), v=v, s=s))
+    return lines
+
+
+def _rate(func, lines) -> float:
+    start = time.perf_counter()
+    for line in lines:
+        func(line)
+    return len(lines) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara linhas/s do tokenizador com o parsing antigo')
+    parser.add_argument('--lines', type=int, default=200000)
+    args = parser.parse_args()
+
+    lines = sample_lines(args.lines)
+    itau = ItauExtractParser()
+
+    print(f'{"Caminho":<22} {"antigo (linhas/s)":>20} {"novo (linhas/s)":>20} {"ganho":>8}')
+    print('-' * 74)
+    for name, old, new in (
+        ('Itaú parse_line', legacy_itau, lambda ln: new_itau(itau, ln)),
+        ('Santander linha', legacy_santander, lambda ln: new_santander(SANTANDER_TOKENIZER, ln)),
+    ):
+        old_rate = _rate(old, lines)
+        new_rate = _rate(new, lines)
+        print(f'{name:<22} {old_rate:>20,.0f} {new_rate:>20,.0f} {new_rate / old_rate:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
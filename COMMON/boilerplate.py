@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Lista aprendida de páginas sem lançamentos (avisos legais, propaganda, glossário).
+
+Os extratos trazem páginas que são iguais em toda exportação. Cada página
+recebe uma impressão digital barata: o SHA-1 da estrutura do content stream
+cru (PyPDF2, sem montar texto) — operadores, strings e cores, com os números
+de posição (`Td`, `Tm`, `cm`, traçados) mascarados e sem a numeração de
+página e a data de emissão das strings. Datas, valores e cores dos
+lançamentos mudam a impressão (no Itaú o crédito é a linha em verde).
+Páginas cuja impressão está na lista do banco saem da extração antes de
+qualquer trabalho de layout.
+
+A lista cresce sozinha: depois de uma extração, cada página processada que
+não rendeu nenhum crédito conta como observação da sua impressão; quando a
+mesma impressão aparece sem créditos em `CONFIRM_AFTER` extratos diferentes,
+ela é confirmada. Uma impressão que já rendeu crédito nunca é confirmada (e
+sai da lista, se estava nela). Uma amostra das páginas puladas
+(`AUDIT_RATE`) é extraída mesmo assim: se render crédito, a confirmação
+estava errada e a impressão sai da lista. Páginas sem texto no content stream
+(escaneadas, ou com o texto em formulários XObject) não têm impressão: são
+todas parecidas e nunca são puladas.
+
+A lista fica em um JSON por banco na pasta configurada. Uso:
+
+    python COMMON/boilerplate.py --dir boilerplate --bank itau list
+    python COMMON/boilerplate.py --dir boilerplate --bank itau scan extrato.pdf
+    python COMMON/boilerplate.py --dir boilerplate --bank itau confirm extrato.pdf --pages 9,10
+    python COMMON/boilerplate.py --dir boilerplate --bank itau forget <impressão>
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Set, Union
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BASE_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.prefilter import RawPdf, open_raw
+
+# Extratos diferentes em que a página precisa aparecer sem créditos para ser confirmada
+CONFIRM_AFTER = 3
+# Observações guardadas por impressão ainda não confirmada, e impressões em observação
+# (páginas só de débitos também são observadas e quase nunca se repetem)
+MAX_OBSERVATIONS = 10
+MAX_OBSERVED = 2000
+# Fração das páginas puladas que passa pela extração mesmo assim, para
+# conferir a confirmação (página que render crédito sai da lista)
+AUDIT_RATE = 0.1
+# Bancos cujas linhas trazem a página de origem (o Nubank não traz: sem aprendizado)
+BOILERPLATE_BANKS = ('itau', 'itau_new', 'santander', 'picpay', 'mercadopago')
+
+_DIGITS = b'0123456789'
+
+# Tokens do content stream: strings literais (um nível de parênteses aninhados),
+# strings hexadecimais, nomes, números, delimitadores e operadores
+_TOKEN = re.compile(rb"""
+    \((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\)
+  | <<|>>|<[0-9A-Fa-f\s]*>
+  | /[^\s/\[\]()<>{}%]*
+  | [+-]?(?:\d+\.?\d*|\.\d+)
+  | [\[\]]
+  | [A-Za-z'"][A-Za-z0-9*]*
+""", re.VERBOSE | re.DOTALL)
+_NUMBER = re.compile(rb'[+-]?(?:\d+\.?\d*|\.\d+)$')
+# Operadores cujos números são só posição (texto, matriz, traçado); os
+# números de cor (rg, RG, k, sc...) e de fonte continuam na impressão
+POSITION_OPERATORS = {b'Td', b'TD', b'Tm', b'cm', b'TJ', b'm', b'l', b'c', b'v', b'y', b're'}
+# Texto que muda a cada exportação de uma mesma página: numeração e data de emissão
+_VOLATILE_TEXT = re.compile(rb'(?i)p\S{1,4}g(?:ina)?\.?\s*\d+(?:\s*(?:de|/)\s*\d+)?'
+                            rb'|(?:emitido|gerado|impresso)\s+em\s*:?[\s\d/.:]*')
+
+
+def _mask_volatile(match) -> bytes:
+    return match.group().translate(None, _DIGITS)
+
+
+def structure(data: bytes) -> bytes:
+    """
+    Estrutura de um content stream: operadores, strings, nomes e números, com
+    os números de posição trocados por "#" e a numeração de página e a data
+    de emissão tiradas das strings. Cor, fonte e o texto (datas e valores dos
+    lançamentos inclusive) continuam.
+    """
+    out: List[bytes] = []
+    operands: List[bytes] = []
+    for token in _TOKEN.findall(data):
+        if token[:1] == b'(':
+            operands.append(_VOLATILE_TEXT.sub(_mask_volatile, token))
+        elif _NUMBER.match(token) or token in (b'[', b']') or token[:1] in b'/<':
+            operands.append(token)
+        else:
+            if token in POSITION_OPERATORS:
+                operands = [b'#' if _NUMBER.match(t) else t for t in operands]
+            out.extend(operands)
+            out.append(token)
+            operands = []
+    out.extend(operands)
+    return b' '.join(out)
+
+
+def page_fingerprint(page) -> Optional[str]:
+    """Impressão digital da página (PyPDF2), ou None se o content stream não tem texto."""
+    contents = page.get_contents()
+    if contents is None:
+        return None
+    data = contents.get_data()
+    if b'BT' not in data:
+        return None
+    return hashlib.sha1(structure(data)).hexdigest()[:20]
+
+
+def fingerprint_pages(filepath: Union[str, BinaryIO],
+                      raw: Optional[RawPdf] = None) -> Optional[List[Optional[str]]]:
+    """
+    Impressão de cada página, na ordem; None se o PyPDF2 não abriu o arquivo.
+
+    `raw` é o arquivo já aberto pelo chamador (`COMMON.prefilter.RawPdf`):
+    as páginas do pré-filtro são reaproveitadas, sem nova análise do PDF.
+    """
+    raw = open_raw(filepath, raw)
+    if raw is None:
+        return None
+    fingerprints = []
+    for page_num in range(1, raw.count + 1):
+        try:
+            fingerprints.append(page_fingerprint(raw.page(page_num)))
+        except Exception:
+            fingerprints.append(None)
+    return fingerprints
+
+
+def audit_sample(pages: Iterable[int], rate: float = AUDIT_RATE) -> Set[int]:
+    """Amostra aleatória das páginas puladas que é extraída de novo."""
+    return {page for page in pages if random.random() < rate}
+
+
+def document_id(fingerprints: List[Optional[str]]) -> str:
+    """Identidade do extrato para contar extratos diferentes (sem reler o arquivo)."""
+    return hashlib.sha1('|'.join(fp or '-' for fp in fingerprints).encode()).hexdigest()[:16]
+
+
+class SkipList:
+    """
+    Impressões de páginas sem lançamentos de um banco, persistidas em JSON.
+
+    Formato: {"confirmed": {impressão: {...}}, "observed": {impressão: [documentos]},
+    "productive": [impressões que já renderam crédito]}.
+    """
+
+    def __init__(self, path: str, confirm_after: int = CONFIRM_AFTER):
+        self.path = path
+        self.confirm_after = confirm_after
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self.confirmed: Dict[str, Dict[str, Any]] = {}
+        self.observed: Dict[str, List[str]] = {}
+        self.productive: Set[str] = set()
+        self._reload()
+
+    def _reload(self) -> None:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._mtime = mtime
+        self.confirmed = data.get('confirmed', {})
+        self.observed = data.get('observed', {})
+        self.productive = set(data.get('productive', []))
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        data = {'confirmed': self.confirmed, 'observed': self.observed, 'productive': sorted(self.productive)}
+        # Troca atômica: leitores em outros processos nunca veem o arquivo pela metade
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def skip_pages(self, fingerprints: List[Optional[str]]) -> Set[int]:
+        """Páginas (a partir de 1) cuja impressão está confirmada."""
+        with self._lock:
+            self._reload()
+            return {i for i, fp in enumerate(fingerprints, 1) if fp and fp in self.confirmed}
+
+    def learn(self, fingerprints: List[Optional[str]], processed: Iterable[int],
+              productive_pages: Iterable[int]) -> List[str]:
+        """
+        Registra o resultado de uma extração e devolve as impressões confirmadas agora.
+
+        Args:
+            fingerprints: Impressões de todas as páginas do extrato.
+            processed: Páginas que passaram pela extração completa.
+            productive_pages: Páginas que renderam pelo menos um crédito.
+        """
+        productive_pages = set(productive_pages)
+        doc = document_id(fingerprints)
+        newly_confirmed = []
+        with self._lock:
+            self._reload()
+            changed = False
+            for page in processed:
+                fp = fingerprints[page - 1] if 0 < page <= len(fingerprints) else None
+                if not fp:
+                    continue
+                if page in productive_pages:
+                    # Só interessa guardar impressões que já estavam na lista
+                    # (páginas de lançamentos quase nunca se repetem)
+                    if fp in self.observed or fp in self.confirmed:
+                        self.productive.add(fp)
+                        self.observed.pop(fp, None)
+                        self.confirmed.pop(fp, None)
+                        changed = True
+                    continue
+                if fp in self.productive or fp in self.confirmed:
+                    continue
+                docs = self.observed.setdefault(fp, [])
+                if doc in docs:
+                    continue
+                docs.append(doc)
+                del docs[:-MAX_OBSERVATIONS]
+                changed = True
+                if len(self.observed) > MAX_OBSERVED:
+                    del self.observed[next(iter(self.observed))]
+                if len(docs) >= self.confirm_after:
+                    self._confirm(fp, 'auto', len(docs))
+                    newly_confirmed.append(fp)
+            if changed:
+                self._save()
+        return newly_confirmed
+
+    def _confirm(self, fp: str, source: str, documents: int = 0) -> None:
+        self.observed.pop(fp, None)
+        self.confirmed[fp] = {'source': source, 'documents': documents,
+                              'confirmed_at': datetime.now().isoformat(timespec='seconds')}
+
+    def confirm(self, fingerprints: Iterable[str]) -> None:
+        """Confirma impressões à mão (ex.: páginas conferidas com `scan`)."""
+        with self._lock:
+            self._reload()
+            for fp in fingerprints:
+                self.productive.discard(fp)
+                self._confirm(fp, 'manual')
+            self._save()
+
+    def forget(self, fp: str) -> bool:
+        with self._lock:
+            self._reload()
+            found = self.confirmed.pop(fp, None) is not None or self.observed.pop(fp, None) is not None
+            if found:
+                self._save()
+            return found
+
+
+_lists: Dict[str, SkipList] = {}
+_lists_lock = threading.Lock()
+
+
+def get_skiplist(directory: Optional[str], bank: str) -> Optional[SkipList]:
+    """Lista do banco na pasta (uma instância por processo), ou None sem pasta ou para banco sem suporte."""
+    if not directory or bank not in BOILERPLATE_BANKS:
+        return None
+    path = os.path.join(directory, f'{bank}.json')
+    with _lists_lock:
+        if path not in _lists:
+            _lists[path] = SkipList(path)
+        return _lists[path]
+
+
+def main():
+    from COMMON.extraction import ExtractionError, extract_rows
+
+    parser = argparse.ArgumentParser(description='Páginas sem lançamentos aprendidas por banco')
+    parser.add_argument('--dir', required=True, help='Pasta das listas (um JSON por banco)')
+    parser.add_argument('--bank', '-b', required=True, choices=BOILERPLATE_BANKS)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='Impressões confirmadas e em observação')
+    p_scan = sub.add_parser('scan', help='Impressão e situação de cada página do PDF')
+    p_scan.add_argument('pdf')
+    p_scan.add_argument('--verify', action='store_true',
+                        help='Extrai o PDF inteiro e confere que nenhuma página confirmada tem créditos')
+    p_confirm = sub.add_parser('confirm', help='Confirma páginas do PDF como sem lançamentos')
+    p_confirm.add_argument('pdf')
+    p_confirm.add_argument('--pages', required=True, help='Páginas, ex.: 9,10')
+    p_forget = sub.add_parser('forget', help='Remove uma impressão da lista')
+    p_forget.add_argument('fingerprint')
+    args = parser.parse_args()
+
+    skiplist = get_skiplist(args.dir, args.bank)
+
+    if args.command == 'list':
+        print(f'{len(skiplist.confirmed)} confirmadas, {len(skiplist.observed)} em observação '
+              f'(confirma com {skiplist.confirm_after} extratos)')
+        for fp, info in sorted(skiplist.confirmed.items()):
+            print(f"  {fp}  {info.get('source')}  {info.get('confirmed_at')}")
+        for fp, docs in sorted(skiplist.observed.items()):
+            print(f'  {fp}  observada em {len(docs)}')
+        return
+
+    if args.command == 'forget':
+        print('removida' if skiplist.forget(args.fingerprint) else 'não encontrada')
+        return
+
+    fingerprints = fingerprint_pages(args.pdf)
+    if fingerprints is None:
+        print(f'{args.pdf}: não foi possível ler as páginas com o PyPDF2')
+        sys.exit(1)
+
+    if args.command == 'confirm':
+        pages = [int(p) for p in args.pages.split(',') if p.strip()]
+        chosen = [fingerprints[p - 1] for p in pages if 0 < p <= len(fingerprints) and fingerprints[p - 1]]
+        skiplist.confirm(chosen)
+        print(f'{len(chosen)} impressões confirmadas')
+        return
+
+    skipped = skiplist.skip_pages(fingerprints)
+    for page, fp in enumerate(fingerprints, 1):
+        if fp is None:
+            status = 'sem texto (nunca pulada)'
+        elif page in skipped:
+            status = 'pular'
+        elif fp in skiplist.productive:
+            status = 'com lançamentos'
+        else:
+            status = f'observada em {len(skiplist.observed.get(fp, []))}'
+        print(f'  página {page:>4}: {fp or "-":<20} {status}')
+
+    if args.verify:
+        try:
+            rows, _ = extract_rows(args.bank, args.pdf, prefilter=False)
+        except ExtractionError as e:
+            print(f'  erro ao verificar: {e.message}')
+            sys.exit(1)
+        lost = [r for r in rows if r['page'] in skipped]
+        for r in lost:
+            print(f"  ATENÇÃO página {r['page']}: {r['date']} {r['description']} {r['amount']}")
+        if lost:
+            sys.exit(1)
+        print(f'  ok: nenhum dos {len(rows)} créditos está em página pulada')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Checkpoint por página das extrações, para retomar PDFs grandes.
+
+Um worker morto no meio de um extrato de 300 páginas (timeout do gunicorn,
+falta de memória) perdia tudo, e a nova tentativa recomeçava da página 1.
+Com checkpoint, cada extrator grava ao fim de cada página os créditos
+encontrados nela e o estado do parser que atravessa páginas (no Itaú, o
+layout de colunas aprendido; no PicPay, qual leitor está em uso). A próxima
+extração do mesmo arquivo (mesmo SHA-256, mesmo banco e variante) restaura
+essas páginas e segue da primeira não concluída. O checkpoint é apagado
+quando a extração termina.
+
+O arquivo é um JSONL só de acréscimos: uma linha por página concluída,
+escrita de uma vez. Uma linha cortada no fim (processo morto durante a
+escrita) é ignorada e a página é refeita.
+"""
+from __future__ import annotations
+
+import dataclasses
+import json
+import os
+import re
+import sys
+import time
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Set, Type
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.store import file_sha256
+
+CHECKPOINT_VERSION = 1
+# Checkpoints sem uso há mais tempo que isso são apagados ao abrir outro
+CHECKPOINT_TTL = 24 * 3600
+
+_SAFE_NAME = re.compile(r'[^0-9A-Za-z_.-]+')
+
+
+def _encode_entry(entry) -> Dict[str, Any]:
+    data = {}
+    for f in dataclasses.fields(entry):
+        value = getattr(entry, f.name)
+        data[f.name] = str(value) if isinstance(value, Decimal) else value
+    return data
+
+
+def _decode_entry(entry_type: Type, data: Dict[str, Any]):
+    values = {}
+    for f in dataclasses.fields(entry_type):
+        value = data.get(f.name)
+        # Anotações podem ser strings (from __future__ import annotations)
+        if value is not None and 'Decimal' in str(f.type):
+            value = Decimal(value)
+        values[f.name] = value
+    return entry_type(**values)
+
+
+class PageCheckpoint:
+    """
+    Progresso de uma extração, página a página.
+
+    Uso dentro do laço de páginas do extrator:
+
+        done = checkpoint.done
+        for page_num, page in ...:
+            if pages is not None and page_num not in pages:
+                continue
+            if page_num in done:
+                # concluída antes: os créditos voltam na ordem das páginas
+                page_credits = checkpoint.restore(CreditEntry, page_num)
+            else:
+                ...
+                checkpoint.page_done(page_num, page_credits, state)
+            credits.extend(page_credits)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.state: Dict[str, Any] = {}
+        self._pages: Dict[int, List[Dict[str, Any]]] = {}
+        self._load()
+
+    @property
+    def done(self) -> Set[int]:
+        """Páginas (a partir de 1) já concluídas."""
+        return set(self._pages)
+
+    @property
+    def resumed(self) -> bool:
+        return bool(self._pages)
+
+    def _load(self) -> None:
+        try:
+            f = open(self.path, encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record.get('version') != CHECKPOINT_VERSION:
+                    break
+                if record.get('reset'):
+                    self._pages.clear()
+                else:
+                    self._pages[record['page']] = record['entries']
+                self.state = record.get('state') or {}
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        record['version'] = CHECKPOINT_VERSION
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        # Uma escrita por linha em modo append; sem fsync: o que importa é
+        # sobreviver à morte do processo, não à queda da máquina
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+    def restore(self, entry_type: Type, page_num: int) -> List[Any]:
+        """Créditos de uma página concluída, como `entry_type`."""
+        return [_decode_entry(entry_type, data) for data in self._pages.get(page_num, [])]
+
+    def page_done(self, page_num: int, entries: List[Any], state: Optional[Dict[str, Any]] = None) -> None:
+        """Registra a página como concluída, com seus créditos e o estado do parser ao fim dela."""
+        encoded = [_encode_entry(e) for e in entries]
+        self._pages[page_num] = encoded
+        if state is not None:
+            self.state = state
+        self._append({'page': page_num, 'entries': encoded, 'state': self.state})
+
+    def reset(self, state: Optional[Dict[str, Any]] = None) -> None:
+        """Descarta as páginas concluídas (ex.: o extrator trocou de leitor e recomeça)."""
+        self._pages.clear()
+        self.state = state or {}
+        self._append({'reset': True, 'state': self.state})
+
+    def discard(self) -> None:
+        """Apaga o checkpoint (extração concluída)."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _prune(directory: str, max_age: float) -> None:
+    limit = time.time() - max_age
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        if not name.endswith('.jsonl'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < limit:
+                os.remove(path)
+        except OSError:
+            continue
+
+
+def open_checkpoint(directory: Optional[str], bank: str, filepath: str, variant: str = '',
+                    file_hash: Optional[str] = None) -> Optional[PageCheckpoint]:
+    """
+    Abre (ou cria) o checkpoint do arquivo, ou None sem `directory`.
+
+    Args:
+        directory: Pasta local dos checkpoints (criada se não existir).
+        bank: Banco do extrato.
+        filepath: PDF; identificado pelo SHA-256 do conteúdo, não pelo nome.
+        variant: Opções que mudam o resultado (modo de OCR, modo de colunas).
+        file_hash: SHA-256 já calculado, para não ler o arquivo de novo.
+    """
+    if not directory:
+        return None
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    _prune(directory, CHECKPOINT_TTL)
+    digest = file_hash or file_sha256(filepath)
+    name = _SAFE_NAME.sub('_', '-'.join(part for part in (bank, variant, digest) if part))
+    return PageCheckpoint(os.path.join(directory, f'{name}.jsonl'))
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Daemon de extração: processos já aquecidos atrás de um socket Unix.
+
+Cada chamada de `python ITAU/itau_extractor.py extrato.pdf` paga o início
+do interpretador e os imports (pdfplumber, pdfminer, PIL, os extratores):
+cerca de 0,3 s antes de abrir o PDF, mais que a extração de um extrato
+pequeno. Scripts que chamam os extratores arquivo a arquivo pagam isso em
+toda chamada.
+
+O daemon sobe uma vez um pool de processos (`--workers`) que já importaram
+todos os extratores e fica ouvindo num socket Unix. O cliente (`run`) só usa
+a stdlib: manda banco, argumentos e pasta atual; o processo do pool roda o
+`main()` do extrator com esses argumentos e devolve a saída. Saída na tela,
+CSV/JSON gravados com `--out` e código de saída são os mesmos de rodar o
+script direto.
+
+O socket é criado com permissão 0600: só o mesmo usuário conecta, e os
+arquivos são lidos e gravados com as permissões do daemon.
+
+Uso:
+    python COMMON/daemon.py serve [--workers 2] [--max-tasks 200] &
+    python COMMON/daemon.py run itau extrato.pdf -o saida.csv
+    python COMMON/daemon.py run santander extrato.pdf --ocr --format json -o saida.json
+    python COMMON/daemon.py status
+    python COMMON/daemon.py stop
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BASE_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# Módulo com o main() de linha de comando de cada banco
+CLI_MODULES = {
+    'itau': 'ITAU.itau_extractor',
+    'santander': 'SANTANDER.income_extractor',
+    'nubank': 'NUBANK.nubank_extractor',
+    'picpay': 'PICPAY.picpay_extractor',
+    'mercadopago': 'MERCADOPAGO.mercadopago_extractor',
+}
+DEFAULT_SOCKET = os.environ.get(
+    'EXTRACTION_DAEMON_SOCKET',
+    os.path.join(tempfile.gettempdir(), f'extratos-{os.getuid() if hasattr(os, "getuid") else "user"}.sock'))
+# Maior mensagem aceita pelo daemon (pedido em JSON numa linha)
+MAX_REQUEST_BYTES = 1 << 20
+# Intervalo com que os processos do pool conferem se o daemon ainda existe
+PARENT_CHECK_SECONDS = 2.0
+
+
+class DaemonError(RuntimeError):
+    """Daemon inacessível, já em execução ou resposta inválida."""
+
+
+# --- processos do pool ---
+
+def _watch_parent(parent: int) -> None:
+    while os.getppid() == parent:
+        time.sleep(PARENT_CHECK_SECONDS)
+    os._exit(1)
+
+
+def _warm(parent: int) -> None:
+    """Inicializador dos processos do pool: importa os extratores uma vez."""
+    # Se o daemon morrer sem fechar o pool (kill -9, falta de memória), o processo não fica órfão
+    threading.Thread(target=_watch_parent, args=(parent,), daemon=True).start()
+    for module in CLI_MODULES.values():
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            # Falta de dependência aparece na chamada, com o erro do próprio extrator
+            pass
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def run_cli(bank: str, argv: List[str], cwd: str) -> Dict[str, Any]:
+    """
+    Roda o `main()` do extrator do banco como se fosse `python <script> <argv>` em `cwd`.
+
+    Devolve código de saída, stdout e stderr capturados e o tempo em ms. Cada
+    processo do pool roda um pedido por vez, então trocar `sys.argv` e a
+    pasta atual é seguro.
+    """
+    start = time.perf_counter()
+    out, err = io.StringIO(), io.StringIO()
+    code = 0
+    old_argv, old_cwd = sys.argv, os.getcwd()
+    try:
+        module = importlib.import_module(CLI_MODULES[bank])
+        os.chdir(cwd)
+        sys.argv = [module.__file__, *argv]
+        with redirect_stdout(out), redirect_stderr(err):
+            try:
+                module.main()
+            except SystemExit as exc:
+                # Mesmas regras do interpretador: None é 0, texto vai para o stderr com código 1
+                if exc.code is None or isinstance(exc.code, int):
+                    code = exc.code or 0
+                else:
+                    print(exc.code, file=sys.stderr)
+                    code = 1
+            except Exception:
+                traceback.print_exc()
+                code = 1
+    except Exception:
+        err.write(traceback.format_exc())
+        code = 1
+    finally:
+        sys.argv = old_argv
+        os.chdir(old_cwd)
+    return {'code': code, 'stdout': out.getvalue(), 'stderr': err.getvalue(),
+            'ms': round((time.perf_counter() - start) * 1000, 1), 'pid': os.getpid()}
+
+
+# --- protocolo: um JSON por linha, uma pergunta e uma resposta por conexão ---
+
+def encode(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n'
+
+
+def decode(line: bytes) -> Dict[str, Any]:
+    message = json.loads(line.decode('utf-8'))
+    if not isinstance(message, dict):
+        raise ValueError('mensagem deve ser um objeto JSON')
+    return message
+
+
+def validate_run(message: Dict[str, Any]) -> Optional[str]:
+    """Motivo da recusa de um pedido `run` (None se estiver bom)."""
+    if message.get('bank') not in CLI_MODULES:
+        return f"banco desconhecido: {message.get('bank')!r} (use {', '.join(sorted(CLI_MODULES))})"
+    argv = message.get('argv')
+    if not isinstance(argv, list) or not all(isinstance(a, str) for a in argv):
+        return 'argv deve ser uma lista de textos'
+    cwd = message.get('cwd')
+    if not isinstance(cwd, str) or not os.path.isabs(cwd) or not os.path.isdir(cwd):
+        return f'pasta de trabalho inválida: {cwd!r}'
+    return None
+
+
+class ExtractionDaemon:
+    """Pool de processos aquecidos servindo pedidos num socket Unix."""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, workers: int = 2, max_tasks: Optional[int] = None):
+        self.socket_path = socket_path
+        self.workers = max(1, workers)
+        # Reciclar os processos de tempos em tempos devolve a memória que o pdfplumber retém
+        self.max_tasks = max_tasks
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.warm_ms = 0.0
+        self.jobs = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.restarts = 0
+        self.total_ms = 0.0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # Importados aqui: o cliente (`run`) não precisa deles e cada import pesa no início
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # "spawn": processos limpos, sem herdar as threads do servidor
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_warm, initargs=(os.getpid(),),
+                                   max_tasks_per_child=self.max_tasks)
+
+    def _check_stale_socket(self) -> None:
+        if not os.path.exists(self.socket_path):
+            return
+        if not stat.S_ISSOCK(os.stat(self.socket_path).st_mode):
+            raise DaemonError(f'{self.socket_path} existe e não é um socket.')
+        try:
+            request({'op': 'status'}, self.socket_path, timeout=2)
+        except DaemonError:
+            os.unlink(self.socket_path)  # sobra de um daemon que morreu
+        else:
+            raise DaemonError(f'Já existe um daemon ouvindo em {self.socket_path}.')
+
+    def start(self) -> None:
+        """Sobe e aquece o pool e abre o socket (não bloqueia)."""
+        if not hasattr(socket, 'AF_UNIX'):
+            raise DaemonError('O daemon precisa de socket Unix (Linux/macOS).')
+        self._check_stale_socket()
+        start = time.perf_counter()
+        self._executor = self._new_executor()
+        # Um ping por processo força todos a subir (e importar os extratores) agora
+        for future in [self._executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+        self.warm_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline(MAX_REQUEST_BYTES)
+                try:
+                    response = daemon.handle(decode(line))
+                except ValueError as exc:
+                    response = {'ok': False, 'error': f'pedido inválido: {exc}'}
+                self.wfile.write(encode(response))
+
+        old_umask = os.umask(0o177)
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        finally:
+            os.umask(old_umask)
+        self._server.daemon_threads = True
+
+    def serve_forever(self) -> None:
+        try:
+            self._server.serve_forever()
+        finally:
+            self.close()
+
+    def stop(self, *_args) -> None:
+        """Pede o fim do laço do servidor (seguro em handler de sinal e nas threads dos pedidos)."""
+        if self._server is not None:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.server_close()
+            self._server = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+    def handle(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        op = message.get('op')
+        if op == 'status':
+            return {'ok': True, **self.stats()}
+        if op == 'stop':
+            self.stop()
+            return {'ok': True}
+        if op != 'run':
+            return {'ok': False, 'error': f'operação desconhecida: {op!r}'}
+        problem = validate_run(message)
+        if problem:
+            return {'ok': False, 'error': problem}
+        return self.run(message['bank'], message['argv'], message['cwd'])
+
+    def run(self, bank: str, argv: List[str], cwd: str) -> Dict[str, Any]:
+        from concurrent.futures.process import BrokenProcessPool
+        with self._lock:
+            executor = self._executor
+            self.in_flight += 1
+        try:
+            result = executor.submit(run_cli, bank, argv, cwd).result()
+        except BrokenProcessPool:
+            # Um processo morreu (ex.: falta de memória) e levou o pool junto: sobe outro
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = self._new_executor()
+                    self.restarts += 1
+                self.failed += 1
+            return {'ok': False, 'error': 'o processo de extração morreu; tente de novo'}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        with self._lock:
+            self.jobs += 1
+            self.failed += result['code'] != 0
+            self.total_ms += result['ms']
+        return {'ok': True, **result}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'socket': self.socket_path,
+                'workers': self.workers,
+                'max_tasks': self.max_tasks,
+                'uptime_s': round(time.time() - self.started),
+                'warm_ms': self.warm_ms,
+                'jobs': self.jobs,
+                'failed': self.failed,
+                'in_flight': self.in_flight,
+                'restarts': self.restarts,
+                'mean_ms': round(self.total_ms / self.jobs, 1) if self.jobs else None,
+            }
+
+
+# --- cliente ---
+
+def request(message: Dict[str, Any], socket_path: str = DEFAULT_SOCKET,
+            timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Manda uma mensagem ao daemon e devolve a resposta (`DaemonError` se não houver daemon)."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall(encode(message))
+            with sock.makefile('rb') as f:
+                line = f.readline()
+    except (FileNotFoundError, ConnectionRefusedError) as exc:
+        raise DaemonError(f'Nenhum daemon em {socket_path} ({exc.strerror}).') from exc
+    except OSError as exc:
+        raise DaemonError(f'Falha ao falar com o daemon em {socket_path}: {exc}') from exc
+    if not line:
+        raise DaemonError('O daemon fechou a conexão sem responder.')
+    return decode(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extratores aquecidos atrás de um socket Unix')
+    parser.add_argument('--socket', '-s', default=DEFAULT_SOCKET,
+                        help=f'Caminho do socket (padrão: {DEFAULT_SOCKET}; ou EXTRACTION_DAEMON_SOCKET)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_serve = sub.add_parser('serve', help='Sobe o daemon (em primeiro plano)')
+    p_serve.add_argument('--workers', '-w', type=int, default=2, help='Processos de extração')
+    p_serve.add_argument('--max-tasks', type=int,
+                         help='Troca cada processo depois de N extrações (devolve a memória retida)')
+    p_run = sub.add_parser('run', help='Extrai pelo daemon; os argumentos são os do script do banco')
+    p_run.add_argument('bank', choices=sorted(CLI_MODULES))
+    p_run.add_argument('argv', nargs=argparse.REMAINDER, help='Argumentos do extrator (ex.: extrato.pdf -o saida.csv)')
+    p_run.add_argument('--fallback', action='store_true',
+                       help='Sem daemon, extrai neste processo em vez de falhar')
+    p_run.add_argument('--timeout', type=float, help='Segundos de espera pela resposta')
+    sub.add_parser('status', help='Situação do daemon (JSON)')
+    sub.add_parser('stop', help='Encerra o daemon')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        daemon = ExtractionDaemon(args.socket, workers=args.workers, max_tasks=args.max_tasks)
+        try:
+            daemon.start()
+        except DaemonError as exc:
+            print(exc, file=sys.stderr)
+            sys.exit(1)
+        signal.signal(signal.SIGTERM, daemon.stop)
+        signal.signal(signal.SIGINT, daemon.stop)
+        print(f'Daemon ouvindo em {args.socket} ({daemon.workers} processos, aquecidos em '
+              f'{daemon.warm_ms:.0f} ms)', flush=True)
+        daemon.serve_forever()
+        return
+
+    if args.command == 'run':
+        message = {'op': 'run', 'bank': args.bank, 'argv': args.argv, 'cwd': os.getcwd()}
+        try:
+            response = request(message, args.socket, timeout=args.timeout)
+        except DaemonError as exc:
+            if not args.fallback:
+                print(f'{exc} Suba com: python COMMON/daemon.py serve', file=sys.stderr)
+                sys.exit(2)
+            response = {'ok': True, **run_cli(args.bank, args.argv, os.getcwd())}
+        if not response.get('ok'):
+            print(f"Erro do daemon: {response.get('error')}", file=sys.stderr)
+            sys.exit(2)
+        sys.stdout.write(response['stdout'])
+        sys.stderr.write(response['stderr'])
+        sys.exit(response['code'])
+
+    try:
+        response = request({'op': args.command}, args.socket, timeout=10)
+    except DaemonError as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(2)
+    if args.command == 'status':
+        print(json.dumps(response, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""
+Datas dos extratos em forma canônica: ordinal inteiro e aaaa-mm-dd.
+
+Cada banco imprime a data de um jeito (dd/mm/aaaa no Itaú, dd/mm/aa no
+Santander, dd-mm-aaaa no Mercado Pago, "DD MMM AAAA" no Nubank). A extração
+converte uma vez para o ordinal do calendário (`date.toordinal()`), e
+ordenação, filtros por período e agrupamento por mês comparam inteiros.
+
+Um extrato repete as mesmas poucas datas milhares de vezes, por isso o
+parser e as conversões de volta são memorizados.
+
+`DateWindow` é o período pedido pelo usuário (ex.: os últimos 3 meses de
+um extrato de 12) e `DateCutoff` decide quando um extrato em ordem
+cronológica já passou do fim dele, para a extração parar de ler páginas.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+MONTHS_PT = {
+    'JAN': 1, 'FEV': 2, 'MAR': 3, 'ABR': 4, 'MAI': 5, 'JUN': 6,
+    'JUL': 7, 'AGO': 8, 'SET': 9, 'OUT': 10, 'NOV': 11, 'DEZ': 12
+}
+
+_NUMERIC_DATE = re.compile(r'^(\d{1,2})[/-](\d{1,2})[/-](\d{2}|\d{4})$')
+_TEXT_DATE = re.compile(r'^(\d{1,2})\s+([A-Za-z]{3})\s+(\d{4})$')
+_ISO_DATE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+
+
+@lru_cache(maxsize=4096)
+def parse_date(text: Optional[str]) -> Optional[int]:
+    """
+    Converte dd/mm/aaaa, dd/mm/aa, dd-mm-aaaa, "DD MMM AAAA" ou aaaa-mm-dd no ordinal do dia.
+
+    Returns:
+        `date.toordinal()` da data, ou None se vazia, em formato desconhecido
+        ou inexistente no calendário (31/02).
+    """
+    if not text:
+        return None
+    text = text.strip()
+    m = _NUMERIC_DATE.match(text)
+    if m:
+        d, mo, y = m.groups()
+        if len(y) == 2:
+            y = f"20{y}"
+    else:
+        m = _TEXT_DATE.match(text)
+        if m and m.group(2).upper() in MONTHS_PT:
+            d, mon, y = m.groups()
+            mo = MONTHS_PT[mon.upper()]
+        else:
+            m = _ISO_DATE.match(text)
+            if not m:
+                return None
+            y, mo, d = m.groups()
+    try:
+        return date(int(y), int(mo), int(d)).toordinal()
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def to_iso(ordinal: Optional[int]) -> str:
+    """Ordinal -> aaaa-mm-dd ('' para None)."""
+    if ordinal is None:
+        return ''
+    return date.fromordinal(ordinal).isoformat()
+
+
+@lru_cache(maxsize=4096)
+def month_index(ordinal: int) -> int:
+    """Mês do ordinal como inteiro ordenável (ano * 12 + mês - 1)."""
+    day = date.fromordinal(ordinal)
+    return day.year * 12 + day.month - 1
+
+
+def month_label(index: int) -> str:
+    """Inverso de `month_index`: aaaa-mm."""
+    year, month = divmod(index, 12)
+    return f"{year:04d}-{month + 1:02d}"
+
+
+def row_ordinal(row: Dict[str, Any]) -> Optional[int]:
+    """Ordinal de uma linha: o calculado na extração (`date_ord`) ou, sem ele, o do texto da data."""
+    if 'date_ord' in row:
+        return row['date_ord']
+    return parse_date(row.get('date'))
+
+
+def normalize_date(text: Optional[str]) -> str:
+    """
+    Data em aaaa-mm-dd; o texto original (sem espaços nas pontas) quando não
+    é uma data reconhecida, e '' quando vazio.
+    """
+    ordinal = parse_date(text)
+    if ordinal is None:
+        return text.strip() if text else ''
+    return to_iso(ordinal)
+
+
+@dataclass(frozen=True)
+class DateWindow:
+    """
+    Período [start, end] em ordinais, extremos inclusivos; None deixa o lado aberto.
+
+    `stop_early` permite parar a leitura quando um extrato em ordem
+    cronológica passa do fim (`DateCutoff`). Desligue para PDFs que juntam
+    extratos de períodos diferentes fora de ordem: a ordem só é conferida nas
+    páginas lidas até a parada.
+    """
+    start: Optional[int] = None
+    end: Optional[int] = None
+    stop_early: bool = True
+
+    @classmethod
+    def parse(cls, start: Optional[str] = None, end: Optional[str] = None,
+              stop_early: bool = True) -> Optional['DateWindow']:
+        """
+        Período a partir de textos em qualquer formato de `parse_date`.
+
+        Returns:
+            None quando os dois lados estão vazios (sem filtro).
+
+        Raises:
+            ValueError: data não reconhecida ou início depois do fim.
+        """
+        bounds = []
+        for text in (start, end):
+            text = (text or '').strip()
+            ordinal = parse_date(text) if text else None
+            if text and ordinal is None:
+                raise ValueError(f'Data inválida: "{text}" (use dd/mm/aaaa ou aaaa-mm-dd).')
+            bounds.append(ordinal)
+        if bounds == [None, None]:
+            return None
+        if None not in bounds and bounds[0] > bounds[1]:
+            raise ValueError('A data inicial é posterior à final.')
+        return cls(bounds[0], bounds[1], stop_early)
+
+    def contains(self, ordinal: Optional[int]) -> bool:
+        """Se o dia está no período; linhas sem data reconhecida nunca são descartadas."""
+        if ordinal is None:
+            return True
+        return (self.start is None or ordinal >= self.start) and (self.end is None or ordinal <= self.end)
+
+    def excludes(self, first: int, last: int) -> bool:
+        """Se o intervalo de dias [first, last] (ex.: as datas de uma página) fica todo fora do período."""
+        return (self.start is not None and last < self.start) or (self.end is not None and first > self.end)
+
+    def keep(self, entries: Iterable[Any]) -> List[Any]:
+        """Transações de um extrator (com `.date` em texto) que caem no período."""
+        return [e for e in entries if self.contains(parse_date(e.date))]
+
+    def label(self) -> str:
+        """Período por extenso para mensagens: "de 01/10/2025 a 31/12/2025", "a partir de ...", "até ..."."""
+        start, end = (date.fromordinal(o).strftime('%d/%m/%Y') if o is not None else None
+                      for o in (self.start, self.end))
+        if start is None:
+            return f'até {end}'
+        if end is None:
+            return f'a partir de {start}'
+        return f'de {start} a {end}'
+
+
+class DateCutoff:
+    """
+    Parada antecipada em extratos em ordem cronológica.
+
+    Recebe as datas de cada página, na ordem das páginas. Enquanto o menor e o
+    maior dia de cada página nunca recuam em relação à página anterior, o
+    extrato é tratado como crescente e, a partir da segunda página com datas,
+    uma página que começa depois do fim do período encerra a leitura: as
+    seguintes só podem ser mais novas. Um recuo em qualquer ponto (extrato
+    decrescente, duas contas em sequência) desliga a parada.
+    """
+
+    def __init__(self, window: DateWindow):
+        self.window = window
+        self.ordered = True
+        self.pages = 0
+        self._last: Optional[Tuple[int, int]] = None
+
+    def past_end(self, ordinals: Iterable[Optional[int]]) -> bool:
+        """Registra as datas de uma página e diz se a leitura pode parar nela."""
+        dated = [o for o in ordinals if o is not None]
+        if not dated or self.window.end is None or not self.window.stop_early:
+            return False
+        first, last = min(dated), max(dated)
+        if self._last is not None and (first < self._last[0] or last < self._last[1]):
+            self.ordered = False
+        self._last = (first, last)
+        self.pages += 1
+        return self.ordered and self.pages >= 2 and first > self.window.end
@@ -0,0 +1,89 @@
+"""
+Deduplicação de transações entre extratos com períodos sobrepostos.
+
+Cada transação recebe uma impressão digital (data normalizada, valor em
+centavos, descrição normalizada, banco). Um índice em hash guarda, para cada
+impressão digital, quantas ocorrências já foram aceitas; um arquivo só
+acrescenta ocorrências além das que outro arquivo já trouxe. Assim, duas
+transferências idênticas no mesmo extrato continuam contando duas vezes,
+mas a mesma transferência repetida em dois extratos conta uma vez só.
+"""
+from __future__ import annotations
+
+import os
+import re
+import sys
+import unicodedata
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.dates import normalize_date, row_ordinal, to_iso
+
+_NON_ALNUM = re.compile(r'[^0-9A-Z]+')
+
+Fingerprint = Tuple[str, int, str, str]
+
+
+def normalize_description(description: str) -> str:
+    """Maiúsculas, sem acentos e com qualquer pontuação reduzida a um espaço."""
+    folded = unicodedata.normalize('NFKD', description or '')
+    folded = ''.join(ch for ch in folded if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', folded.upper()).strip()
+
+
+def to_cents(value) -> int:
+    return int((Decimal(str(value)) * 100).to_integral_value())
+
+
+def fingerprint(row: Dict[str, Any]) -> Fingerprint:
+    ordinal = row_ordinal(row)
+    return (
+        to_iso(ordinal) if ordinal is not None else normalize_date(row.get('date')),
+        to_cents(row['value']),
+        normalize_description(row.get('description', '')),
+        row.get('bank') or ''
+    )
+
+
+class DedupIndex:
+    """Índice incremental: alimente um arquivo por vez com `add_file`."""
+
+    def __init__(self):
+        self._accepted: Dict[Fingerprint, int] = {}
+        self.merged = 0
+
+    def add_file(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Retorna as linhas do arquivo que ainda não tinham aparecido em arquivos anteriores."""
+        in_file: Dict[Fingerprint, int] = {}
+        kept = []
+        for row in rows:
+            fp = fingerprint(row)
+            seen = in_file.get(fp, 0) + 1
+            in_file[fp] = seen
+            if seen > self._accepted.get(fp, 0):
+                self._accepted[fp] = seen
+                kept.append(row)
+            else:
+                self.merged += 1
+        return kept
+
+
+def deduplicate(files_rows: Iterable[List[Dict[str, Any]]]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Remove transações repetidas entre arquivos de uma mesma requisição.
+
+    Args:
+        files_rows: Linhas de cada arquivo, um item por arquivo.
+
+    Returns:
+        Tupla (linhas únicas na ordem original, quantidade mesclada).
+    """
+    index = DedupIndex()
+    rows: List[Dict[str, Any]] = []
+    for file_rows in files_rows:
+        rows.extend(index.add_file(file_rows))
+    return rows, index.merged
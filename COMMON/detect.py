@@ -0,0 +1,107 @@
+"""
+Identificação do banco de um extrato em PDF.
+
+Usa o cabeçalho do texto cru da primeira página (PyPDF2, sem layout): as
+primeiras linhas, antes do primeiro lançamento datado. Vence o banco cuja
+marca (palavras inteiras) aparece primeiro; os lançamentos ficam de fora,
+já que podem citar outros bancos como origem de uma transferência ("PIX
+TRANSF ... ITAU" num extrato do Nubank). Uma dica explícita (pasta ou nome
+do arquivo com a chave do banco) tem precedência.
+"""
+from __future__ import annotations
+
+import os
+import re
+import unicodedata
+from typing import Dict, Optional, Pattern, Tuple
+
+try:
+    from PyPDF2 import PdfReader
+    HAS_PYPDF2 = True
+except ImportError:
+    HAS_PYPDF2 = False
+
+# Marcas de cada banco (maiúsculas, sem acentos); o espaço entre as palavras
+# é opcional (o texto cru do PyPDF2 varia no espaçamento)
+BANK_SIGNATURES: Dict[str, Tuple[str, ...]] = {
+    'itau': ('ITAU UNIBANCO', 'BANCO ITAU', 'ITAU.COM.BR', 'ITAU'),
+    'santander': ('SANTANDER',),
+    'nubank': ('NU PAGAMENTOS', 'NUBANK', 'NUCONTA'),
+    'picpay': ('PICPAY',),
+    'mercadopago': ('MERCADO PAGO',),
+}
+# Linhas com texto lidas no máximo como cabeçalho
+HEADER_LINES = 8
+
+_HINT_SPLIT = re.compile(r'[^a-z]+')
+# Linha de lançamento: começa com data (dd/mm, dd-mm ou "15 JAN")
+_DATED_LINE = re.compile(r'^\s*\d{1,2}\s*(?:[/-]\s*\d{1,2}|[A-Za-z]{3}\b)')
+
+
+def _signature_pattern(signature: str) -> Pattern[str]:
+    body = r'\s*'.join(re.escape(word) for word in signature.split())
+    return re.compile(rf'(?<![A-Z0-9]){body}(?![A-Z0-9])')
+
+
+_PATTERNS = {bank: tuple(_signature_pattern(s) for s in signatures) for bank, signatures in BANK_SIGNATURES.items()}
+
+
+def _fold(text: str) -> str:
+    folded = unicodedata.normalize('NFKD', text.upper())
+    return ''.join(ch for ch in folded if not unicodedata.combining(ch))
+
+
+def header_text(text: str) -> str:
+    """Primeiras linhas com texto, até o primeiro lançamento datado (no máximo `HEADER_LINES`)."""
+    header = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if _DATED_LINE.match(line) or len(header) >= HEADER_LINES:
+            break
+        header.append(line)
+    return '\n'.join(header)
+
+
+def detect_bank_from_text(text: str) -> Optional[str]:
+    """Banco cuja marca aparece primeiro no cabeçalho do texto, ou None."""
+    folded = _fold(header_text(text))
+    best: Optional[Tuple[int, str]] = None
+    for bank, patterns in _PATTERNS.items():
+        for pattern in patterns:
+            match = pattern.search(folded)
+            if match and (best is None or match.start() < best[0]):
+                best = (match.start(), bank)
+    return best[1] if best else None
+
+
+def bank_from_path(filepath: str) -> Optional[str]:
+    """Banco indicado pela pasta ou pelo nome do arquivo (ex.: entrada/itau/jan.pdf, nubank_jan.pdf)."""
+    parent = os.path.basename(os.path.dirname(os.path.abspath(filepath))).lower()
+    if parent in BANK_SIGNATURES:
+        return parent
+    words = _HINT_SPLIT.split(os.path.splitext(os.path.basename(filepath))[0].lower())
+    found = [bank for bank in BANK_SIGNATURES if bank in words]
+    return found[0] if len(found) == 1 else None
+
+
+def detect_bank(filepath: str) -> Optional[str]:
+    """
+    Banco do extrato: pela pasta/nome do arquivo ou pela primeira página com texto.
+
+    Returns:
+        Chave do banco (como em `COMMON.extraction.BANK_LABELS`) ou None
+        (PDF escaneado sem dica, ou sem marca conhecida).
+    """
+    hint = bank_from_path(filepath)
+    if hint or not HAS_PYPDF2:
+        return hint
+    try:
+        reader = PdfReader(filepath)
+        for page in reader.pages[:2]:
+            text = page.extract_text() or ''
+            if text.strip():
+                return detect_bank_from_text(text)
+    except Exception:
+        return None
+    return None
@@ -0,0 +1,337 @@
+"""
+Registro dos extratores de cada banco e normalização das linhas extraídas.
+
+Concentra em um único lugar o despacho "banco -> extrator" que antes ficava
+dentro de `WEBAPP/app.py`, para que a interface web, a API JSON e as
+ferramentas de linha de comando usem exatamente a mesma lógica.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import threading
+from decimal import Decimal, ROUND_DOWN
+from typing import Any, BinaryIO, Collection, Dict, List, Optional, Set, Tuple, Union
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BASE_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.boilerplate import audit_sample, fingerprint_pages, get_skiplist
+from COMMON.checkpoint import PageCheckpoint, open_checkpoint
+from COMMON.dates import DateWindow, parse_date, to_iso
+from COMMON.prefilter import PAGE_MARKERS, RawPdf, plan_pages
+from COMMON.store import source_name
+from COMMON.spans import span
+
+try:
+    from ITAU.itau_extractor import ItauExtractParser
+except Exception:
+    ItauExtractParser = None
+
+try:
+    from SANTANDER.income_extractor import OCR_MODES, ocr_variant, extract_incomes_from_pdf as santander_extract
+except Exception:
+    OCR_MODES = {}
+    ocr_variant = None
+    santander_extract = None
+
+try:
+    from NUBANK.nubank_extractor import NubankExtractor
+except Exception:
+    NubankExtractor = None
+
+try:
+    from PICPAY.picpay_extractor import PicPayExtractor
+except Exception:
+    PicPayExtractor = None
+
+try:
+    from MERCADOPAGO.mercadopago_extractor import MercadoPagoExtractor
+except Exception:
+    MercadoPagoExtractor = None
+
+
+BANK_LABELS = {
+    'itau': 'Itaú',
+    'itau_new': 'Itaú',
+    'santander': 'Santander',
+    'nubank': 'Nubank',
+    'picpay': 'PicPay',
+    'mercadopago': 'Mercado Pago'
+}
+
+logger = logging.getLogger(__name__)
+
+_BANK_MODULES = {
+    'itau': 'ITAU.itau_extractor',
+    'itau_new': 'ITAU.itau_extractor',
+    'santander': 'SANTANDER.income_extractor',
+    'nubank': 'NUBANK.nubank_extractor',
+    'picpay': 'PICPAY.picpay_extractor',
+    'mercadopago': 'MERCADOPAGO.mercadopago_extractor'
+}
+
+
+class ExtractionError(RuntimeError):
+    """Erro de extração com um código estável para consumo programático."""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+    def to_dict(self) -> Dict[str, str]:
+        return {'code': self.code, 'message': self.message}
+
+
+def bank_label(bank: str) -> str:
+    return BANK_LABELS.get(bank, bank.capitalize())
+
+
+def available_banks() -> Dict[str, bool]:
+    """Retorna cada banco suportado e se o seu extrator pôde ser importado."""
+    return {bank: _load_extractor(bank) is not None for bank in BANK_LABELS}
+
+
+def should_exclude_transaction(description: str, exclude_names: List[str]) -> bool:
+    if not exclude_names:
+        return False
+
+    description_lower = description.lower()
+    for name in exclude_names:
+        if name in description_lower:
+            return True
+    return False
+
+
+def parse_exclude_names(raw: Optional[str]) -> List[str]:
+    """Converte a lista "Nome A, Nome B" do formulário em nomes minúsculos."""
+    if not raw:
+        return []
+    return [name.strip().lower() for name in raw.split(',') if name.strip()]
+
+
+def format_brl(amount: Decimal) -> str:
+    return f"R$ {str(amount).replace('.', ',')}"
+
+
+def _load_extractor(bank: str):
+    if bank in ('itau', 'itau_new'):
+        return ItauExtractParser
+    if bank == 'santander':
+        return santander_extract
+    if bank == 'nubank':
+        return NubankExtractor
+    if bank == 'picpay':
+        return PicPayExtractor
+    if bank == 'mercadopago':
+        return MercadoPagoExtractor
+    return None
+
+
+# Uma instância por banco para o processo inteiro. Os extratores não guardam
+# estado entre chamadas (tudo da chamada fica em variáveis locais), então a
+# mesma instância atende várias threads ao mesmo tempo.
+_instances: Dict[str, Any] = {}
+_instances_lock = threading.Lock()
+
+
+def get_extractor(bank: str):
+    """
+    Extrator compartilhado do banco: a instância da classe ou, no Santander,
+    a função de extração. None se o módulo não pôde ser importado.
+    """
+    extractor = _instances.get(bank)
+    if extractor is not None:
+        return extractor
+    factory = _load_extractor(bank)
+    if factory is None:
+        return None
+    with _instances_lock:
+        if bank not in _instances:
+            _instances[bank] = factory if bank == 'santander' else factory()
+        return _instances[bank]
+
+
+def _extract_entries(bank: str, filepath: Union[str, BinaryIO], pages=None, ocr_mode: Optional[str] = None,
+                     checkpoint: Optional[PageCheckpoint] = None, extractor=None,
+                     dates: Optional[DateWindow] = None, raw: Optional[RawPdf] = None) -> list:
+    if bank not in BANK_LABELS:
+        raise ExtractionError('unsupported_bank', f'Banco "{bank}" não suportado.')
+
+    if extractor is None:
+        extractor = get_extractor(bank)
+    if extractor is None:
+        raise ExtractionError('extractor_unavailable', f'Módulo {_BANK_MODULES[bank]} não disponível')
+
+    if bank == 'santander':
+        if ocr_mode:
+            if ocr_mode not in OCR_MODES:
+                raise ExtractionError('ocr_unavailable', f'Modo de OCR "{ocr_mode}" desconhecido.')
+            return extractor(filepath, pages=pages, ocr=True, ocr_settings=OCR_MODES[ocr_mode], checkpoint=checkpoint,
+                             dates=dates, raw=raw)
+        return extractor(filepath, pages=pages, checkpoint=checkpoint, dates=dates, raw=raw)
+    return extractor.extract_credits(filepath, pages=pages, checkpoint=checkpoint, dates=dates, raw=raw)
+
+
+def _entry_to_row(bank: str, entry) -> Dict[str, Any]:
+    if bank == 'santander':
+        amt = Decimal(f"{float(entry.amount):.2f}")
+        date = entry.date or '-'
+        transaction_type = 'CRÉDITO'
+    else:
+        amt = entry.amount.quantize(Decimal('.01'), rounding=ROUND_DOWN)
+        date = entry.date
+        transaction_type = entry.transaction_type
+
+    date_ord = parse_date(date)
+    return {
+        'bank': bank,
+        'date': date,
+        'date_ord': date_ord,
+        'date_iso': to_iso(date_ord),
+        'type': transaction_type,
+        'description': entry.description,
+        'value': amt,
+        'amount': format_brl(amt),
+        'amount_plain': str(amt).replace('.', ','),
+        'page': getattr(entry, 'page', None)
+    }
+
+
+def extract_rows(bank: str, filepath: Union[str, BinaryIO], exclude_names: Optional[List[str]] = None,
+                 prefilter: bool = True, ocr_mode: Optional[str] = None,
+                 checkpoint_dir: Optional[str] = None,
+                 boilerplate_dir: Optional[str] = None,
+                 extractor=None,
+                 page_range: Optional[Collection[int]] = None,
+                 dates: Optional[DateWindow] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Executa o extrator do banco sobre um PDF e devolve as linhas normalizadas.
+
+    Args:
+        bank: Identificador do banco (chave de `BANK_LABELS`).
+        filepath: Caminho do PDF ou o PDF em memória (arquivo binário com
+            `seek`, ex.: membro de um ZIP, ver `COMMON.archive`).
+        exclude_names: Nomes (minúsculos) cujas transações devem ser ignoradas.
+        prefilter: Lê antes o texto cru das páginas (PyPDF2) e só passa pelo
+            pdfplumber as que têm o marcador do banco (`COMMON.prefilter`).
+        ocr_mode: Ativa o OCR das páginas escaneadas ("full" ou "table";
+            somente Santander). Lento: no app web roda no pool de OCR.
+        checkpoint_dir: Pasta dos checkpoints por página (`COMMON.checkpoint`):
+            uma extração interrompida do mesmo arquivo retoma da última
+            página concluída. None desativa.
+        boilerplate_dir: Pasta das listas de páginas sem lançamentos
+            (`COMMON.boilerplate`): páginas conhecidas são puladas antes do
+            pdfplumber e o resultado alimenta a lista. None desativa.
+        extractor: Extrator no lugar do compartilhado de `get_extractor`
+            (ex.: a configuração candidata do modo sombra, `COMMON.shadow`).
+        page_range: Só estas páginas (a partir de 1), combinadas com as
+            escolhidas pelo pré-filtro e pela lista de páginas sem lançamentos.
+        dates: Só as transações deste período; o extrator pula antes do
+            pdfplumber as páginas com datas todas fora dele e para de ler
+            extratos em ordem cronológica depois do fim.
+
+    Returns:
+        Tupla (linhas, quantidade de transações excluídas pelos nomes).
+
+    Raises:
+        ExtractionError: banco desconhecido, extrator indisponível ou falha
+            durante a leitura do PDF.
+    """
+    pages = set(page_range) if page_range is not None else None
+    prefilter = prefilter and bank in PAGE_MARKERS
+    skiplist = get_skiplist(boilerplate_dir, bank)
+    # Um só PdfReader para pré-filtro, impressões e datas (o extrator recebe o mesmo)
+    raw = None
+    if prefilter or skiplist is not None or dates is not None:
+        with span('raw'):
+            raw = RawPdf.open(filepath)
+
+    if prefilter and raw is not None:
+        with span('prefilter'):
+            report = plan_pages(bank, filepath, raw)
+        if report is not None:
+            logger.info('Pré-filtro %s %s', bank, report.summary())
+            pages = report.selected if pages is None else pages & report.selected
+
+    fingerprints = None
+    audited: Set[int] = set()
+    # Com período ou páginas escolhidas, página sem linha pode ter só lançamentos
+    # fora do filtro: nada é aprendido como página sem lançamentos
+    learning = page_range is None and dates is None
+    if skiplist is not None and raw is not None:
+        with span('fingerprint'):
+            fingerprints = fingerprint_pages(filepath, raw)
+    if fingerprints:
+        skipped = skiplist.skip_pages(fingerprints)
+        if skipped:
+            candidates = pages if pages is not None else range(1, len(fingerprints) + 1)
+            # Uma amostra das puladas é extraída mesmo assim: se render crédito,
+            # `learn` tira a impressão da lista
+            if learning:
+                audited = audit_sample(p for p in candidates if p in skipped)
+            pages = {p for p in candidates if p not in skipped or p in audited}
+            logger.info('Páginas sem lançamentos %s %s: %d puladas, %d conferidas',
+                        bank, source_name(filepath), len(skipped) - len(audited), len(audited))
+
+    checkpoint = None
+    if checkpoint_dir and bank in BANK_LABELS:
+        variant = ocr_variant(ocr_mode, OCR_MODES[ocr_mode]) if ocr_mode in OCR_MODES else ''
+        try:
+            checkpoint = open_checkpoint(checkpoint_dir, bank, filepath, variant=variant)
+        except OSError as exc:
+            logger.warning('Checkpoint indisponível em %s: %s', checkpoint_dir, exc)
+        else:
+            if checkpoint.resumed:
+                logger.info('Retomando %s %s: %d páginas já concluídas',
+                            bank, source_name(filepath), len(checkpoint.done))
+
+    try:
+        entries = _extract_entries(bank, filepath, pages, ocr_mode, checkpoint, extractor, dates, raw)
+    except ExtractionError:
+        raise
+    except Exception as exc:
+        raise ExtractionError('extraction_failed', str(exc)) from exc
+    if checkpoint is not None:
+        checkpoint.discard()
+
+    rows = [_entry_to_row(bank, e) for e in entries]
+    if fingerprints and learning:
+        wrong = audited & {r['page'] for r in rows}
+        if wrong:
+            logger.warning('Páginas sem lançamentos %s %s: páginas %s confirmadas renderam créditos',
+                           bank, source_name(filepath), sorted(wrong))
+        processed = pages if pages is not None else range(1, len(fingerprints) + 1)
+        try:
+            confirmed = skiplist.learn(fingerprints, processed, {r['page'] for r in rows})
+        except OSError as exc:
+            logger.warning('Lista de páginas sem lançamentos não gravada: %s', exc)
+        else:
+            if confirmed:
+                logger.info('Páginas sem lançamentos %s: %d novas impressões confirmadas', bank, len(confirmed))
+    return exclude_rows(rows, exclude_names)
+
+
+def exclude_rows(rows: List[Dict[str, Any]], exclude_names: Optional[List[str]]) -> Tuple[List[Dict[str, Any]], int]:
+    """Remove as linhas cuja descrição contém algum dos nomes informados."""
+    if not exclude_names:
+        return rows, 0
+    kept = [r for r in rows if not should_exclude_transaction(r['description'], exclude_names)]
+    return kept, len(rows) - len(kept)
+
+
+def row_to_json(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Versão serializável em JSON de uma linha (valores como string "1234.56")."""
+    return {
+        'bank': row['bank'],
+        'date': row['date'],
+        'date_iso': row.get('date_iso', ''),
+        'type': row['type'],
+        'description': row['description'],
+        'amount': str(row['value']),
+        'page': row['page']
+    }
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Ingestão contínua: observa pastas de entrada e extrai os extratos que chegam.
+
+Os PDFs que chegam por e-mail e scanner numa pasta compartilhada são
+processados sem ninguém rodar os scripts de cada banco:
+
+1. A cada `--interval` segundos as pastas são listadas (o nível de cima e
+   subpastas com o nome de um banco, ex.: entrada/itau/). Um arquivo só é
+   considerado pronto quando tamanho e data de modificação ficam parados por
+   `--settle` segundos e o PDF termina em %%EOF (cópia ainda em andamento
+   fica para a próxima volta). Arquivo parado por `STALE_AFTER x settle`
+   segundos sem ficar pronto (vazio ou sem %%EOF) vai para a quarentena.
+2. O banco vem da subpasta, do nome do arquivo ou da primeira página
+   (`COMMON.detect`).
+3. A extração roda num pool de processos (`--workers`), com no máximo
+   `2 x workers` arquivos em andamento; o resto espera na pasta (fila).
+4. O resultado vai para `<nome>.json` em `--results` (ou ao lado do PDF) e o
+   PDF vai para `--archive/<banco>/`; em caso de falha, para `--quarantine`
+   com `<nome>.error.json` explicando o motivo.
+
+A cada `--status-every` segundos o log mostra a fila, os arquivos em
+andamento e o ritmo (arquivos e transações por minuto); com `--status-file`
+o mesmo vai para um JSON.
+
+Uso:
+    python COMMON/ingest.py --watch /srv/extratos/entrada --archive /srv/extratos/processados \\
+        --quarantine /srv/extratos/quarentena [--results /srv/extratos/resultados] [--workers 4]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BASE_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.detect import detect_bank
+from COMMON.extraction import BANK_LABELS, ExtractionError, extract_rows, row_to_json
+
+logger = logging.getLogger(__name__)
+
+# Tentativas de um arquivo cujo processo de extração morreu (ex.: falta de memória)
+MAX_ATTEMPTS = 3
+# Janela do cálculo de ritmo
+RATE_WINDOW = 60.0
+# Múltiplo de `settle`: arquivo parado esse tempo sem ficar pronto (vazio ou
+# sem %%EOF) vai para a quarentena; com --once, arquivo que ainda muda depois
+# desse tempo não segura o fim da execução
+STALE_AFTER = 20
+
+
+@dataclass(frozen=True)
+class IngestOptions:
+    """Opções repassadas a cada extração (precisam ir para os processos do pool)."""
+    results_dir: Optional[str] = None
+    bank: Optional[str] = None
+    ocr_mode: Optional[str] = None
+    checkpoint_dir: Optional[str] = None
+    boilerplate_dir: Optional[str] = None
+
+
+def _result_path(path: str, options: IngestOptions) -> str:
+    name = os.path.splitext(os.path.basename(path))[0] + '.json'
+    return os.path.join(options.results_dir or os.path.dirname(path), name)
+
+
+def ingest_file(path: str, options: IngestOptions) -> Dict[str, Any]:
+    """
+    Extrai um PDF e grava o JSON do resultado. Roda num processo do pool.
+
+    Returns:
+        {'status': 'ok', 'bank', 'count', 'result', 'elapsed'} ou
+        {'status': 'error', 'code', 'message', 'bank', 'elapsed'}.
+    """
+    start = time.perf_counter()
+    bank = options.bank or detect_bank(path)
+    if bank is None:
+        return {'status': 'error', 'code': 'bank_unknown', 'bank': None, 'elapsed': round(time.perf_counter() - start, 3),
+                'message': 'Banco não identificado (PDF sem texto ou sem marca conhecida); '
+                           'coloque o arquivo na subpasta do banco.'}
+    try:
+        rows, _ = extract_rows(bank, path, checkpoint_dir=options.checkpoint_dir,
+                               boilerplate_dir=options.boilerplate_dir)
+        if not rows and options.ocr_mode and bank == 'santander':
+            rows, _ = extract_rows(bank, path, prefilter=False, ocr_mode=options.ocr_mode,
+                                   checkpoint_dir=options.checkpoint_dir)
+    except ExtractionError as exc:
+        return {'status': 'error', 'bank': bank, 'elapsed': round(time.perf_counter() - start, 3), **exc.to_dict()}
+
+    total = sum((r['value'] for r in rows), Decimal('0'))
+    result = _result_path(path, options)
+    os.makedirs(os.path.dirname(result) or '.', exist_ok=True)
+    with open(result, 'w', encoding='utf-8') as f:
+        json.dump({
+            'file': os.path.basename(path),
+            'bank': bank,
+            'count': len(rows),
+            'total': str(total.quantize(Decimal('.01'))),
+            'transactions': [row_to_json(r) for r in rows]
+        }, f, ensure_ascii=False, indent=2)
+    return {'status': 'ok', 'bank': bank, 'count': len(rows), 'result': result,
+            'elapsed': round(time.perf_counter() - start, 3)}
+
+
+def _has_eof(path: str) -> bool:
+    """PDF completo termina com %%EOF (às vezes seguido de espaços ou lixo curto)."""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 1024))
+            return b'%%EOF' in f.read()
+    except OSError:
+        return False
+
+
+class Debouncer:
+    """Arquivo pronto quando tamanho e mtime não mudam por `settle` segundos."""
+
+    def __init__(self, settle: float, clock: Callable[[], float] = time.monotonic):
+        self.settle = settle
+        self.clock = clock
+        # caminho -> (tamanho, mtime, última mudança, primeira vez visto)
+        self._seen: Dict[str, Tuple[int, float, float, float]] = {}
+
+    def observe(self, path: str, size: int, mtime: float) -> bool:
+        now = self.clock()
+        previous = self._seen.get(path)
+        if previous is None or previous[:2] != (size, mtime):
+            self._seen[path] = (size, mtime, now, previous[3] if previous else now)
+            return False
+        return size > 0 and now - previous[2] >= self.settle
+
+    def idle(self, path: str) -> float:
+        """Segundos desde a última mudança de tamanho ou mtime (0 se o arquivo não é conhecido)."""
+        seen = self._seen.get(path)
+        return self.clock() - seen[2] if seen else 0.0
+
+    def waiting(self, limit: float) -> int:
+        """Arquivos vistos pela primeira vez há menos de `limit` segundos."""
+        now = self.clock()
+        return sum(1 for seen in self._seen.values() if now - seen[3] < limit)
+
+    def forget(self, path: str) -> None:
+        self._seen.pop(path, None)
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def prune(self, present) -> None:
+        """Esquece arquivos que sumiram da pasta."""
+        for path in list(self._seen):
+            if path not in present:
+                del self._seen[path]
+
+
+def _ignore_sigint() -> None:
+    # Ctrl+C vai para o grupo de processos inteiro; quem decide parar é o processo principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _unique_path(directory: str, name: str) -> str:
+    stem, ext = os.path.splitext(name)
+    candidate = os.path.join(directory, name)
+    n = 1
+    while os.path.exists(candidate):
+        candidate = os.path.join(directory, f'{stem}-{n}{ext}')
+        n += 1
+    return candidate
+
+
+class IngestDaemon:
+    """Laço de observação das pastas, envio ao pool e destino dos arquivos."""
+
+    def __init__(self, watch_dirs: List[str], archive_dir: str, quarantine_dir: str,
+                 options: IngestOptions = IngestOptions(), workers: int = 2,
+                 interval: float = 2.0, settle: float = 3.0):
+        self.watch_dirs = [os.path.abspath(d) for d in watch_dirs]
+        self.archive_dir = archive_dir
+        self.quarantine_dir = quarantine_dir
+        self.options = options
+        self.workers = max(1, workers)
+        self.max_in_flight = 2 * self.workers
+        self.interval = interval
+        self.debouncer = Debouncer(settle)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._futures: Dict[Future, str] = {}
+        self._attempts: Dict[str, int] = {}
+        self._completed: Deque[Tuple[float, int]] = deque()
+        self._stop = False
+        self.backlog = 0
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+    # -- pastas -------------------------------------------------------------
+
+    def _candidates(self) -> List[str]:
+        paths = []
+        for directory in self.watch_dirs:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as exc:
+                logger.warning('Pasta %s inacessível: %s', directory, exc)
+                continue
+            for entry in entries:
+                if entry.name.startswith(('.', '~')):
+                    continue
+                if entry.is_dir() and entry.name in BANK_LABELS:
+                    try:
+                        paths.extend(e.path for e in os.scandir(entry.path)
+                                     if e.is_file() and e.name.lower().endswith('.pdf') and not e.name.startswith(('.', '~')))
+                    except OSError:
+                        continue
+                elif entry.is_file() and entry.name.lower().endswith('.pdf'):
+                    paths.append(entry.path)
+        return paths
+
+    @property
+    def stale_after(self) -> float:
+        return STALE_AFTER * self.debouncer.settle
+
+    def scan(self) -> List[str]:
+        """
+        Arquivos prontos (estáveis e completos) que ainda não estão em andamento.
+        Os parados há `stale_after` segundos sem ficar prontos vão para a quarentena.
+        """
+        in_flight = set(self._futures.values())
+        paths = self._candidates()
+        self.debouncer.prune(set(paths))
+        ready = []
+        for path in paths:
+            if path in in_flight:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if self.debouncer.observe(path, st.st_size, st.st_mtime) and _has_eof(path):
+                ready.append((st.st_mtime, path))
+            elif self.debouncer.idle(path) >= self.stale_after:
+                self._quarantine_incomplete(path, st.st_size)
+        # Os mais antigos primeiro
+        return [path for _, path in sorted(ready)]
+
+    def _quarantine_incomplete(self, path: str, size: int) -> None:
+        if size == 0:
+            code, message = 'empty_file', 'Arquivo vazio (0 bytes).'
+        else:
+            code, message = 'incomplete_file', 'PDF sem %%EOF: cópia interrompida ou arquivo danificado.'
+        self._finish(path, {'status': 'error', 'code': code, 'bank': None,
+                            'message': f'{message} Parado há {self.stale_after:.0f}s sem ficar completo.'})
+
+    # -- pool ---------------------------------------------------------------
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_ignore_sigint)
+        return self._executor
+
+    def _submit(self, ready: List[str]) -> None:
+        free = self.max_in_flight - len(self._futures)
+        for path in ready[:max(0, free)]:
+            self._futures[self._get_executor().submit(ingest_file, path, self.options)] = path
+        self.backlog = max(0, len(ready) - max(0, free))
+
+    def _collect(self, timeout: float) -> None:
+        if not self._futures:
+            time.sleep(timeout)
+            return
+        finished, _ = wait(list(self._futures), timeout=timeout, return_when=FIRST_COMPLETED)
+        broken = False
+        for future in finished:
+            path = self._futures.pop(future)
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                broken = True
+                self._retry_or_quarantine(path, 'worker_died', 'O processo de extração morreu (falta de memória?).')
+                continue
+            except Exception as exc:
+                result = {'status': 'error', 'code': 'extraction_failed', 'message': str(exc), 'bank': None}
+            self._finish(path, result)
+        if broken:
+            # Um processo morto inutiliza o pool inteiro: recria e reenvia o que estava nele
+            for future, path in list(self._futures.items()):
+                future.cancel()
+                self._retry_or_quarantine(path, 'worker_died', 'O processo de extração morreu (falta de memória?).')
+            self._futures.clear()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _retry_or_quarantine(self, path: str, code: str, message: str) -> None:
+        attempts = self._attempts.get(path, 0) + 1
+        self._attempts[path] = attempts
+        if attempts >= MAX_ATTEMPTS:
+            self._finish(path, {'status': 'error', 'code': code, 'message': message, 'bank': None})
+        else:
+            logger.warning('%s: %s (tentativa %d de %d; o checkpoint retoma as páginas prontas)',
+                           os.path.basename(path), message, attempts, MAX_ATTEMPTS)
+            self.debouncer.forget(path)
+
+    def _finish(self, path: str, result: Dict[str, Any]) -> None:
+        self._attempts.pop(path, None)
+        self.debouncer.forget(path)
+        name = os.path.basename(path)
+        try:
+            if result['status'] == 'ok':
+                target_dir = os.path.join(self.archive_dir, result['bank'])
+                os.makedirs(target_dir, exist_ok=True)
+                shutil.move(path, _unique_path(target_dir, name))
+                self.done += 1
+                self._completed.append((time.monotonic(), result['count']))
+                logger.info('%s: %s, %d transações em %.1fs -> %s', name, result['bank'], result['count'],
+                            result['elapsed'], result['result'])
+            else:
+                os.makedirs(self.quarantine_dir, exist_ok=True)
+                target = _unique_path(self.quarantine_dir, name)
+                shutil.move(path, target)
+                with open(os.path.splitext(target)[0] + '.error.json', 'w', encoding='utf-8') as f:
+                    json.dump({'file': name, **{k: v for k, v in result.items() if k != 'status'}},
+                              f, ensure_ascii=False, indent=2)
+                self.failed += 1
+                logger.warning('%s: quarentena (%s: %s)', name, result.get('code'), result.get('message'))
+        except OSError as exc:
+            logger.error('%s: não foi possível mover o arquivo: %s', name, exc)
+
+    # -- situação -----------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        while self._completed and now - self._completed[0][0] > RATE_WINDOW:
+            self._completed.popleft()
+        window = min(RATE_WINDOW, max(now - self.started, 1e-6))
+        return {
+            'queue': self.backlog,
+            'in_flight': len(self._futures),
+            'done': self.done,
+            'failed': self.failed,
+            'files_per_min': round(len(self._completed) * 60 / window, 1),
+            'transactions_per_min': round(sum(n for _, n in self._completed) * 60 / window, 1),
+        }
+
+    def _report(self, status_file: Optional[str]) -> None:
+        s = self.stats()
+        logger.info('fila=%d em andamento=%d concluídos=%d falhas=%d ritmo=%.1f arquivos/min (%.0f transações/min)',
+                    s['queue'], s['in_flight'], s['done'], s['failed'], s['files_per_min'], s['transactions_per_min'])
+        if status_file:
+            tmp = status_file + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({**s, 'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S')}, f)
+            os.replace(tmp, status_file)
+
+    # -- laço ---------------------------------------------------------------
+
+    def stop(self, *_args) -> None:
+        self._stop = True
+
+    def run(self, once: bool = False, status_every: float = 30.0, status_file: Optional[str] = None) -> None:
+        """
+        Observa as pastas até `stop()` (SIGINT/SIGTERM). Com `once`, processa o
+        que já está nas pastas e termina.
+        """
+        logger.info('Observando %s com %d processos', ', '.join(self.watch_dirs), self.workers)
+        last_report = time.monotonic()
+        try:
+            while not self._stop:
+                ready = self.scan()
+                self._submit(ready)
+                # Arquivo que ainda muda depois de `stale_after` (cópia sem fim) fica para a próxima execução
+                if once and not ready and not self._futures and not self.debouncer.waiting(self.stale_after):
+                    break
+                self._collect(self.interval)
+                if time.monotonic() - last_report >= status_every:
+                    self._report(status_file)
+                    last_report = time.monotonic()
+            # Os que já estão em andamento terminam; os da fila ficam na pasta para a próxima execução
+            while self._futures:
+                self._collect(self.interval)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+            self._report(status_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Observa pastas e extrai os extratos que chegam')
+    parser.add_argument('--watch', '-w', action='append', required=True,
+                        help='Pasta de entrada (repita para várias); subpastas com o nome do banco definem o banco')
+    parser.add_argument('--archive', required=True, help='Para onde vão os PDFs processados (subpasta por banco)')
+    parser.add_argument('--quarantine', required=True, help='Para onde vão os PDFs com falha, com <nome>.error.json')
+    parser.add_argument('--results', help='Pasta dos JSON de resultado (padrão: ao lado do PDF de entrada)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Processos de extração')
+    parser.add_argument('--interval', type=float, default=2.0, help='Segundos entre varreduras das pastas')
+    parser.add_argument('--settle', type=float, default=3.0,
+                        help='Segundos sem mudança de tamanho antes de considerar o arquivo completo')
+    parser.add_argument('--bank', '-b', choices=sorted(BANK_LABELS), help='Força o banco (sem detecção)')
+    parser.add_argument('--ocr-mode', choices=('full', 'table'),
+                        help='OCR para PDFs do Santander escaneados (requer tesseract + poppler)')
+    parser.add_argument('--checkpoint-dir', help='Checkpoint por página (retoma arquivos interrompidos)')
+    parser.add_argument('--boilerplate-dir', help='Listas de páginas sem lançamentos (COMMON/boilerplate.py)')
+    parser.add_argument('--status-every', type=float, default=30.0, help='Segundos entre linhas de situação')
+    parser.add_argument('--status-file', help='Grava a situação (fila, ritmo) neste JSON')
+    parser.add_argument('--once', action='store_true', help='Processa o que já está nas pastas e termina')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    # O log por arquivo de extraction.py (pré-filtro) ficaria repetitivo com centenas de arquivos
+    logging.getLogger('COMMON.extraction').setLevel(logging.WARNING)
+
+    options = IngestOptions(results_dir=args.results, bank=args.bank, ocr_mode=args.ocr_mode,
+                            checkpoint_dir=args.checkpoint_dir, boilerplate_dir=args.boilerplate_dir)
+    daemon = IngestDaemon(args.watch, args.archive, args.quarantine, options, workers=args.workers,
+                          interval=args.interval, settle=args.settle)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    daemon.run(once=args.once, status_every=args.status_every, status_file=args.status_file)
+
+
+if __name__ == '__main__':
+    main()
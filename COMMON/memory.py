@@ -0,0 +1,199 @@
+"""
+Memória por requisição, por arquivo e por página (tracemalloc + RSS).
+
+Opcional: com `tracemalloc` ligado, toda alocação Python guarda de onde veio.
+O pdfminer faz milhões de alocações pequenas, então a extração fica de 3 a 5
+vezes mais lenta (640 linhas do Itaú: 4s viram 19s) e o RSS inclui a
+contabilidade do próprio tracemalloc. Por isso só liga quando pedido
+(`MEMORY_TRACE` no app web, `--memory` no `profiler.py`).
+
+A medição vem junto com os trechos de `COMMON/spans.py`: com um
+`MemoryTracker` instalado (`spans.set_memory_tracker`), cada trecho
+acrescenta aos seus atributos:
+
+- `mem_peak_kb`: pico de memória alocada (tracemalloc) acima do início do trecho;
+- `mem_retained_kb`: o que continuou alocado no fim do trecho;
+- `rss_delta_kb`: variação do RSS do processo (inclui o que não é Python,
+  como as imagens do OCR e os buffers do poppler).
+
+Nos trechos em `snapshot_spans` (arquivo inteiro e requisição), compara
+também os snapshots do início e do fim: `mem_top` traz as linhas que mais
+alocaram e continuavam vivas no fim do trecho e `mem_modules` agrupa por
+biblioteca (pdfminer, pdfplumber, PIL, ITAU/itau_extractor.py...).
+
+O pico do tracemalloc é um só para o processo: trechos em threads
+diferentes ao mesmo tempo (`EXTRACT_WORKERS` > 1, duas requisições no mesmo
+worker) enxergam o pico um do outro. Para números limpos de um PDF, use
+`python COMMON/profiler.py -b itau extrato.pdf --memory`.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import tracemalloc
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+# Trechos pequenos e numerosos demais para medir um a um
+SKIPPED_SPANS = frozenset({'color'})
+# Alocações que não interessam (o próprio tracemalloc, imports). Descartadas depois
+# de agrupar: `Snapshot.filter_traces` leva dezenas de segundos com 1 milhão de traces
+_IGNORED_FILES = frozenset({tracemalloc.__file__, '<frozen importlib._bootstrap>',
+                            '<frozen importlib._bootstrap_external>', '<unknown>'})
+
+
+def rss_bytes() -> Optional[int]:
+    """RSS atual do processo (psutil ou /proc; None se nenhum estiver disponível)."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _module_of(filename: str) -> str:
+    """Biblioteca dona do arquivo: pacote do site-packages, arquivo do repositório ou módulo da stdlib."""
+    path = filename.replace('\\', '/')
+    if 'site-packages/' in path:
+        return path.split('site-packages/', 1)[1].split('/', 1)[0]
+    root = REPO_ROOT.replace('\\', '/') + '/'
+    if path.startswith(root):
+        return path[len(root):]
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _site(frame: tracemalloc.Frame) -> str:
+    path = frame.filename.replace('\\', '/')
+    if 'site-packages/' in path:
+        path = path.split('site-packages/', 1)[1]
+    else:
+        root = REPO_ROOT.replace('\\', '/') + '/'
+        path = path[len(root):] if path.startswith(root) else os.path.basename(path)
+    return f'{path}:{frame.lineno}'
+
+
+def top_allocations(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot,
+                    limit: int = 10) -> Dict[str, List[Dict[str, Any]]]:
+    """Linhas e bibliotecas que mais cresceram entre dois snapshots (em KB)."""
+    diff = [d for d in after.compare_to(before, 'lineno')
+            if d.size_diff > 0 and d.traceback[0].filename not in _IGNORED_FILES]
+    modules: Dict[str, int] = defaultdict(int)
+    for d in diff:
+        modules[_module_of(d.traceback[0].filename)] += d.size_diff
+    return {
+        'mem_top': [{'site': _site(d.traceback[0]), 'kb': round(d.size_diff / 1024), 'count': d.count_diff}
+                    for d in diff[:limit]],
+        'mem_modules': [{'module': name, 'kb': round(size / 1024)}
+                        for name, size in sorted(modules.items(), key=lambda i: -i[1])[:limit]],
+    }
+
+
+@dataclass
+class _Window:
+    name: str
+    base: int
+    peak: int
+    rss: Optional[int]
+    snapshot: Optional[tracemalloc.Snapshot]
+
+
+class MemoryTracker:
+    """
+    Janelas de medição abertas e fechadas pelos trechos (`enter`/`exit`).
+
+    Janelas aninhadas (requisição > arquivo > página) convivem: antes de
+    zerar o pico para uma janela nova, o pico até ali é repassado a todas as
+    abertas.
+    """
+
+    def __init__(self, frames: int = 1, top: int = 10, snapshot_spans=('request', 'file')):
+        self.frames = frames
+        self.top = top
+        self.snapshot_spans = frozenset(snapshot_spans)
+        self._lock = threading.Lock()
+        self._open: List[_Window] = []
+        self.measured = 0
+        self.max_peak_kb: Dict[str, int] = {}
+        self.last: Optional[Dict[str, Any]] = None
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def measures(self, name: str) -> bool:
+        return name not in SKIPPED_SPANS and tracemalloc.is_tracing()
+
+    def _harvest(self) -> None:
+        _, peak = tracemalloc.get_traced_memory()
+        for window in self._open:
+            if peak > window.peak:
+                window.peak = peak
+
+    def enter(self, name: str) -> _Window:
+        snapshot = tracemalloc.take_snapshot() if name in self.snapshot_spans else None
+        with self._lock:
+            self._harvest()
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            window = _Window(name, current, current, rss_bytes(), snapshot)
+            self._open.append(window)
+        return window
+
+    def exit(self, window: _Window) -> Dict[str, Any]:
+        with self._lock:
+            self._harvest()
+            self._open.remove(window)
+            current, _ = tracemalloc.get_traced_memory()
+        rss = rss_bytes()
+        result: Dict[str, Any] = {
+            'mem_peak_kb': round((window.peak - window.base) / 1024),
+            'mem_retained_kb': round((current - window.base) / 1024),
+        }
+        if rss is not None and window.rss is not None:
+            result['rss_delta_kb'] = round((rss - window.rss) / 1024)
+        if window.snapshot is not None:
+            result.update(top_allocations(window.snapshot, tracemalloc.take_snapshot(), self.top))
+
+        with self._lock:
+            self.measured += 1
+            if result['mem_peak_kb'] > self.max_peak_kb.get(window.name, -1):
+                self.max_peak_kb[window.name] = result['mem_peak_kb']
+            if window.name == 'request':
+                self.last = result
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        current, _ = tracemalloc.get_traced_memory()
+        rss = rss_bytes()
+        with self._lock:
+            return {
+                'traced_kb': round(current / 1024),
+                'rss_kb': round(rss / 1024) if rss is not None else None,
+                'measured': self.measured,
+                'max_peak_kb': dict(self.max_peak_kb),
+                'last_request': self.last,
+            }
+
+
+def format_breakdown(record: Dict[str, Any]) -> List[str]:
+    """Linhas de texto com pico, RSS e maiores alocações de um trecho medido (para log e terminal)."""
+    head = f"pico {record.get('mem_peak_kb', 0) / 1024:.1f} MB, retido {record.get('mem_retained_kb', 0) / 1024:.1f} MB"
+    if 'rss_delta_kb' in record:
+        head += f", RSS {record['rss_delta_kb'] / 1024:+.1f} MB"
+    lines = [head]
+    if record.get('mem_modules'):
+        lines.append('por biblioteca: ' + ', '.join(f"{m['module']} {m['kb'] / 1024:.1f} MB"
+                                                     for m in record['mem_modules'][:5]))
+    for item in record.get('mem_top', []):
+        lines.append(f"  {item['kb']:>8} KB {item['count']:>8}x  {item['site']}")
+    return lines
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Primeira camada da extração: escolhe as páginas que passam pelo pdfplumber.
+
+O texto cru de cada página é lido com o PyPDF2 (sem análise de layout) e
+testado contra o marcador do banco: no Nubank só interessam páginas com
+"Total de entradas", no PicPay páginas com "Pix Recebido" e assim por diante.
+Só as páginas que casam (ou cujo texto cru não pôde ser lido, como páginas
+escaneadas) seguem para a segunda camada, a extração completa com pdfplumber.
+
+Cada página recebe uma decisão registrada no relatório; use
+`python COMMON/prefilter.py --verify` para conferir, contra a extração
+completa, que nenhum crédito ficou em página pulada.
+
+Com um período pedido (`plan_date_pages`), o mesmo texto cru decide também
+pelas datas: página cujas datas de início de linha (as dos lançamentos;
+cabeçalho "Período: ... a ..." e rodapé "emitido em ..." ficam de fora)
+caem todas antes ou todas depois do período não passa pelo pdfplumber, e
+num extrato em ordem cronológica as páginas depois do fim nem são lidas
+(`COMMON.dates.DateCutoff`). Páginas sem data no texto cru (escaneadas,
+resumos) seguem para a extração.
+
+Pré-filtro, impressões de páginas (`COMMON.boilerplate`) e datas leem o
+mesmo `RawPdf`: o PyPDF2 analisa o arquivo uma vez e o texto cru de cada
+página é extraído uma vez, antes de o pdfplumber abrir o arquivo.
+
+Uso:
+    python COMMON/prefilter.py --bank nubank extrato.pdf [--verify]
+    python COMMON/prefilter.py --bank itau extrato.pdf --from 01/10/2025 --to 31/12/2025
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Collection, Dict, List, Optional, Set, Tuple, Union
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BASE_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.dates import DateCutoff, DateWindow, parse_date
+from COMMON.spans import span
+from COMMON.store import source_name
+
+try:
+    from PyPDF2 import PdfReader
+    HAS_PYPDF2 = True
+except ImportError:
+    HAS_PYPDF2 = False
+
+
+def _fold(text: str) -> str:
+    """Maiúsculas, sem acentos e sem espaços (o texto cru do PyPDF2 varia no espaçamento)."""
+    folded = unicodedata.normalize('NFKD', text.upper())
+    return ''.join(ch for ch in folded if not unicodedata.combining(ch) and not ch.isspace())
+
+
+# Marcadores de página relevante por banco (basta um). Devem ser no máximo tão
+# restritivos quanto o filtro de linhas do extrator: toda linha de crédito
+# aceita pelo extrator contém pelo menos um deles. Itaú e Santander ficam de
+# fora: em extratos de conta corrente quase toda página tem algum crédito e a
+# leitura extra só somaria tempo.
+PAGE_MARKERS: Dict[str, Tuple[str, ...]] = {
+    'nubank': ('Total de entradas',),
+    'picpay': ('Pix Recebido',),
+    'mercadopago': ('Recebid',),
+}
+_FOLDED_MARKERS = {bank: tuple((_fold(m), m) for m in markers) for bank, markers in PAGE_MARKERS.items()}
+
+# Data no início da linha do texto cru: dd/mm/aaaa, dd/mm/aa, dd-mm-aaaa ou "15 JAN 2025"
+_LINE_DATE = re.compile(r'^\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{1,2}\s+[A-Za-z]{3}\s+\d{4})(?![\d/-])', re.MULTILINE)
+
+# Motivos de página pulada, para o resumo
+SKIP_REASONS = {
+    'no_marker': 'sem marcador',
+    'before': 'antes do período',
+    'after': 'depois do período',
+    'stopped': 'depois da parada antecipada',
+}
+
+
+class RawPdf:
+    """
+    Um PdfReader (PyPDF2) por arquivo, com o texto cru de cada página lido
+    uma vez e guardado para as outras leituras da mesma extração.
+    """
+
+    def __init__(self, filepath: Union[str, BinaryIO]):
+        self.filepath = filepath
+        self.pages = PdfReader(filepath).pages
+        self.count = len(self.pages)
+        self._texts: Dict[int, Union[str, Exception]] = {}
+
+    @classmethod
+    def open(cls, filepath: Union[str, BinaryIO]) -> Optional['RawPdf']:
+        """O arquivo aberto, ou None se o PyPDF2 não está disponível ou não abriu o arquivo."""
+        if not HAS_PYPDF2:
+            return None
+        try:
+            return cls(filepath)
+        except Exception:
+            return None
+
+    def page(self, page_num: int):
+        """Página do PyPDF2 (a partir de 1)."""
+        return self.pages[page_num - 1]
+
+    def text(self, page_num: int) -> str:
+        """Texto cru da página (a partir de 1); repete o erro da primeira leitura."""
+        text = self._texts.get(page_num)
+        if text is None:
+            try:
+                text = self.page(page_num).extract_text() or ''
+            except Exception as exc:
+                text = exc
+            self._texts[page_num] = text
+        if isinstance(text, Exception):
+            raise text
+        return text
+
+
+def open_raw(filepath: Union[str, BinaryIO], raw: Optional[RawPdf]) -> Optional[RawPdf]:
+    """`raw` quando o chamador já abriu o arquivo; senão abre agora."""
+    return raw if raw is not None else RawPdf.open(filepath)
+
+
+@dataclass
+class PageDecision:
+    """Decisão da primeira camada para uma página."""
+    page: int
+    full_extraction: bool
+    # 'marker', 'no_marker', 'no_text' ou 'error'; pelo período: 'in_window',
+    # 'no_date', 'before', 'after' ou 'stopped' (nem lida)
+    reason: str
+    marker: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'page': self.page, 'full_extraction': self.full_extraction,
+                'reason': self.reason, 'marker': self.marker}
+
+
+@dataclass
+class PrefilterReport:
+    """Decisões de todas as páginas de um PDF."""
+    bank: str
+    filepath: Union[str, BinaryIO]
+    decisions: List[PageDecision] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def pages_total(self) -> int:
+        return len(self.decisions)
+
+    @property
+    def selected(self) -> Set[int]:
+        """Páginas (a partir de 1) que seguem para o pdfplumber."""
+        return {d.page for d in self.decisions if d.full_extraction}
+
+    @property
+    def skipped(self) -> List[int]:
+        return [d.page for d in self.decisions if not d.full_extraction]
+
+    def summary(self) -> str:
+        reasons = Counter(d.reason for d in self.decisions if not d.full_extraction)
+        detail = ', '.join(f'{n} {SKIP_REASONS.get(r, r)}' for r, n in reasons.items())
+        return (f'{source_name(self.filepath)}: {len(self.selected)}/{self.pages_total} páginas '
+                f'para extração completa, {len(self.skipped)} puladas{f" ({detail})" if detail else ""} '
+                f'({self.elapsed * 1000:.0f} ms)')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'bank': self.bank,
+            'pages_total': self.pages_total,
+            'pages_selected': sorted(self.selected),
+            'pages_skipped': self.skipped,
+            'elapsed_ms': round(self.elapsed * 1000, 1),
+            'decisions': [d.to_dict() for d in self.decisions]
+        }
+
+
+def plan_pages(bank: str, filepath: Union[str, BinaryIO],
+               raw: Optional[RawPdf] = None) -> Optional[PrefilterReport]:
+    """
+    Lê o texto cru de cada página e decide quais vão para a extração completa.
+
+    `raw` é o arquivo já aberto pelo chamador (`RawPdf`), compartilhado com
+    as outras leituras de texto cru.
+
+    Returns:
+        O relatório com as decisões, ou None quando não há pré-filtro para o
+        banco ou o PyPDF2 não conseguiu abrir o arquivo (tudo segue para o
+        pdfplumber, como antes).
+    """
+    markers = _FOLDED_MARKERS.get(bank)
+    if not markers or not HAS_PYPDF2:
+        return None
+
+    start = time.perf_counter()
+    raw = open_raw(filepath, raw)
+    if raw is None:
+        return None
+    try:
+        report = PrefilterReport(bank=bank, filepath=filepath)
+        for page_num in range(1, raw.count + 1):
+            try:
+                text = _fold(raw.text(page_num))
+            except Exception:
+                report.decisions.append(PageDecision(page_num, True, 'error'))
+                continue
+            if not text:
+                # Página sem camada de texto (escaneada): só a segunda camada/OCR decide
+                report.decisions.append(PageDecision(page_num, True, 'no_text'))
+                continue
+            marker = next((original for folded, original in markers if folded in text), None)
+            if marker:
+                report.decisions.append(PageDecision(page_num, True, 'marker', marker))
+            else:
+                report.decisions.append(PageDecision(page_num, False, 'no_marker'))
+    except Exception:
+        return None
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def parse_page_range(text: Optional[str]) -> Optional[Set[int]]:
+    """
+    "1-3,7" -> {1, 2, 3, 7} (páginas a partir de 1); None para texto vazio.
+
+    Raises:
+        ValueError: intervalo malformado, invertido ou com página 0.
+    """
+    if not text or not text.strip():
+        return None
+    pages: Set[int] = set()
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition('-')
+        try:
+            lo = int(first)
+            hi = int(last) if sep else lo
+        except ValueError:
+            raise ValueError(f'Intervalo de páginas inválido: "{part}" (use por exemplo 1-3,7).') from None
+        if lo < 1 or hi < lo:
+            raise ValueError(f'Intervalo de páginas inválido: "{part}".')
+        pages.update(range(lo, hi + 1))
+    return pages or None
+
+
+def page_dates(text: str) -> List[int]:
+    """Ordinais das datas no início das linhas de um texto cru de página."""
+    dates = (parse_date(m.group(1)) for m in _LINE_DATE.finditer(text))
+    return [d for d in dates if d is not None]
+
+
+def plan_date_pages(filepath: Union[str, BinaryIO], window: DateWindow,
+                    pages: Optional[Collection[int]] = None,
+                    raw: Optional[RawPdf] = None) -> Optional[PrefilterReport]:
+    """
+    Decide pelo texto cru (PyPDF2) quais páginas podem ter lançamentos no período.
+
+    Só as páginas de `pages` (todas, se None) são lidas e entram no relatório.
+    `raw` é o arquivo já aberto pelo chamador, como em `plan_pages`.
+
+    Returns:
+        O relatório, ou None se o PyPDF2 não estiver disponível ou não abrir o
+        arquivo (as páginas seguem todas para o extrator).
+    """
+    if not HAS_PYPDF2:
+        return None
+
+    start = time.perf_counter()
+    cutoff = DateCutoff(window)
+    stopped = False
+    raw = open_raw(filepath, raw)
+    if raw is None:
+        return None
+    try:
+        report = PrefilterReport(bank='', filepath=filepath)
+        for page_num in range(1, raw.count + 1):
+            if pages is not None and page_num not in pages:
+                continue
+            if stopped:
+                report.decisions.append(PageDecision(page_num, False, 'stopped'))
+                continue
+            try:
+                dates = page_dates(raw.text(page_num))
+            except Exception:
+                report.decisions.append(PageDecision(page_num, True, 'error'))
+                continue
+            if not dates:
+                report.decisions.append(PageDecision(page_num, True, 'no_date'))
+                continue
+            stopped = cutoff.past_end(dates)
+            first, last = min(dates), max(dates)
+            if window.excludes(first, last):
+                reason = 'before' if window.start is not None and last < window.start else 'after'
+                report.decisions.append(PageDecision(page_num, False, reason))
+            else:
+                report.decisions.append(PageDecision(page_num, True, 'in_window'))
+    except Exception:
+        return None
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def date_pages(filepath: Union[str, BinaryIO], window: Optional[DateWindow],
+               pages: Optional[Collection[int]] = None,
+               raw: Optional[RawPdf] = None) -> Optional[Collection[int]]:
+    """`pages` reduzidas às que podem ter lançamentos em `window` (usado pelos extratores antes do pdfplumber)."""
+    if window is None:
+        return pages
+    with span('dates') as s:
+        report = plan_date_pages(filepath, window, pages, raw)
+        if report is not None:
+            s.set(selected=len(report.selected), skipped=len(report.skipped))
+    return pages if report is None else report.selected
+
+
+def main():
+    from COMMON.extraction import ExtractionError, extract_rows
+
+    parser = argparse.ArgumentParser(description='Mostra as páginas escolhidas pela primeira camada de extração')
+    parser.add_argument('pdfs', nargs='+', help='PDFs dos extratos')
+    parser.add_argument('--bank', '-b', required=True, help='Banco dos extratos (itau, santander, nubank, picpay, mercadopago)')
+    parser.add_argument('--verify', action='store_true',
+                        help='Extrai também o PDF inteiro e confere que nenhum crédito ficou em página pulada')
+    parser.add_argument('--from', dest='date_from', help='Mostra as páginas escolhidas pelo período a partir desta data')
+    parser.add_argument('--to', dest='date_to', help='... até esta data')
+    parser.add_argument('--no-early-stop', action='store_true', help='Sem parada antecipada depois do fim do período')
+    args = parser.parse_args()
+    try:
+        window = DateWindow.parse(args.date_from, args.date_to, stop_early=not args.no_early_stop)
+    except ValueError as e:
+        parser.error(str(e))
+
+    failures = 0
+    for path in args.pdfs:
+        report = plan_pages(args.bank, path) if window is None else plan_date_pages(path, window)
+        if report is None:
+            print(f'{path}: sem pré-filtro para "{args.bank}" (todas as páginas vão para o pdfplumber)')
+            continue
+        print(report.summary())
+        for d in report.decisions:
+            status = 'extrair' if d.full_extraction else 'pular'
+            print(f'  página {d.page:>4}: {status:<8} {d.reason}{f" ({d.marker})" if d.marker else ""}')
+
+        if args.verify:
+            try:
+                full, _ = extract_rows(args.bank, path, prefilter=False)
+                tiered, _ = extract_rows(args.bank, path, prefilter=window is None, dates=window)
+            except ExtractionError as e:
+                print(f'  erro ao verificar: {e.message}')
+                failures += 1
+                continue
+            if window is not None:
+                full = [r for r in full if window.contains(r['date_ord'])]
+            lost = [r for r in full if r['page'] in set(report.skipped)]
+            if lost or len(full) != len(tiered):
+                failures += 1
+                print(f'  ATENÇÃO: {len(full)} créditos na extração completa, {len(tiered)} com pré-filtro')
+                for r in lost:
+                    print(f"    página {r['page']}: {r['date']} {r['description']} {r['amount']}")
+            else:
+                print(f'  ok: {len(full)} créditos nas duas extrações')
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Profiler por amostragem das pilhas Python, sem reiniciar o processo.
+
+A thread que chama `sample()` acorda a cada `interval` segundos, lê as
+pilhas de todas as outras threads (`sys._current_frames()`) e conta cada
+pilha vista. Nada é instalado nas threads amostradas (sem `sys.setprofile`):
+o custo é só o da leitura das pilhas, algumas dezenas de microssegundos por
+amostra, e some quando a amostragem termina.
+
+A saída é o formato "collapsed" (uma pilha por linha, do topo até a função
+em execução, separada por ';', seguida da contagem), lido direto por
+flamegraph.pl, speedscope e inferno. Cada frame aparece como
+`arquivo.py:função` (ex.: `itau_extractor.py:_find_color_for_text_on_page`).
+
+Threads paradas esperando (lock, fila, socket) são descartadas por padrão:
+o que interessa é onde a CPU vai.
+
+Uso para um PDF local:
+    python COMMON/profiler.py -b itau extrato.pdf -o extrato.folded
+    flamegraph.pl extrato.folded > extrato.svg
+
+Com `--memory`, em vez das pilhas mede a memória da extração (tracemalloc e
+RSS, ver `COMMON/memory.py`): pico e maiores alocações do arquivo e pico por
+página.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BASE_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_INTERVAL = 0.01
+# Módulos em que uma thread parada fica esperando (não gasta CPU)
+IDLE_MODULES = frozenset({'threading.py', 'selectors.py', 'socket.py', 'queue.py', 'socketserver.py', 'ssl.py'})
+
+
+@dataclass
+class Profile:
+    stacks: Counter = field(default_factory=Counter)
+    samples: int = 0
+    idle_samples: int = 0
+    seconds: float = 0.0
+    sampling_seconds: float = 0.0
+
+    @property
+    def overhead(self) -> float:
+        """Fração do tempo gasta lendo pilhas (com o GIL; as outras threads param nesse intervalo)."""
+        return self.sampling_seconds / self.seconds if self.seconds else 0.0
+
+    def collapsed(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int = 20, key: str = 'self') -> List[Dict[str, Any]]:
+        """Funções com mais amostras por `self` (executando) ou `total` (em qualquer ponto da pilha)."""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        ranking = own if key == 'self' else total
+        return [{'function': fn, 'self': own[fn], 'total': total[fn]} for fn, _ in ranking.most_common(limit)]
+
+    def to_dict(self, limit: int = 20) -> Dict[str, Any]:
+        return {
+            'samples': self.samples,
+            'idle_samples': self.idle_samples,
+            'seconds': round(self.seconds, 3),
+            'overhead': round(self.overhead, 4),
+            'top_self': self.top(limit, 'self'),
+            'top_total': self.top(limit, 'total'),
+        }
+
+
+_labels: Dict[Any, str] = {}
+
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        label = f'{os.path.basename(code.co_filename)}:{code.co_name}'
+        _labels[code] = label
+    return label
+
+
+def sample(seconds: float, interval: float = DEFAULT_INTERVAL, include_idle: bool = False,
+           exclude: Iterable[int] = (), stop: Optional[threading.Event] = None) -> Profile:
+    """
+    Amostra as pilhas das outras threads por `seconds` segundos (bloqueia a thread atual).
+
+    Args:
+        interval: Segundos entre amostras (0,01 = 100 por segundo).
+        include_idle: Mantém as amostras de threads esperando (lock, socket).
+        exclude: Identificadores de threads a ignorar, além da atual.
+        stop: Encerra antes do prazo quando sinalizado.
+    """
+    skip = set(exclude) | {threading.get_ident()}
+    profile = Profile()
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        t0 = time.perf_counter()
+        if t0 >= deadline or (stop is not None and stop.is_set()):
+            break
+        for ident, frame in sys._current_frames().items():
+            if ident in skip:
+                continue
+            if not include_idle and os.path.basename(frame.f_code.co_filename) in IDLE_MODULES:
+                profile.idle_samples += 1
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            profile.stacks[';'.join(stack)] += 1
+            profile.samples += 1
+        spent = time.perf_counter() - t0
+        profile.sampling_seconds += spent
+        if interval > spent:
+            time.sleep(interval - spent)
+    profile.seconds = time.perf_counter() - start
+    return profile
+
+
+def main():
+    from COMMON.extraction import BANK_LABELS, ExtractionError, extract_rows
+
+    parser = argparse.ArgumentParser(description='Pilhas amostradas da extração de um PDF (formato collapsed)')
+    parser.add_argument('pdf')
+    parser.add_argument('--bank', '-b', required=True, choices=sorted(BANK_LABELS))
+    parser.add_argument('--out', '-o', help='Arquivo .folded (padrão: stdout)')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL * 1000, help='Milissegundos entre amostras')
+    parser.add_argument('--no-prefilter', action='store_true', help='Desliga o pré-filtro (PyPDF2)')
+    parser.add_argument('--memory', action='store_true', help='Mede a memória (pico por arquivo e por página) em vez da CPU')
+    parser.add_argument('--frames', type=int, default=1, help='Frames guardados por alocação com --memory')
+    args = parser.parse_args()
+
+    if args.memory:
+        memory_main(args)
+        return
+
+    done = threading.Event()
+    result: Dict[str, Any] = {}
+
+    def run():
+        try:
+            result['rows'], _ = extract_rows(args.bank, args.pdf, prefilter=not args.no_prefilter)
+        except ExtractionError as exc:
+            result['error'] = exc.message
+        finally:
+            done.set()
+
+    worker = threading.Thread(target=run, name='extract')
+    worker.start()
+    profile = sample(3600, args.interval / 1000, stop=done)
+    worker.join()
+    if 'error' in result:
+        print(f"Erro: {result['error']}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(profile.collapsed())
+    else:
+        sys.stdout.write(profile.collapsed())
+    print(f"{len(result['rows'])} créditos; {profile.samples} amostras em {profile.seconds:.2f}s "
+          f"(custo da amostragem {profile.overhead:.1%})", file=sys.stderr)
+    for item in profile.top(10):
+        print(f"  {item['self']:>6} {item['total']:>6}  {item['function']}", file=sys.stderr)
+
+
+def memory_main(args):
+    from COMMON.extraction import ExtractionError, extract_rows
+    from COMMON.memory import MemoryTracker, format_breakdown
+    from COMMON.spans import Trace, activate, set_memory_tracker, span
+
+    tracker = MemoryTracker(frames=args.frames)
+    tracker.start()
+    set_memory_tracker(tracker)
+    trace = Trace('memory')
+    try:
+        with activate(trace, file=args.pdf), span('file'):
+            rows, _ = extract_rows(args.bank, args.pdf, prefilter=not args.no_prefilter)
+    except ExtractionError as exc:
+        print(f'Erro: {exc.message}', file=sys.stderr)
+        sys.exit(1)
+    finally:
+        set_memory_tracker(None)
+
+    spans = trace.to_dict()['spans']
+    file_span = next(s for s in spans if s['name'] == 'file')
+    print(f"{len(rows)} créditos; arquivo: " + '\n'.join(format_breakdown(file_span)))
+    pages: Dict[int, Dict[str, int]] = {}
+    for s in spans:
+        if 'page' in s and 'mem_peak_kb' in s:
+            page = pages.setdefault(s['page'], {})
+            page[s['name']] = max(page.get(s['name'], 0), s['mem_peak_kb'])
+            page['retained'] = page.get('retained', 0) + s['mem_retained_kb']
+            page['rss'] = page.get('rss', 0) + s.get('rss_delta_kb', 0)
+    if pages:
+        names = sorted({name for page in pages.values() for name in page if name not in ('retained', 'rss')})
+        print('\npico por trecho (KB): ' + ''.join(f'{name:>9}' for name in names) + '   retido  RSS +KB')
+        for number in sorted(pages):
+            page = pages[number]
+            print(f'  página {number:>4}       ' + ''.join(f'{page.get(name, 0):>9}' for name in names)
+                  + f"  {page['retained']:>7}  {page['rss']:>7}")
+
+
+if __name__ == '__main__':
+    main()
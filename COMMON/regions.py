@@ -0,0 +1,163 @@
+"""
+Recorte das páginas na área de lançamentos antes da extração de texto.
+
+`page.extract_text()` monta linhas para a página inteira (cabeçalho, logotipos,
+quadros de resumo, rodapé legal) e os extratores descartam essas linhas
+depois. Aqui cada banco tem um modelo de região: frases-âncora que marcam o
+início da tabela de lançamentos (o recorte começa logo abaixo delas) e o
+início do rodapé (o recorte termina logo acima). As âncoras são procuradas
+na sequência de caracteres da página, sem análise de layout, e a
+montagem das linhas (`extract_text`) recebe só os caracteres dessa faixa.
+
+Páginas sem nenhuma âncora são extraídas inteiras, como antes.
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+try:
+    from pdfplumber import utils as pdfplumber_utils
+except ImportError:
+    pdfplumber_utils = None  # type: ignore
+
+
+# Variantes acentuadas aceitas em cada letra das âncoras
+_ACCENTS = {
+    'A': 'AÁÀÂÃÄ', 'C': 'CÇ', 'E': 'EÉÈÊË', 'I': 'IÍÌÎÏ', 'O': 'OÓÒÔÕÖ', 'U': 'UÚÙÛÜ',
+}
+
+
+def _fold(text: str) -> str:
+    folded = unicodedata.normalize('NFKD', text.upper())
+    return ''.join(c for c in folded if not unicodedata.combining(c) and not c.isspace())
+
+
+def _anchor_pattern(anchors: Tuple[str, ...]) -> Optional[Pattern[str]]:
+    """
+    Regex das âncoras sobre o texto cru dos caracteres: sem diferenciar
+    maiúsculas e acentos, com espaços opcionais entre as letras (nem todo PDF
+    tem caracteres de espaço).
+    """
+    if not anchors:
+        return None
+    alternatives = []
+    for anchor in anchors:
+        letters = []
+        for ch in _fold(anchor):
+            variants = _ACCENTS.get(ch)
+            letters.append(f'[{variants}]' if variants else re.escape(ch))
+        alternatives.append(r'\s*'.join(letters))
+    return re.compile('|'.join(alternatives), re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class RegionTemplate:
+    """
+    Modelo da área de lançamentos de um banco.
+
+    Attributes:
+        start: Âncoras do cabeçalho da tabela; o recorte começa abaixo da
+            primeira que aparecer na página.
+        stop: Âncoras do rodapé; o recorte termina acima da primeira que
+            aparecer depois do início.
+    """
+    start: Tuple[str, ...] = ()
+    stop: Tuple[str, ...] = ()
+    start_pattern: Optional[Pattern[str]] = field(init=False, repr=False, compare=False)
+    stop_pattern: Optional[Pattern[str]] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'start_pattern', _anchor_pattern(self.start))
+        object.__setattr__(self, 'stop_pattern', _anchor_pattern(self.stop))
+
+
+# Modelos por banco (mesmas chaves de COMMON.extraction.BANK_LABELS).
+# Âncoras de fim só marcam rodapés: nada abaixo delas é lançamento.
+REGION_TEMPLATES: Dict[str, RegionTemplate] = {
+    'itau': RegionTemplate(start=('Lançamentos valor',), stop=('Ouvidoria',)),
+    'santander': RegionTemplate(start=('Conta Corrente Movimentação',), stop=('Ouvidoria',)),
+    'nubank': RegionTemplate(start=('Movimentações',), stop=('Tem alguma dúvida', 'Ouvidoria')),
+    'picpay': RegionTemplate(stop=('Ouvidoria',)),
+    'mercadopago': RegionTemplate(start=('Detalhe dos movimentos',), stop=('Ouvidoria',)),
+}
+
+# Folga para que caracteres encostados na borda do recorte fiquem de fora
+_EDGE = 0.1
+
+
+def _char_stream(chars: List[Dict[str, Any]]) -> Tuple[str, Optional[List[int]]]:
+    """
+    Texto dos caracteres na ordem do PDF. Quando algum objeto tem mais de um
+    caractere (ligaduras), devolve também o índice do objeto de cada posição.
+    """
+    texts = [ch['text'] for ch in chars]
+    text = ''.join(texts)
+    if len(text) == len(texts):
+        return text, None
+    index: List[int] = []
+    for i, t in enumerate(texts):
+        index.extend([i] * len(t))
+    return text, index
+
+
+def _line_bottom(chars: List[Dict[str, Any]], first: int, last: int) -> float:
+    """Base da linha que contém os caracteres first..last (vizinhos na mesma altura)."""
+    top = min(chars[i]['top'] for i in range(first, last + 1))
+    bottom = max(chars[i]['bottom'] for i in range(first, last + 1))
+    line_bottom = bottom
+    for step, i in ((-1, first - 1), (1, last + 1)):
+        while 0 <= i < len(chars) and chars[i]['top'] < bottom and chars[i]['bottom'] > top:
+            line_bottom = max(line_bottom, chars[i]['bottom'])
+            i += step
+    return line_bottom
+
+
+def transaction_bbox(page, template: Optional[RegionTemplate]) -> Optional[Tuple[float, float, float, float]]:
+    """Caixa (x0, top, x1, bottom) da área de lançamentos, ou None para a página inteira."""
+    if template is None or not (template.start_pattern or template.stop_pattern):
+        return None
+    chars = page.chars
+    if not chars:
+        return None
+    text, index = _char_stream(chars)
+
+    def char_at(pos: int) -> int:
+        return index[pos] if index is not None else pos
+
+    top = page.bbox[1]
+    bottom = page.bbox[3]
+    pos = 0
+    if template.start_pattern:
+        m = template.start_pattern.search(text)
+        if m:
+            # abaixo da linha inteira do cabeçalho, não só da âncora
+            top = _line_bottom(chars, char_at(m.start()), char_at(m.end() - 1)) + _EDGE
+            pos = m.end()
+    if template.stop_pattern:
+        m = template.stop_pattern.search(text, pos)
+        if m:
+            stop_top = chars[char_at(m.start())]['top'] - _EDGE
+            if stop_top > top:
+                bottom = stop_top
+
+    if top == page.bbox[1] and bottom == page.bbox[3]:
+        return None
+    return (page.bbox[0], top, page.bbox[2], bottom)
+
+
+def extract_transaction_text(page, template: Optional[RegionTemplate], **kwargs) -> str:
+    """
+    `page.extract_text(**kwargs)` restrito à área de lançamentos.
+
+    Só os caracteres dentro da área passam pela montagem de linhas; ao
+    contrário de `page.crop()`, nenhum outro objeto da página é recortado.
+    """
+    bbox = transaction_bbox(page, template)
+    if bbox is None:
+        return page.extract_text(**kwargs) or ''
+    _, top, _, bottom = bbox
+    chars = [ch for ch in page.chars if ch['top'] >= top and ch['bottom'] <= bottom]
+    return pdfplumber_utils.extract_text(chars, **kwargs) if chars else ''
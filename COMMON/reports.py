@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Relatórios agregados de entradas: por mês, por pagador e por tipo de transação.
+
+Todos os agregados são calculados em uma única passada sobre as linhas, com
+valores em centavos inteiros (sem Decimal dentro do laço), o que mantém
+históricos de 100 mil linhas bem abaixo de um segundo.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BASE_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.dates import month_index, month_label, row_ordinal
+from COMMON.dedup import normalize_description, to_cents
+
+try:
+    from ITAU.itau_extractor import ItauExtractParser
+    CREDIT_TYPES = ItauExtractParser.CREDIT_TYPES
+except Exception:
+    CREDIT_TYPES = {
+        'PIX QRS': 'PIX',
+        'PIX TRANSF': 'PIX',
+        'PIX RECEBIDO': 'PIX',
+        'TED RECEBIDA': 'TED',
+        'DOC RECEBIDO': 'DOC',
+        'DEPOSITO': 'DEPÓSITO'
+    }
+
+# Categorias na ordem em que aparecem no relatório
+TYPE_CATEGORIES = list(dict.fromkeys(CREDIT_TYPES.values())) + ['OUTROS']
+
+# Palavras que descrevem a operação e não o pagador
+_OPERATION_WORDS = re.compile(
+    r'\b(?:' + '|'.join(sorted({re.escape(k) for k in CREDIT_TYPES}, key=len, reverse=True)) +
+    r'|TRANSFERENCIA|RECEBIDA|RECEBIDO|PELO|PIX|TED|DOC|DEPOSITO|DINHEIRO)\b'
+)
+# Números soltos ou colados no fim de uma palavra ("JOAO02/06" vira "JOAO")
+_NUMBERS = re.compile(r'\d+\b')
+
+
+def classify_type(transaction_type: str, description: str) -> str:
+    """Mapeia o tipo do extrator (e a descrição) para PIX/TED/DOC/DEPÓSITO/OUTROS."""
+    if transaction_type in TYPE_CATEGORIES:
+        return transaction_type
+    text = normalize_description(f'{transaction_type or ""} {description or ""}')
+    for keyword, category in CREDIT_TYPES.items():
+        if keyword in text:
+            return category
+    for category in TYPE_CATEGORIES:
+        if normalize_description(category) in text.split():
+            return category
+    return 'OUTROS'
+
+
+def payer_name(description: str) -> str:
+    """Descrição sem acentos, sem palavras de operação (PIX, TED...) e sem números."""
+    name = _OPERATION_WORDS.sub(' ', normalize_description(description))
+    name = _NUMBERS.sub(' ', name)
+    return ' '.join(name.split()) or normalize_description(description)
+
+
+def _cents(value: int) -> Decimal:
+    return (Decimal(value) / 100).quantize(Decimal('.01'))
+
+
+def _average(cents: int, count: int) -> Decimal:
+    return _cents(cents // count) if count else Decimal('0.00')
+
+
+@dataclass
+class IncomeReport:
+    """Agregados de um conjunto de linhas extraídas."""
+    count: int = 0
+    total: Decimal = Decimal('0.00')
+    average: Decimal = Decimal('0.00')
+    months: List[Dict[str, Any]] = field(default_factory=list)
+    payers: List[Dict[str, Any]] = field(default_factory=list)
+    types: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        def plain(items):
+            return [{k: (str(v) if isinstance(v, Decimal) else v) for k, v in item.items()} for item in items]
+        return {
+            'count': self.count,
+            'total': str(self.total),
+            'average': str(self.average),
+            'months': plain(self.months),
+            'payers': plain(self.payers),
+            'types': plain(self.types)
+        }
+
+
+def build_report(rows: Iterable[Dict[str, Any]], top_payers: int = 10) -> IncomeReport:
+    """
+    Calcula totais, quantidades e médias por mês, pagador e tipo em uma passada.
+
+    Args:
+        rows: Linhas no formato de `COMMON.extraction.extract_rows`.
+        top_payers: Quantos pagadores manter no ranking.
+    """
+    # Meses como inteiros (ano * 12 + mês - 1); None para linhas sem data
+    months: Dict[Optional[int], List[int]] = {}
+    payers: Dict[str, List[int]] = {}
+    types: Dict[str, List[int]] = {category: [0, 0] for category in TYPE_CATEGORIES}
+    payer_cache: Dict[str, str] = {}
+    type_cache: Dict[Tuple[str, str], str] = {}
+    count = 0
+    total = 0
+
+    for row in rows:
+        cents = to_cents(row['value'])
+        count += 1
+        total += cents
+
+        ordinal = row_ordinal(row)
+        month = month_index(ordinal) if ordinal is not None else None
+        acc = months.get(month)
+        if acc is None:
+            acc = months[month] = [0, 0]
+        acc[0] += 1
+        acc[1] += cents
+
+        description = row.get('description', '')
+        payer = payer_cache.get(description)
+        if payer is None:
+            payer = payer_cache[description] = payer_name(description)
+        acc = payers.get(payer)
+        if acc is None:
+            acc = payers[payer] = [0, 0]
+        acc[0] += 1
+        acc[1] += cents
+
+        key = (row.get('type') or '', description)
+        category = type_cache.get(key)
+        if category is None:
+            category = type_cache[key] = classify_type(*key)
+        acc = types[category]
+        acc[0] += 1
+        acc[1] += cents
+
+    ranked = sorted(payers.items(), key=lambda item: item[1][1], reverse=True)[:top_payers]
+    return IncomeReport(
+        count=count,
+        total=_cents(total),
+        average=_average(total, count),
+        months=[
+            {'month': month_label(m) if m is not None else '-', 'count': n, 'total': _cents(c),
+             'average': _average(c, n)}
+            for m, (n, c) in sorted(months.items(), key=lambda item: -1 if item[0] is None else item[0])
+        ],
+        payers=[
+            {'payer': p, 'count': n, 'total': _cents(c), 'average': _average(c, n)}
+            for p, (n, c) in ranked
+        ],
+        types=[
+            {'type': t, 'count': n, 'total': _cents(c)}
+            for t, (n, c) in types.items() if n
+        ]
+    )
+
+
+def save_report_csv(report: IncomeReport, outpath: str) -> None:
+    """Grava as três tabelas do relatório em um CSV, separadas pela coluna "Seção"."""
+    with open(outpath, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Seção', 'Chave', 'Quantidade', 'Total', 'Média'])
+        for m in report.months:
+            writer.writerow(['mês', m['month'], m['count'], str(m['total']), str(m['average'])])
+        for p in report.payers:
+            writer.writerow(['pagador', p['payer'], p['count'], str(p['total']), str(p['average'])])
+        for t in report.types:
+            writer.writerow(['tipo', t['type'], t['count'], str(t['total']), ''])
+        writer.writerow(['total', '', report.count, str(report.total), str(report.average)])
+
+
+def save_report_json(report: IncomeReport, outpath: str) -> None:
+    with open(outpath, 'w', encoding='utf-8') as f:
+        json.dump(report.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+def _brl(value: Decimal) -> str:
+    return f'R$ {value:,.2f}'.replace(',', '@').replace('.', ',').replace('@', '.')
+
+
+def print_report(report: IncomeReport) -> None:
+    sections = (
+        ('Mês', 'month', report.months),
+        ('Tipo', 'type', report.types),
+        ('Pagador', 'payer', report.payers),
+    )
+    for title, key, items in sections:
+        print(f'\n{title:<40} {"Qtd":>6} {"Total":>16}')
+        print('-' * 64)
+        for item in items:
+            print(f"{str(item[key])[:40]:<40} {item['count']:>6} {_brl(item['total']):>16}")
+    print('-' * 64)
+    print(f'{"TOTAL":<40} {report.count:>6} {_brl(report.total):>16}')
+
+
+def main():
+    from COMMON.archive import extract_paths
+    from COMMON.dedup import deduplicate
+
+    parser = argparse.ArgumentParser(description='Relatório de entradas por mês, pagador e tipo')
+    parser.add_argument('pdfs', nargs='+', help='PDFs dos extratos (ou ZIPs de PDFs)')
+    parser.add_argument('--bank', '-b', required=True, help='Banco dos extratos (itau, santander, nubank, picpay, mercadopago)')
+    parser.add_argument('--out', '-o', help='Arquivo de saída (csv ou json). Se omitido, imprime no stdout')
+    parser.add_argument('--format', '-f', choices=['csv', 'json'], default='csv')
+    parser.add_argument('--top', type=int, default=10, help='Quantidade de pagadores no ranking (padrão: 10)')
+    parser.add_argument('--workers', '-j', type=int, default=1, help='Processos de extração em paralelo')
+    args = parser.parse_args()
+
+    files_rows = []
+    for name, _, status, result in extract_paths(args.bank, args.pdfs, workers=args.workers):
+        if status == 'error':
+            print(f"Erro ao extrair {name}: {result['message']}")
+            continue
+        files_rows.append(result)
+
+    rows, _ = deduplicate(files_rows)
+    report = build_report(rows, top_payers=args.top)
+
+    if args.out:
+        if args.format == 'json' or args.out.lower().endswith('.json'):
+            save_report_json(report, args.out)
+        else:
+            save_report_csv(report, args.out)
+        print(f'Relatório de {report.count} entradas salvo em {args.out}')
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Modo sombra: compara uma configuração candidata dos extratores com a de produção.
+
+Mudar uma heurística (limiares de cor do Itaú, a ordem PyPDF2 -> pdfplumber
+do PicPay, a busca da linha de valor do Mercado Pago) é arriscado sem medir
+em extratos reais. A candidata é descrita em JSON, por banco:
+
+    {
+      "name": "itau-cor-020",
+      "banks": {
+        "itau": {"attrs": {"COLOR_MIN": 0.20}},
+        "picpay": {"attrs": {"PYPDF2_FIRST": false}},
+        "mercadopago": {"attrs": {"VALUE_LOOKAHEAD": 2}},
+        "nubank": {"options": {"prefilter": false}}
+      }
+    }
+
+`attrs` sobrescreve atributos de classe numa subclasse do extrator (só
+atributos que já existem), `init` vai para o construtor (ex.:
+`{"column_mode": true}` no Itaú) e `options` para `extract_rows` (só
+`prefilter`). Bancos fora de `banks` não são comparados.
+
+Cada comparação roda a produção e a candidata sobre o mesmo PDF, uma depois
+da outra e na mesma thread (a ordem é sorteada para não favorecer quem roda
+com o cache quente), sem checkpoint e sem aprender páginas sem lançamentos,
+e grava uma linha JSONL com latência, quantidade, total e as linhas que só
+uma das duas encontrou. No app web isso acontece em segundo plano depois da
+resposta (`WEBAPP/shadow.py`); aqui, a linha de comando roda a comparação
+sobre PDFs locais e resume o log:
+
+    python COMMON/shadow.py run --config candidata.json -b itau extratos/*.pdf --log sombra.jsonl
+    python COMMON/shadow.py summary sombra.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Union
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BASE_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.dedup import fingerprint
+from COMMON.extraction import BANK_LABELS, ExtractionError, extract_rows, get_extractor, row_to_json
+from COMMON.store import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Opções de `extract_rows` que a candidata pode mudar
+SHADOW_OPTIONS = ('prefilter',)
+# Linhas divergentes guardadas por comparação (de cada lado)
+MAX_DIFF_ROWS = 20
+
+
+def build_extractor(bank: str, attrs: Optional[Dict[str, Any]] = None, init: Optional[Dict[str, Any]] = None):
+    """
+    Extrator do banco com atributos de classe e argumentos do construtor trocados.
+
+    Raises:
+        ValueError: banco sem extrator configurável (Santander é uma função) ou
+            atributo que não existe no extrator (erro de digitação na candidata).
+    """
+    base = get_extractor(bank)
+    if base is None:
+        raise ValueError(f'Extrator de "{bank}" indisponível.')
+    attrs = attrs or {}
+    init = init or {}
+    if not hasattr(base, 'extract_credits'):
+        # Santander: a extração é uma função; só `options` se aplica
+        if attrs or init:
+            raise ValueError(f'O extrator de "{bank}" não tem atributos configuráveis.')
+        return None
+    cls = type(base)
+    unknown = [name for name in attrs if not hasattr(cls, name)]
+    if unknown:
+        raise ValueError(f'Atributos desconhecidos em {cls.__name__}: {", ".join(unknown)}')
+    if attrs:
+        cls = type(f'{cls.__name__}Candidate', (cls,), dict(attrs))
+    return cls(**init)
+
+
+class Candidate:
+    """Configuração candidata, carregada do JSON descrito no módulo."""
+
+    def __init__(self, name: str, banks: Dict[str, Dict[str, Any]]):
+        self.name = name
+        self.banks = banks
+        self._extractors: Dict[str, Any] = {}
+        for bank, spec in banks.items():
+            if bank not in BANK_LABELS:
+                raise ValueError(f'Banco "{bank}" não suportado.')
+            unknown = set(spec) - {'attrs', 'init', 'options'}
+            if unknown:
+                raise ValueError(f'{bank}: chaves desconhecidas {sorted(unknown)}')
+            bad = set(spec.get('options', {})) - set(SHADOW_OPTIONS)
+            if bad:
+                raise ValueError(f'{bank}: opções não suportadas {sorted(bad)}')
+            # Monta já (e valida os atributos); uma instância por banco, como em produção
+            self._extractors[bank] = build_extractor(bank, spec.get('attrs'), spec.get('init'))
+
+    @classmethod
+    def load(cls, path: str) -> 'Candidate':
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get('name') or os.path.splitext(os.path.basename(path))[0], data.get('banks') or {})
+
+    def covers(self, bank: str) -> bool:
+        return bank in self.banks
+
+    def extract(self, bank: str, source: Union[str, BinaryIO]) -> List[Dict[str, Any]]:
+        options = dict(self.banks[bank].get('options', {}))
+        rows, _ = extract_rows(bank, source, extractor=self._extractors[bank], **options)
+        return rows
+
+
+def _outcome(fn) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        rows = fn()
+    except ExtractionError as exc:
+        return {'ms': round((time.perf_counter() - start) * 1000, 1), 'error': exc.to_dict(), 'rows': None}
+    total = sum((r['value'] for r in rows), Decimal('0'))
+    return {'ms': round((time.perf_counter() - start) * 1000, 1), 'count': len(rows),
+            'total': str(total.quantize(Decimal('.01'))), 'rows': rows}
+
+
+def _row_json(row: Dict[str, Any]) -> Dict[str, Any]:
+    item = row_to_json(row)
+    item.pop('bank', None)
+    return item
+
+
+def diff_rows(primary: List[Dict[str, Any]], candidate: List[Dict[str, Any]],
+              limit: int = MAX_DIFF_ROWS) -> Dict[str, Any]:
+    """
+    Diferença linha a linha (mesma impressão de `COMMON.dedup`: data, valor,
+    descrição e banco), contando repetições.
+    """
+    remaining = Counter(fingerprint(r) for r in candidate)
+    only_primary = []
+    matched = 0
+    for row in primary:
+        key = fingerprint(row)
+        if remaining[key] > 0:
+            remaining[key] -= 1
+            matched += 1
+        else:
+            only_primary.append(row)
+    only_candidate = []
+    for row in candidate:
+        key = fingerprint(row)
+        if remaining[key] > 0:
+            remaining[key] -= 1
+            only_candidate.append(row)
+    return {
+        'identical': not only_primary and not only_candidate,
+        'matched': matched,
+        'only_primary_count': len(only_primary),
+        'only_candidate_count': len(only_candidate),
+        'only_primary': [_row_json(r) for r in only_primary[:limit]],
+        'only_candidate': [_row_json(r) for r in only_candidate[:limit]],
+    }
+
+
+def _rewind(source: Union[str, BinaryIO]) -> Union[str, BinaryIO]:
+    if not isinstance(source, str):
+        source.seek(0)
+    return source
+
+
+def compare(candidate: Candidate, bank: str, source: Union[str, BinaryIO], name: str = '') -> Dict[str, Any]:
+    """Roda produção e candidata sobre o mesmo PDF e devolve o registro da comparação."""
+    runs = {
+        'primary': lambda: extract_rows(bank, _rewind(source))[0],
+        'candidate': lambda: candidate.extract(bank, _rewind(source)),
+    }
+    order = ['primary', 'candidate']
+    random.shuffle(order)
+    results = {key: _outcome(runs[key]) for key in order}
+
+    primary_rows = results['primary'].pop('rows')
+    candidate_rows = results['candidate'].pop('rows')
+    record = {
+        'at': datetime.now().isoformat(timespec='seconds'),
+        'candidate': candidate.name,
+        'bank': bank,
+        'file': name or (os.path.basename(source) if isinstance(source, str) else getattr(source, 'name', '')),
+        'file_hash': file_sha256(source),
+        'first': order[0],
+        'primary': results['primary'],
+        'candidate_result': results['candidate'],
+    }
+    if primary_rows is not None and candidate_rows is not None:
+        record['diff'] = diff_rows(primary_rows, candidate_rows)
+    return record
+
+
+class ShadowLog:
+    """Log JSONL das comparações (uma linha por arquivo), seguro entre threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+def read_log(path: str) -> Iterable[Dict[str, Any]]:
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+class ShadowRunner:
+    """
+    Fila curta de comparações rodando numa thread de fundo.
+
+    `submit()` nunca bloqueia: com a fila cheia o pedido é descartado (e
+    contado). Nenhum erro da candidata sai daqui; tudo vai para o log.
+    """
+
+    def __init__(self, candidate: Candidate, log: ShadowLog, queue_size: int = 4):
+        self.candidate = candidate
+        self.log = log
+        self._queue: 'queue.Queue' = queue.Queue(max(1, queue_size))
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.counters = Counter()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.counters[key] += 1
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, name='shadow', daemon=True)
+                self._thread.start()
+
+    def has_room(self) -> bool:
+        return not self._queue.full()
+
+    def submit(self, bank: str, name: str, data: bytes) -> bool:
+        """Enfileira a comparação de um PDF (bytes); False se descartado."""
+        if not self.candidate.covers(bank):
+            return False
+        try:
+            self._queue.put_nowait((bank, name, data))
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('submitted')
+        self._ensure_thread()
+        return True
+
+    def _work(self) -> None:
+        while True:
+            bank, name, data = self._queue.get()
+            try:
+                source = io.BytesIO(data)
+                source.name = name
+                record = compare(self.candidate, bank, source, name)
+                self.log.append(record)
+                diff = record.get('diff')
+                self._count('done')
+                if diff is not None and not diff['identical']:
+                    self._count('different')
+            except Exception:
+                self._count('failed')
+                logger.exception('Falha na comparação em modo sombra de %s', name)
+            finally:
+                self._queue.task_done()
+
+    def join(self) -> None:
+        """Espera a fila esvaziar (testes e linha de comando)."""
+        self._queue.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'candidate': self.candidate.name, 'queued': self._queue.qsize(), **self.counters}
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarize(records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Agregado por candidata e banco: comparações, idênticas, latências e linhas divergentes."""
+    groups: Dict[tuple, Dict[str, Any]] = {}
+    for r in records:
+        g = groups.setdefault((r['candidate'], r['bank']), {
+            'candidate': r['candidate'], 'bank': r['bank'], 'runs': 0, 'identical': 0, 'errors': 0,
+            'only_primary': 0, 'only_candidate': 0, 'primary_ms': [], 'candidate_ms': []
+        })
+        g['runs'] += 1
+        g['primary_ms'].append(r['primary']['ms'])
+        g['candidate_ms'].append(r['candidate_result']['ms'])
+        diff = r.get('diff')
+        if diff is None:
+            g['errors'] += 1
+            continue
+        g['identical'] += diff['identical']
+        g['only_primary'] += diff['only_primary_count']
+        g['only_candidate'] += diff['only_candidate_count']
+    summary = []
+    for g in groups.values():
+        primary_ms, candidate_ms = g.pop('primary_ms'), g.pop('candidate_ms')
+        g['primary_p50_ms'] = _percentile(primary_ms, 50)
+        g['candidate_p50_ms'] = _percentile(candidate_ms, 50)
+        g['primary_p95_ms'] = _percentile(primary_ms, 95)
+        g['candidate_p95_ms'] = _percentile(candidate_ms, 95)
+        g['speedup'] = round(sum(primary_ms) / sum(candidate_ms), 2) if sum(candidate_ms) else None
+        summary.append(g)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara uma configuração candidata dos extratores com a de produção')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_run = sub.add_parser('run', help='Compara sobre PDFs locais')
+    p_run.add_argument('pdfs', nargs='+')
+    p_run.add_argument('--config', '-c', required=True, help='JSON da configuração candidata')
+    p_run.add_argument('--bank', '-b', required=True, choices=sorted(BANK_LABELS))
+    p_run.add_argument('--log', help='Acrescenta os registros neste JSONL')
+    p_sum = sub.add_parser('summary', help='Resume um log de comparações')
+    p_sum.add_argument('log')
+    p_sum.add_argument('--json', action='store_true', help='Saída em JSON')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        try:
+            candidate = Candidate.load(args.config)
+        except (OSError, ValueError) as exc:
+            print(f'Configuração candidata inválida: {exc}')
+            sys.exit(1)
+        if not candidate.covers(args.bank):
+            print(f'A candidata "{candidate.name}" não configura o banco {args.bank}.')
+            sys.exit(1)
+        log = ShadowLog(args.log) if args.log else None
+        records = []
+        for path in args.pdfs:
+            record = compare(candidate, args.bank, path)
+            records.append(record)
+            if log is not None:
+                log.append(record)
+            diff = record.get('diff')
+            status = 'erro' if diff is None else ('igual' if diff['identical'] else
+                                                  f"-{diff['only_primary_count']} +{diff['only_candidate_count']}")
+            print(f"{path}: produção {record['primary'].get('count', '-')} em {record['primary']['ms']:.0f} ms, "
+                  f"candidata {record['candidate_result'].get('count', '-')} em "
+                  f"{record['candidate_result']['ms']:.0f} ms ({status})")
+        summary = summarize(records)
+    else:
+        summary = summarize(read_log(args.log))
+
+    if getattr(args, 'json', False):
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+    for g in summary:
+        print(f"\n{g['candidate']} / {g['bank']}: {g['runs']} comparações, {g['identical']} idênticas, "
+              f"{g['errors']} com erro")
+        print(f"  linhas só na produção: {g['only_primary']}   só na candidata: {g['only_candidate']}")
+        print(f"  p50 {g['primary_p50_ms']:.0f} -> {g['candidate_p50_ms']:.0f} ms   "
+              f"p95 {g['primary_p95_ms']:.0f} -> {g['candidate_p95_ms']:.0f} ms   speedup {g['speedup']}")
+
+
+if __name__ == '__main__':
+    main()
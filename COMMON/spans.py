@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Linha do tempo por requisição: trechos (spans) medidos em cada etapa da extração.
+
+A requisição cria um `Trace` e o ativa (`activate`); daí em diante cada
+etapa instrumentada (`span('text', page=3)`) acrescenta à lista um trecho com
+início e duração relativos ao começo da requisição, o arquivo em que ocorreu
+e atributos (página, quantidade de linhas). Sem trace ativo, `span()` custa
+uma consulta a `ContextVar` e devolve um gerenciador que não faz nada; com
+trace ativo, duas leituras de `perf_counter` e um `list.append`. Por isso os
+trechos são gravados sempre e o chamador decide no fim se a requisição foi
+lenta o bastante para ir ao log (`TraceLog`).
+
+Trechos instrumentados:
+
+- `save`, `unzip`, `admission`, `exclude`, `dedup`, `persist`, `render`: etapas da requisição web;
+- `file`: um arquivo inteiro (tamanho, páginas, banco e resultado em `files`);
+- `prefilter`, `fingerprint`: primeira camada (PyPDF2);
+- `open`: abertura do PDF pelo pdfplumber;
+- `text`, `parse`, `color`, `ocr`: por página (`page`).
+
+As threads do pool de extração não herdam o `ContextVar`: quem distribui o
+trabalho repassa o trace (`activate(trace, file=nome)`).
+
+Com `set_memory_tracker`, cada trecho também mede pico de memória e RSS
+(ver `COMMON/memory.py`).
+
+Para ler o log:
+    python COMMON/spans.py WEBAPP/logs/slow.jsonl --last 5
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Limite de trechos por requisição (um PDF enorme não vira um log enorme)
+MAX_SPANS = 5000
+
+_active: ContextVar[Optional[Tuple['Trace', Optional[str]]]] = ContextVar('trace', default=None)
+# Medição de memória por trecho (`COMMON/memory.py`); None desliga
+_memory = None
+
+
+class Trace:
+    """Trechos de uma requisição. Seguro entre threads (só `list.append` e atribuições)."""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.at = datetime.datetime.now().isoformat(timespec='seconds')
+        self.start = time.perf_counter()
+        self.spans: List[Tuple[str, Optional[str], float, float, Dict[str, Any]]] = []
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.dropped = 0
+        self.seconds: Optional[float] = None
+
+    def add(self, name: str, file: Optional[str], start: float, end: float, attrs: Dict[str, Any]) -> None:
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append((name, file, start - self.start, end - start, attrs))
+
+    @property
+    def elapsed(self) -> float:
+        """Segundos desde o início (a duração final depois de `finish`)."""
+        return self.seconds if self.seconds is not None else time.perf_counter() - self.start
+
+    def finish(self) -> float:
+        """Encerra a medição e devolve a duração total em segundos."""
+        self.seconds = time.perf_counter() - self.start
+        return self.seconds
+
+    def stages(self) -> Dict[str, float]:
+        """Segundos somados por etapa (trechos em paralelo somam mais que o total)."""
+        totals: Dict[str, float] = defaultdict(float)
+        for name, _, _, duration, _ in self.spans:
+            if name != 'file':
+                totals[name] += duration
+        return {name: round(seconds, 3) for name, seconds in sorted(totals.items(), key=lambda i: -i[1])}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'at': self.at,
+            'name': self.name,
+            **self.attrs,
+            'seconds': round(self.elapsed, 3),
+            'files': self.files,
+            'stages': self.stages(),
+            'spans': [{'name': name, 'file': file, 'start_ms': round(start * 1000, 1),
+                       'ms': round(duration * 1000, 1), **attrs}
+                      for name, file, start, duration, attrs in self.spans],
+            'dropped_spans': self.dropped,
+        }
+
+
+class _Span:
+    __slots__ = ('trace', 'file', 'name', 'attrs', 'start', 'memory')
+
+    def __init__(self, trace: Trace, file: Optional[str], name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.file = file
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        tracker = _memory
+        # A medição de memória fica fora do tempo do trecho
+        self.memory = (tracker, tracker.enter(self.name)) if tracker is not None and tracker.measures(self.name) else None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        if self.memory is not None:
+            tracker, window = self.memory
+            self.attrs.update(tracker.exit(window))
+        self.trace.add(self.name, self.file, self.start, end, self.attrs)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL = _NullSpan()
+
+
+def set_memory_tracker(tracker) -> None:
+    """Liga (`MemoryTracker`) ou desliga (None) a medição de memória em todos os trechos do processo."""
+    global _memory
+    _memory = tracker
+
+
+def current() -> Optional[Trace]:
+    active = _active.get()
+    return active[0] if active is not None else None
+
+
+def span(name: str, **attrs):
+    """Mede o bloco `with` como um trecho do trace ativo (nada sem trace)."""
+    active = _active.get()
+    if active is None:
+        return _NULL
+    return _Span(active[0], active[1], name, attrs)
+
+
+def note_file(**attrs) -> None:
+    """Acrescenta atributos ao arquivo em andamento (ex.: `pages`)."""
+    active = _active.get()
+    if active is not None and active[1] is not None:
+        active[0].files.setdefault(active[1], {}).update(attrs)
+
+
+@contextmanager
+def activate(trace: Optional[Trace], file: Optional[str] = None) -> Iterator[Optional[Trace]]:
+    """Torna `trace` o ativo nesta thread/contexto; com `file`, os trechos ficam marcados com o arquivo."""
+    if trace is None:
+        yield None
+        return
+    token = _active.set((trace, file))
+    try:
+        yield trace
+    finally:
+        _active.reset(token)
+
+
+def open_pdf(path):
+    """`pdfplumber.open(path)` medido como o trecho `open`, com o número de páginas do arquivo."""
+    import pdfplumber
+
+    active = _active.get()
+    if active is None:
+        return pdfplumber.open(path)
+    with _Span(active[0], active[1], 'open', {}) as s:
+        pdf = pdfplumber.open(path)
+        pages = len(pdf.pages)
+        s.set(pages=pages)
+    note_file(pages=pages)
+    return pdf
+
+
+class TraceLog:
+    """Log JSONL das requisições lentas (uma linha por requisição), seguro entre threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, trace: Trace) -> None:
+        line = json.dumps(trace.to_dict(), ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+def _print_trace(record: Dict[str, Any], spans: int) -> None:
+    print(f"{record['at']}  {record['name']}  {record['seconds']:.2f}s  "
+          + ' '.join(f'{k}={v}' for k, v in record.items()
+                     if k not in ('at', 'name', 'seconds', 'files', 'stages', 'spans', 'dropped_spans')))
+    for name, info in record['files'].items():
+        print(f"  arquivo {name}: " + ', '.join(f'{k}={v}' for k, v in info.items()))
+    print('  etapas: ' + ', '.join(f'{name} {seconds:.2f}s' for name, seconds in record['stages'].items()))
+    slowest = sorted((s for s in record['spans'] if s['name'] != 'file'), key=lambda s: -s['ms'])[:spans]
+    for s in slowest:
+        extra = ' '.join(f'{k}={v}' for k, v in s.items() if k not in ('name', 'file', 'start_ms', 'ms'))
+        print(f"    {s['start_ms'] / 1000:>8.2f}s +{s['ms']:>9.1f}ms  {s['name']:<10} {s['file'] or '-'} {extra}")
+    if record.get('dropped_spans'):
+        print(f"  ({record['dropped_spans']} trechos descartados)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mostra as requisições lentas gravadas pelo app web')
+    parser.add_argument('log', help='Arquivo JSONL (TRACE_LOG)')
+    parser.add_argument('--last', type=int, default=10, help='Quantas requisições (as mais recentes)')
+    parser.add_argument('--spans', type=int, default=10, help='Trechos mais lentos mostrados por requisição')
+    args = parser.parse_args()
+
+    records = []
+    with open(args.log, encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    for record in records[-args.last:]:
+        _print_trace(record, args.spans)
+        print()
+
+
+if __name__ == '__main__':
+    main()
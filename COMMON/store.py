@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Armazenamento local (SQLite) das transações extraídas.
+
+Opcional: guarda o resultado de cada extrator para que consultas históricas
+(ex.: "total de entradas do cliente nos últimos 24 meses") virem consultas SQL
+indexadas em vez de reprocessar todos os PDFs.
+
+Cada PDF é identificado pelo SHA-256 do seu conteúdo; reimportar o mesmo
+arquivo substitui as suas linhas (upsert idempotente). Transações repetidas
+entre extratos sobrepostos são contadas uma vez só nas consultas, usando a
+mesma impressão digital de `COMMON/dedup.py`.
+
+As descrições normalizadas (coluna `normalized`: maiúsculas, sem acentos,
+com letras e dígitos colados separados, ver `search_text`) alimentam um índice de texto completo (FTS5), para buscar um pagador em
+anos de extratos com consultas por prefixo (`silv*`) ou por frase
+(`"joao silva"`). A coluna `payer` guarda só o nome do pagador, como em
+`COMMON/reports.py` (sem PIX/TED e sem datas ou números de documento): é
+por ela que os totais por pagador agrupam.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Union
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BASE_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.dates import row_ordinal, to_iso
+from COMMON.dedup import fingerprint, normalize_description, to_cents
+
+DEFAULT_DB = os.environ.get('TRANSACTION_DB', 'transacoes.db')
+# Versão do conteúdo gravado (PRAGMA user_version); 1: `payer` com o nome do
+# pagador; 2: descrição normalizada em `normalized`, que é o que o FTS5 indexa
+DATA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_hash   TEXT PRIMARY KEY,
+    client      TEXT NOT NULL DEFAULT '',
+    bank        TEXT NOT NULL,
+    filename    TEXT NOT NULL DEFAULT '',
+    imported_at TEXT NOT NULL,
+    count       INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id           INTEGER PRIMARY KEY,
+    file_hash    TEXT NOT NULL REFERENCES files(file_hash) ON DELETE CASCADE,
+    seq          INTEGER NOT NULL,
+    client       TEXT NOT NULL DEFAULT '',
+    bank         TEXT NOT NULL,
+    date         TEXT,
+    date_iso     TEXT,
+    month        TEXT,
+    amount_cents INTEGER NOT NULL,
+    type         TEXT,
+    description  TEXT NOT NULL,
+    normalized   TEXT NOT NULL DEFAULT '',
+    payer        TEXT NOT NULL,
+    page         INTEGER,
+    fingerprint  TEXT NOT NULL,
+    occurrence   INTEGER NOT NULL,
+    UNIQUE (file_hash, seq)
+);
+
+CREATE INDEX IF NOT EXISTS idx_tx_client_date ON transactions (client, date_iso);
+CREATE INDEX IF NOT EXISTS idx_tx_client_bank_date ON transactions (client, bank, date_iso);
+CREATE INDEX IF NOT EXISTS idx_tx_client_amount ON transactions (client, amount_cents);
+CREATE INDEX IF NOT EXISTS idx_tx_client_payer ON transactions (client, payer);
+CREATE INDEX IF NOT EXISTS idx_tx_fingerprint ON transactions (client, fingerprint, occurrence, id);
+
+-- Uma linha por transação real: a mesma transação vinda de extratos
+-- sobrepostos aparece uma vez só (a primeira importada).
+CREATE VIEW IF NOT EXISTS unique_transactions AS
+SELECT t.* FROM transactions t
+WHERE t.id = (
+    SELECT MIN(u.id) FROM transactions u
+    WHERE u.client = t.client AND u.fingerprint = t.fingerprint AND u.occurrence = t.occurrence
+);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+    normalized, content='transactions', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS transactions_fts_ai AFTER INSERT ON transactions BEGIN
+    INSERT INTO transactions_fts (rowid, normalized) VALUES (new.id, new.normalized);
+END;
+
+CREATE TRIGGER IF NOT EXISTS transactions_fts_ad AFTER DELETE ON transactions BEGIN
+    INSERT INTO transactions_fts (transactions_fts, rowid, normalized) VALUES ('delete', old.id, old.normalized);
+END;
+"""
+
+_QUERY_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+# Letras e dígitos colados ("JOAO02", data ou documento grudado no nome)
+_GLUED = re.compile(r'(?<=[A-Z])(?=\d)|(?<=\d)(?=[A-Z])')
+
+
+def search_text(text: str) -> str:
+    """Texto como indexado na busca: `normalize_description`, com letras e dígitos colados separados."""
+    return _GLUED.sub(' ', normalize_description(text))
+
+
+def build_fts_query(text: str) -> str:
+    """
+    Converte a busca do usuário em uma expressão FTS5.
+
+    Palavras viram termos (todas obrigatórias), `termo*` vira busca por prefixo
+    e trechos entre aspas viram frases. Acentos e pontuação são descartados.
+    """
+    parts = []
+    for phrase, word in _QUERY_TOKEN.findall(text or ''):
+        if phrase:
+            normalized = search_text(phrase)
+            if normalized:
+                parts.append(f'"{normalized}"')
+            continue
+        prefix = word.endswith('*')
+        for term in search_text(word).split():
+            parts.append(f'"{term}"')
+        if prefix and parts and not parts[-1].endswith('*'):
+            parts[-1] += '*'
+    return ' '.join(parts)
+
+
+def file_sha256(source: Union[str, BinaryIO]) -> str:
+    """SHA-256 do PDF: caminho ou arquivo binário em memória (ex.: membro de um ZIP)."""
+    h = hashlib.sha256()
+    if not isinstance(source, str):
+        source.seek(0)
+        for chunk in iter(lambda: source.read(1024 * 1024), b''):
+            h.update(chunk)
+        source.seek(0)
+        return h.hexdigest()
+    with open(source, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def source_name(source: Union[str, BinaryIO]) -> str:
+    """Nome do PDF para logs: o nome do arquivo ou o `name` do arquivo em memória."""
+    if isinstance(source, str):
+        return os.path.basename(source)
+    return getattr(source, 'name', '') or '<memória>'
+
+
+def _cents_to_decimal(cents: Optional[int]) -> Decimal:
+    return (Decimal(cents or 0) / 100).quantize(Decimal('.01'))
+
+
+class TransactionStore:
+    """Banco SQLite com as transações extraídas, indexado por cliente, banco, data e valor."""
+
+    def __init__(self, path: str = DEFAULT_DB):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            migrated = self._migrate(conn)
+            self.fts_enabled = self._init_fts(conn, rebuild=migrated)
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> bool:
+        """Atualiza linhas gravadas por versões anteriores. True se alguma coisa mudou."""
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= DATA_VERSION:
+            return False
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(transactions)')}
+        if 'normalized' not in columns:
+            conn.execute("ALTER TABLE transactions ADD COLUMN normalized TEXT NOT NULL DEFAULT ''")
+        if conn.execute('SELECT 1 FROM transactions LIMIT 1').fetchone():
+            if version < 1:
+                # Antes da versão 1, `payer` era só a descrição normalizada (com datas e documentos)
+                from COMMON.reports import payer_name
+                conn.create_function('payer_name', 1, payer_name)
+                conn.execute('UPDATE transactions SET payer = payer_name(description)')
+            conn.create_function('search_text', 1, search_text)
+            conn.execute('UPDATE transactions SET normalized = search_text(description)')
+        # Antes da versão 2 o índice de texto cobria `payer`: recriado por `_init_fts`
+        conn.execute('DROP TRIGGER IF EXISTS transactions_fts_ai')
+        conn.execute('DROP TRIGGER IF EXISTS transactions_fts_ad')
+        conn.execute('DROP TABLE IF EXISTS transactions_fts')
+        conn.execute(f'PRAGMA user_version = {DATA_VERSION}')
+        return True
+
+    @staticmethod
+    def _init_fts(conn: sqlite3.Connection, rebuild: bool = False) -> bool:
+        existed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+        ).fetchone() is not None
+        try:
+            conn.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError:
+            # SQLite compilado sem FTS5: a busca cai para LIKE sobre `normalized`.
+            return False
+        if not existed or rebuild:
+            conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+        return True
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Uma conexão por operação: o objeto pode ser compartilhado entre threads.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def has_file(self, file_hash: str) -> bool:
+        with self._connect() as conn:
+            return conn.execute('SELECT 1 FROM files WHERE file_hash = ?', (file_hash,)).fetchone() is not None
+
+    def save_file(self, file_hash: str, rows: List[Dict[str, Any]], bank: str, client: str = '', filename: str = '') -> int:
+        """
+        Grava (ou substitui) as linhas extraídas de um PDF.
+
+        Args:
+            file_hash: SHA-256 do PDF (ver `file_sha256`).
+            rows: Linhas no formato de `COMMON.extraction.extract_rows`.
+            bank: Banco do extrato.
+            client: Identificador livre do cliente.
+            filename: Nome original do arquivo, apenas informativo.
+
+        Returns:
+            Quantidade de transações gravadas.
+        """
+        # Importado aqui: COMMON.reports importa o extrator do Itaú, que importa este módulo
+        from COMMON.reports import payer_name
+
+        occurrences: Dict[tuple, int] = {}
+        records = []
+        for seq, row in enumerate(rows):
+            fp = fingerprint(row)
+            occurrences[fp] = occurrences.get(fp, 0) + 1
+            date_iso = to_iso(row_ordinal(row)) or None
+            records.append((
+                file_hash, seq, client, row.get('bank') or bank, row.get('date'), date_iso,
+                date_iso[:7] if date_iso else None, to_cents(row['value']), row.get('type'),
+                row.get('description', ''), search_text(row.get('description', '')),
+                payer_name(row.get('description', '')),
+                row.get('page'), '|'.join(str(part) for part in fp), occurrences[fp]
+            ))
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO files (file_hash, client, bank, filename, imported_at, count)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(file_hash) DO UPDATE SET
+                    client = excluded.client, bank = excluded.bank, filename = excluded.filename,
+                    imported_at = excluded.imported_at, count = excluded.count
+                """,
+                (file_hash, client, bank, filename, datetime.now().isoformat(timespec='seconds'), len(records))
+            )
+            conn.execute('DELETE FROM transactions WHERE file_hash = ?', (file_hash,))
+            conn.executemany(
+                """
+                INSERT INTO transactions (file_hash, seq, client, bank, date, date_iso, month, amount_cents,
+                                          type, description, normalized, payer, page, fingerprint, occurrence)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                records
+            )
+        return len(records)
+
+    @staticmethod
+    def _filters(client: Optional[str], bank: Optional[str], since: Optional[str], until: Optional[str],
+                 clauses: Optional[List[str]] = None, params: Optional[list] = None, alias: str = ''):
+        clauses, params = list(clauses or []), list(params or [])
+        if client is not None:
+            clauses.append(f'{alias}client = ?')
+            params.append(client)
+        if bank:
+            clauses.append(f'{alias}bank = ?')
+            params.append(bank)
+        if since:
+            clauses.append(f'{alias}date_iso >= ?')
+            params.append(since)
+        if until:
+            clauses.append(f'{alias}date_iso <= ?')
+            params.append(until)
+        where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        return where, params
+
+    def monthly_totals(self, client: Optional[str] = None, bank: Optional[str] = None,
+                       since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Total e quantidade de créditos por mês (aaaa-mm). Datas em aaaa-mm-dd."""
+        where, params = self._filters(client, bank, since, until)
+        with self._connect() as conn:
+            cur = conn.execute(
+                f"""
+                SELECT month, COUNT(*), SUM(amount_cents) FROM unique_transactions {where}
+                GROUP BY month ORDER BY month
+                """,
+                params
+            )
+            return [{'month': m, 'count': n, 'total': _cents_to_decimal(c)} for m, n, c in cur]
+
+    def payer_totals(self, client: Optional[str] = None, bank: Optional[str] = None,
+                     since: Optional[str] = None, until: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Maiores pagadores (nome como em `COMMON.reports.payer_name`) por valor total recebido."""
+        where, params = self._filters(client, bank, since, until)
+        with self._connect() as conn:
+            cur = conn.execute(
+                f"""
+                SELECT payer, COUNT(*), SUM(amount_cents) FROM unique_transactions {where}
+                GROUP BY payer ORDER BY SUM(amount_cents) DESC LIMIT ?
+                """,
+                params + [limit]
+            )
+            return [{'payer': p, 'count': n, 'total': _cents_to_decimal(c)} for p, n, c in cur]
+
+    def search(self, query: str, client: Optional[str] = None, bank: Optional[str] = None,
+               since: Optional[str] = None, until: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Busca transações pela descrição normalizada (sem acentos, sem diferenciar maiúsculas).
+
+        Args:
+            query: Termos da busca; `silv*` busca por prefixo e `"joao silva"` por frase.
+            client, bank, since, until: Filtros opcionais, como em `monthly_totals`.
+            limit: Quantidade máxima de resultados, dos mais recentes para os mais antigos.
+        """
+        fts_query = build_fts_query(query)
+        if not fts_query:
+            return []
+
+        if self.fts_enabled:
+            base = 'FROM transactions_fts JOIN unique_transactions t ON t.id = transactions_fts.rowid'
+            where, params = self._filters(client, bank, since, until, ['transactions_fts MATCH ?'], [fts_query], alias='t.')
+        else:
+            base = 'FROM unique_transactions t'
+            terms = search_text(query).split()
+            where, params = self._filters(client, bank, since, until, ['t.normalized LIKE ?'] * len(terms),
+                                          [f'%{term}%' for term in terms], alias='t.')
+
+        with self._connect() as conn:
+            cur = conn.execute(
+                f"""
+                SELECT t.client, t.bank, t.date, t.date_iso, t.type, t.description, t.amount_cents, t.page, t.file_hash
+                {base} {where}
+                ORDER BY t.date_iso DESC, t.id DESC LIMIT ?
+                """,
+                params + [limit]
+            )
+            return [
+                {
+                    'client': c, 'bank': b, 'date': d, 'date_iso': di, 'type': ty, 'description': desc,
+                    'value': _cents_to_decimal(cents), 'page': page, 'file_hash': fh
+                }
+                for c, b, d, di, ty, desc, cents, page, fh in cur
+            ]
+
+
+def import_pdf(store: TransactionStore, bank: str, path: str, client: str = '') -> int:
+    """Extrai um PDF com o extrator do banco e grava o resultado no banco local."""
+    from COMMON.extraction import extract_rows
+
+    rows, _ = extract_rows(bank, path)
+    return store.save_file(file_sha256(path), rows, bank, client=client, filename=os.path.basename(path))
+
+
+def _print_totals(rows: List[Dict[str, Any]], key: str, title: str) -> None:
+    print(f'{title:<42} {"Qtd":>6} {"Total":>16}')
+    print('-' * 66)
+    for r in rows:
+        total = f"R$ {r['total']:,.2f}".replace(',', '@').replace('.', ',').replace('@', '.')
+        print(f"{str(r[key] or '-')[:42]:<42} {r['count']:>6} {total:>16}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Banco local (SQLite) de transações extraídas')
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'Arquivo SQLite (padrão: {DEFAULT_DB} ou $TRANSACTION_DB)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    imp = sub.add_parser('import', help='Extrai e grava um ou mais PDFs (ou ZIPs de PDFs)')
+    imp.add_argument('pdfs', nargs='+')
+    imp.add_argument('--workers', '-j', type=int, default=1, help='Processos de extração em paralelo')
+    imp.add_argument('--bank', '-b', required=True)
+    imp.add_argument('--client', '-c', default='')
+
+    for name, help_text in (('monthly', 'Totais por mês'), ('payers', 'Totais por pagador')):
+        q = sub.add_parser(name, help=help_text)
+        q.add_argument('--client', '-c')
+        q.add_argument('--bank', '-b')
+        q.add_argument('--since', help='Data inicial (aaaa-mm-dd)')
+        q.add_argument('--until', help='Data final (aaaa-mm-dd)')
+        if name == 'payers':
+            q.add_argument('--limit', type=int, default=20)
+
+    srch = sub.add_parser('search', help='Busca transações pela descrição, sem acentos (ex.: "joao silva", silv*, pix)')
+    srch.add_argument('query')
+    srch.add_argument('--client', '-c')
+    srch.add_argument('--bank', '-b')
+    srch.add_argument('--since', help='Data inicial (aaaa-mm-dd)')
+    srch.add_argument('--until', help='Data final (aaaa-mm-dd)')
+    srch.add_argument('--limit', type=int, default=100)
+
+    args = parser.parse_args()
+    store = TransactionStore(args.db)
+
+    if args.command == 'import':
+        from COMMON.archive import extract_paths
+
+        for name, source, status, result in extract_paths(args.bank, args.pdfs, workers=args.workers):
+            if status == 'error':
+                print(f"Erro ao importar {name}: {result['message']}")
+                continue
+            try:
+                count = store.save_file(file_sha256(source), result, args.bank, client=args.client,
+                                        filename=os.path.basename(name))
+            except Exception as e:
+                print(f'Erro ao importar {name}: {e}')
+                continue
+            print(f'{name}: {count} transações gravadas')
+    elif args.command == 'search':
+        results = store.search(args.query, args.client, args.bank, args.since, args.until, args.limit)
+        if not results:
+            print('Nenhuma transação encontrada.')
+        for r in results:
+            print(f"{r['date'] or '-':<12} {r['bank']:<12} R$ {r['value']:>12,.2f} | {r['description']}")
+    elif args.command == 'monthly':
+        _print_totals(store.monthly_totals(args.client, args.bank, args.since, args.until), 'month', 'Mês')
+    else:
+        _print_totals(store.payer_totals(args.client, args.bank, args.since, args.until, args.limit), 'payer', 'Pagador')
+
+
+if __name__ == '__main__':
+    main()
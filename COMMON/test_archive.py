@@ -0,0 +1,69 @@
+"""
+Testes das proteções e da ordem de processamento dos ZIPs de extratos.
+"""
+import zipfile
+
+import pytest
+
+from archive import ArchiveError, ArchiveLimits, iter_members, ordered_map, scan_members
+
+
+def _zip(path, members, compression=zipfile.ZIP_DEFLATED):
+    with zipfile.ZipFile(path, 'w', compression) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return str(path)
+
+
+def test_members_in_order_with_per_member_errors(tmp_path):
+    path = _zip(tmp_path / 'lote.zip', {
+        'jan.pdf': b'%PDF-1.4 jan',
+        '__MACOSX/._jan.pdf': b'x',
+        'leiame.txt': b'oi',
+        'fev.pdf': b'%PDF-1.4 fev',
+    })
+    members = list(iter_members(path))
+    assert [m.name for m in members] == ['jan.pdf', 'leiame.txt', 'fev.pdf']
+    assert members[0].open().read() == b'%PDF-1.4 jan'
+    assert members[1].error['code'] == 'invalid_format'
+
+
+def test_guards_reject_the_whole_archive(tmp_path):
+    many = _zip(tmp_path / 'many.zip', {f'{i}.pdf': b'%PDF' for i in range(5)})
+    with pytest.raises(ArchiveError) as exc:
+        list(iter_members(many, ArchiveLimits(max_members=4)))
+    assert exc.value.code == 'zip_too_many_members'
+
+    bomb = _zip(tmp_path / 'bomb.zip', {'a.pdf': b'\0' * (4 * 1024 * 1024)})
+    with pytest.raises(ArchiveError) as exc:
+        list(iter_members(bomb))
+    assert exc.value.code == 'zip_bomb'
+
+    (tmp_path / 'bad.zip').write_bytes(b'PK\x03\x04lixo')
+    with pytest.raises(ArchiveError) as exc:
+        list(iter_members(str(tmp_path / 'bad.zip')))
+    assert exc.value.code == 'zip_invalid'
+
+
+def test_member_over_size_limit(tmp_path):
+    path = _zip(tmp_path / 'lote.zip', {'a.pdf': b'1' * 2000, 'b.pdf': b'%PDF'}, zipfile.ZIP_STORED)
+    members = list(iter_members(path, ArchiveLimits(max_member_size=1000)))
+    assert members[0].error['code'] == 'zip_member_too_large'
+    assert members[1].data == b'%PDF'
+
+
+def test_scan_members_reads_only_the_directory(tmp_path):
+    path = _zip(tmp_path / 'lote.zip', {'a.pdf': b'1' * 2000, 'b.pdf': b'%PDF', 'leiame.txt': b'oi'})
+    assert scan_members(path, ArchiveLimits(max_member_size=1000)) == [('a.pdf', None), ('b.pdf', 4), ('leiame.txt', None)]
+    with pytest.raises(ArchiveError):
+        scan_members(path, ArchiveLimits(max_members=2))
+
+
+def test_ordered_map_keeps_input_order():
+    import time
+
+    def slow_first(n):
+        time.sleep(0.02 if n == 0 else 0)
+        return n * 10
+
+    assert list(ordered_map(slow_first, iter(range(6)), workers=3)) == [(n, n * 10) for n in range(6)]
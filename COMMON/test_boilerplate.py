@@ -0,0 +1,68 @@
+"""
+Testes da lista aprendida de páginas sem lançamentos.
+"""
+from boilerplate import SkipList, audit_sample, page_fingerprint
+
+
+class FakeContents:
+    def __init__(self, data):
+        self.data = data
+
+    def get_data(self):
+        return self.data
+
+
+class FakePage:
+    def __init__(self, data):
+        self.data = data
+
+    def get_contents(self):
+        return FakeContents(self.data) if self.data is not None else None
+
+
+def test_fingerprint_ignores_positions_and_page_numbers_and_needs_text():
+    a = page_fingerprint(FakePage(b'BT 40 40 Td (Pagina 3 de 9 - Ouvidoria) Tj ET'))
+    b = page_fingerprint(FakePage(b'BT 40 52 Td (Pagina 7 de 12 - Ouvidoria) Tj ET'))
+    assert a == b
+    assert a != page_fingerprint(FakePage(b'BT 40 40 Td (PIX TRANSF JOAO 100,00) Tj ET'))
+    # Página escaneada (só imagem) ou sem conteúdo: nunca entra na lista
+    assert page_fingerprint(FakePage(b'q 595 0 0 842 0 0 cm /Im0 Do Q')) is None
+    assert page_fingerprint(FakePage(None)) is None
+
+
+def test_fingerprint_keeps_colors_and_amounts():
+    debit = page_fingerprint(FakePage(b'BT 0.8 0 0 rg 1 0 0 1 40 700 Tm (05/01 SALARIO 5.000,00) Tj ET'))
+    # Mesma linha em verde (crédito no Itaú), ou com outro valor: outra impressão
+    assert debit != page_fingerprint(FakePage(b'BT 0 0.5 0 rg 1 0 0 1 40 700 Tm (05/01 SALARIO 5.000,00) Tj ET'))
+    assert debit != page_fingerprint(FakePage(b'BT 0.8 0 0 rg 1 0 0 1 40 700 Tm (05/01 SALARIO 6.000,00) Tj ET'))
+    assert debit == page_fingerprint(FakePage(b'BT 0.8 0 0 rg 1 0 0 1 40 686 Tm (05/01 SALARIO 5.000,00) Tj ET'))
+
+
+def test_audited_page_with_credits_leaves_the_list(tmp_path):
+    assert audit_sample([3, 4], rate=1) == {3, 4} and audit_sample([3, 4], rate=0) == set()
+    skiplist = SkipList(str(tmp_path / 'itau.json'))
+    skiplist.confirm(['aviso'])
+    skiplist.learn(['lancamentos', 'aviso'], [1, 2], productive_pages=[1, 2])
+    assert skiplist.skip_pages(['lancamentos', 'aviso']) == set()
+    assert 'aviso' in SkipList(str(tmp_path / 'itau.json')).productive
+
+
+def test_confirmed_after_distinct_documents(tmp_path):
+    skiplist = SkipList(str(tmp_path / 'itau.json'), confirm_after=3)
+    for doc in range(3):
+        fingerprints = [f'lancamentos{doc}', 'aviso']
+        assert skiplist.skip_pages(fingerprints) == set()
+        # Repetir o mesmo extrato não conta de novo
+        skiplist.learn(fingerprints, [1, 2], productive_pages=[1])
+        skiplist.learn(fingerprints, [1, 2], productive_pages=[1])
+    assert SkipList(str(tmp_path / 'itau.json')).skip_pages(['novo', 'aviso']) == {2}
+
+
+def test_page_with_credits_is_never_confirmed(tmp_path):
+    skiplist = SkipList(str(tmp_path / 'itau.json'), confirm_after=2)
+    skiplist.learn(['a', 'x'], [1, 2], productive_pages=[])
+    skiplist.learn(['b', 'x'], [1, 2], productive_pages=[2])
+    skiplist.learn(['c', 'x'], [1, 2], productive_pages=[])
+    skiplist.learn(['d', 'x'], [1, 2], productive_pages=[])
+    assert 'x' not in skiplist.confirmed
+    assert 'x' in skiplist.productive
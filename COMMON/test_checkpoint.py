@@ -0,0 +1,94 @@
+"""
+Testes do checkpoint por página das extrações.
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass
+from decimal import Decimal
+
+from checkpoint import PageCheckpoint, open_checkpoint
+
+
+@dataclass
+class _Entry:
+    date: str
+    amount: Decimal
+    page: int
+
+
+def test_pages_and_state_survive_reopen(tmp_path):
+    path = str(tmp_path / 'ck.jsonl')
+    ck = PageCheckpoint(path)
+    ck.page_done(2, [_Entry('02/06/2025', Decimal('10.50'), 2)], {'layout': None})
+    ck.page_done(1, [_Entry('01/06/2025', Decimal('1.00'), 1)], {'layout': {'x': 1}})
+
+    again = PageCheckpoint(path)
+    assert again.done == {1, 2}
+    assert again.state == {'layout': {'x': 1}}
+    # Restaura por página e com Decimal de volta
+    assert again.restore(_Entry, 2) == [_Entry('02/06/2025', Decimal('10.50'), 2)]
+    assert again.restore(_Entry, 3) == []
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    path = str(tmp_path / 'ck.jsonl')
+    PageCheckpoint(path).page_done(1, [])
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"page": 2, "entr')
+    assert PageCheckpoint(path).done == {1}
+
+
+def test_reset_discards_previous_pages(tmp_path):
+    path = str(tmp_path / 'ck.jsonl')
+    ck = PageCheckpoint(path)
+    ck.page_done(1, [], {'engine': 'pypdf2'})
+    ck.reset({'engine': 'pdfplumber'})
+    again = PageCheckpoint(path)
+    assert again.done == set()
+    assert again.state == {'engine': 'pdfplumber'}
+
+
+def test_open_checkpoint_keys_by_content(tmp_path):
+    a = tmp_path / 'a.pdf'
+    b = tmp_path / 'b.pdf'
+    a.write_bytes(b'%PDF mesmo conteudo')
+    b.write_bytes(b'%PDF mesmo conteudo')
+    assert open_checkpoint(None, 'itau', str(a)) is None
+    ck_a = open_checkpoint(str(tmp_path / 'ck'), 'itau', str(a))
+    assert ck_a.path == open_checkpoint(str(tmp_path / 'ck'), 'itau', str(b)).path
+    assert ck_a.path != open_checkpoint(str(tmp_path / 'ck'), 'itau', str(a), variant='columns').path
+
+
+def test_resume_with_page_range_returns_only_those_pages_in_order(tmp_path, monkeypatch):
+    import extraction
+    from COMMON.checkpoint import open_checkpoint as open_shared
+    from ITAU import itau_extractor
+
+    @contextmanager
+    def fake_pdf(path):
+        yield type('PDF', (), {'pages': list(range(1, 21))})()
+
+    monkeypatch.setattr(itau_extractor, 'open_pdf', fake_pdf)
+    monkeypatch.setattr(itau_extractor, 'extract_transaction_text',
+                        lambda page, region: f'{page:02d}/01/2025 PIX TRANSF JOAO {page},00')
+    pdf = tmp_path / 'extrato.pdf'
+    pdf.write_bytes(b'%PDF extrato')
+    ck_dir = str(tmp_path / 'ck')
+    # Execução interrompida depois das páginas 1 a 5
+    parser = itau_extractor.ItauExtractParser()
+    parser.extract_credits(str(pdf), pages=set(range(1, 6)), checkpoint=open_shared(ck_dir, 'itau', str(pdf)))
+
+    rows, _ = extraction.extract_rows('itau', str(pdf), prefilter=False, checkpoint_dir=ck_dir,
+                                      extractor=parser, page_range={20, 3})
+    assert [r['page'] for r in rows] == [3, 20]
+
+
+def test_ocr_dpi_is_part_of_the_variant(tmp_path):
+    from dataclasses import replace
+    from SANTANDER.income_extractor import OCR_MODES, ocr_variant
+
+    pdf = tmp_path / 'escaneado.pdf'
+    pdf.write_bytes(b'%PDF escaneado')
+    full = OCR_MODES['full']
+    paths = {open_checkpoint(str(tmp_path / 'ck'), 'santander', str(pdf), variant=ocr_variant('full', settings)).path
+             for settings in (full, replace(full, dpi=300))}
+    assert len(paths) == 2
@@ -0,0 +1,26 @@
+"""
+Testes do daemon de extração (sem subir o socket).
+"""
+import os
+
+from daemon import decode, encode, run_cli, validate_run
+
+
+def test_run_cli_captures_output_and_exit_code(tmp_path):
+    result = run_cli('nubank', [], str(tmp_path))
+    assert result['code'] == 2
+    assert result['stderr'].startswith('usage: nubank_extractor.py')
+
+    result = run_cli('itau', ['--bogus'], str(tmp_path))
+    assert result['code'] == 2
+    assert 'itau_extractor.py: error' in result['stderr']
+    assert os.getcwd() != str(tmp_path)
+
+
+def test_protocol_roundtrip_and_validation(tmp_path):
+    message = {'op': 'run', 'bank': 'itau', 'argv': ['extrato ção.pdf'], 'cwd': str(tmp_path)}
+    assert decode(encode(message)) == message
+    assert validate_run(message) is None
+    assert 'banco desconhecido' in validate_run({**message, 'bank': 'inter'})
+    assert 'argv' in validate_run({**message, 'argv': 'extrato.pdf'})
+    assert 'pasta' in validate_run({**message, 'cwd': 'relativa'})
@@ -0,0 +1,65 @@
+"""
+Testes da camada de datas canônicas.
+"""
+from datetime import date
+
+import pytest
+
+from dates import DateCutoff, DateWindow, month_index, month_label, normalize_date, parse_date, row_ordinal, to_iso
+
+
+def test_bank_formats_share_one_ordinal():
+    expected = date(2025, 6, 2).toordinal()
+    for text in ('02/06/2025', '02/06/25', '02-06-2025', '2 JUN 2025', '02 jun 2025', '2025-06-02'):
+        assert parse_date(text) == expected
+    assert to_iso(expected) == '2025-06-02'
+
+
+def test_invalid_and_empty_dates():
+    assert parse_date(None) is None
+    assert parse_date('-') is None
+    assert parse_date('31/02/2025') is None
+    assert parse_date('02 XYZ 2025') is None
+    assert to_iso(None) == ''
+    assert normalize_date(' 02 XYZ 2025 ') == '02 XYZ 2025'
+
+
+def test_month_index_orders_across_years():
+    dec = month_index(parse_date('31/12/2024'))
+    jan = month_index(parse_date('01 JAN 2025'))
+    assert jan == dec + 1
+    assert month_label(dec) == '2024-12'
+    assert month_label(jan) == '2025-01'
+
+
+def test_row_ordinal_prefers_extracted_value():
+    assert row_ordinal({'date': '02/06/2025', 'date_ord': 1}) == 1
+    assert row_ordinal({'date': '02/06/2025'}) == parse_date('02/06/2025')
+
+
+def test_date_window_parse_and_contains():
+    assert DateWindow.parse('', None) is None
+    window = DateWindow.parse('01/10/2025', '2025-12-31')
+    assert window.contains(parse_date('01/10/2025')) and window.contains(parse_date('31/12/2025'))
+    assert not window.contains(parse_date('30/09/2025'))
+    assert window.contains(None)
+    assert window.excludes(parse_date('01/01/2025'), parse_date('30/09/2025'))
+    assert not window.excludes(parse_date('01/09/2025'), parse_date('01/10/2025'))
+    assert window.label() == 'de 01/10/2025 a 31/12/2025'
+    with pytest.raises(ValueError):
+        DateWindow.parse('31/02/2025')
+    with pytest.raises(ValueError):
+        DateWindow.parse('02/01/2025', '01/01/2025')
+
+
+def test_cutoff_stops_only_in_ascending_statements():
+    window = DateWindow.parse(None, '31/03/2025')
+    months = [[parse_date(f'{d:02d}/{m:02d}/2025') for d in (1, 15)] for m in range(1, 7)]
+
+    cutoff = DateCutoff(window)
+    assert [cutoff.past_end(page) for page in months[:5]] == [False, False, False, True, True]
+
+    descending = DateCutoff(window)
+    assert not any(descending.past_end(page) for page in reversed(months))
+
+    assert not DateCutoff(DateWindow(None, window.end, stop_early=False)).past_end(months[4])
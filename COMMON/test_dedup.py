@@ -0,0 +1,40 @@
+"""
+Testes da deduplicação entre extratos sobrepostos.
+"""
+from decimal import Decimal
+
+from dedup import deduplicate, fingerprint, normalize_date
+
+
+def _row(date, description, value, bank='itau'):
+    return {'bank': bank, 'date': date, 'description': description, 'value': Decimal(value)}
+
+
+def test_normalize_date_formats():
+    assert normalize_date('02/06/2025') == '2025-06-02'
+    assert normalize_date('02/06/25') == '2025-06-02'
+    assert normalize_date('02-06-2025') == '2025-06-02'
+    assert normalize_date('2 JUN 2025') == '2025-06-02'
+    assert normalize_date(None) == ''
+
+
+def test_fingerprint_ignores_accents_and_spacing():
+    a = _row('02/06/2025', 'PIX  TRANSF  João', '10.00')
+    b = _row('02/06/25', 'pix transf joao', '10.0')
+    assert fingerprint(a) == fingerprint(b)
+
+
+def test_overlap_between_files_is_merged():
+    quarterly = [_row('01/05/2025', 'PIX JOAO', '100.00'), _row('01/06/2025', 'PIX MARIA', '50.00')]
+    monthly = [_row('01/06/2025', 'PIX MARIA', '50.00'), _row('15/06/2025', 'TED ANA', '20.00')]
+    rows, merged = deduplicate([quarterly, monthly])
+    assert merged == 1
+    assert [r['description'] for r in rows] == ['PIX JOAO', 'PIX MARIA', 'TED ANA']
+
+
+def test_repeats_inside_one_file_are_kept():
+    first = [_row('01/06/2025', 'PIX MARIA', '50.00'), _row('01/06/2025', 'PIX MARIA', '50.00')]
+    second = [_row('01/06/2025', 'PIX MARIA', '50.00')]
+    rows, merged = deduplicate([first, second])
+    assert len(rows) == 2
+    assert merged == 1
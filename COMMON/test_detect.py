@@ -0,0 +1,26 @@
+"""
+Testes da identificação do banco de um extrato.
+"""
+from detect import bank_from_path, detect_bank_from_text
+
+
+def test_header_brand_wins_over_counterparty():
+    text = 'Nu Pagamentos S.A.\nTransferência recebida de FULANO - BANCO SANTANDER 100,00'
+    assert detect_bank_from_text(text) == 'nubank'
+    assert detect_bank_from_text('Itaú Unibanco\nPIX TRANSF NUBANK JOAO') == 'itau'
+    assert detect_bank_from_text('Extrato Mercado Pago') == 'mercadopago'
+    assert detect_bank_from_text('Extrato de conta') is None
+
+
+def test_only_whole_words_in_the_header_count():
+    # Transferência do Itaú num extrato do PicPay: o lançamento não conta
+    assert detect_bank_from_text('Extrato PicPay\n01/02/2025 Pix Recebido ITAU JOAO R$ 150,00') == 'picpay'
+    assert detect_bank_from_text('Extrato\n01/02/2025 Pix Recebido ITAU JOAO R$ 150,00\nPicPay') is None
+    assert detect_bank_from_text('Extrato CAPITAUX') is None
+
+
+def test_path_hint():
+    assert bank_from_path('/entrada/santander/digitalizado.pdf') == 'santander'
+    assert bank_from_path('/entrada/nubank_jan_2025.pdf') == 'nubank'
+    assert bank_from_path('/entrada/itau-x-nubank.pdf') is None
+    assert bank_from_path('/entrada/extrato.pdf') is None
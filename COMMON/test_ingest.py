@@ -0,0 +1,64 @@
+"""
+Testes da ingestão por pasta observada.
+"""
+import json
+
+from ingest import Debouncer, IngestDaemon
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_file_ready_only_after_settling():
+    clock = Clock()
+    debouncer = Debouncer(settle=3, clock=clock)
+    assert not debouncer.observe('a.pdf', 100, 1.0)
+    clock.now = 2
+    assert not debouncer.observe('a.pdf', 100, 1.0)
+    # Ainda sendo copiado: tamanho mudou, o prazo recomeça
+    clock.now = 4
+    assert not debouncer.observe('a.pdf', 500, 4.0)
+    clock.now = 6
+    assert not debouncer.observe('a.pdf', 500, 4.0)
+    clock.now = 7
+    assert debouncer.observe('a.pdf', 500, 4.0)
+
+
+def test_empty_and_vanished_files():
+    clock = Clock()
+    debouncer = Debouncer(settle=1, clock=clock)
+    debouncer.observe('vazio.pdf', 0, 1.0)
+    clock.now = 5
+    assert not debouncer.observe('vazio.pdf', 0, 1.0)
+    debouncer.prune(set())
+    assert len(debouncer) == 0
+
+
+def test_stale_and_waiting_files():
+    clock = Clock()
+    debouncer = Debouncer(settle=1, clock=clock)
+    debouncer.observe('vazio.pdf', 0, 1.0)
+    debouncer.observe('copiando.pdf', 10, 1.0)
+    clock.now = 30
+    debouncer.observe('vazio.pdf', 0, 1.0)
+    # Cópia sem fim: continua mudando, mas foi vista há 30s
+    debouncer.observe('copiando.pdf', 20, 30.0)
+    assert debouncer.idle('vazio.pdf') == 30 and debouncer.idle('copiando.pdf') == 0
+    assert debouncer.waiting(20) == 0 and debouncer.waiting(40) == 2
+
+
+def test_once_quarantines_empty_file_and_exits(tmp_path):
+    watch = tmp_path / 'entrada'
+    watch.mkdir()
+    (watch / 'vazio.pdf').write_bytes(b'')
+    daemon = IngestDaemon([str(watch)], str(tmp_path / 'processados'), str(tmp_path / 'quarentena'),
+                          interval=0.01, settle=0.01)
+    daemon.run(once=True, status_every=60)
+    assert not (watch / 'vazio.pdf').exists()
+    error = json.loads((tmp_path / 'quarentena' / 'vazio.error.json').read_text(encoding='utf-8'))
+    assert error['code'] == 'empty_file' and daemon.failed == 1
@@ -0,0 +1,37 @@
+"""
+Testes da medição de memória por trecho.
+"""
+import tracemalloc
+
+import pytest
+
+from memory import MemoryTracker
+
+
+@pytest.fixture
+def tracker():
+    tracker = MemoryTracker(snapshot_spans=('file',))
+    was_tracing = tracemalloc.is_tracing()
+    tracker.start()
+    yield tracker
+    if not was_tracing:
+        tracemalloc.stop()
+
+
+def test_nested_windows_keep_their_peaks(tracker):
+    outer = tracker.enter('file')
+    blob = bytearray(4 * 1024 * 1024)
+    del blob
+    inner = tracker.enter('text')
+    kept = [bytearray(1024 * 1024)]
+    inner_result = tracker.exit(inner)
+    outer_result = tracker.exit(outer)
+
+    # O pico de 4 MB antes da janela interna continua no pico da externa
+    assert outer_result['mem_peak_kb'] >= 4 * 1024
+    assert 1024 <= inner_result['mem_peak_kb'] < 4 * 1024
+    assert inner_result['mem_retained_kb'] >= 1024
+    assert 'mem_top' in outer_result and 'mem_top' not in inner_result
+    assert outer_result['mem_top'][0]['site'].startswith('COMMON/test_memory.py:')
+    assert tracker.stats()['max_peak_kb']['file'] == outer_result['mem_peak_kb']
+    del kept
@@ -0,0 +1,85 @@
+"""
+Testes da primeira camada de extração (leitor PyPDF2 substituído por páginas em memória).
+"""
+import pytest
+
+import prefilter
+from dates import DateWindow
+
+
+class FakePage:
+    def __init__(self, text):
+        self.text = text
+
+    def extract_text(self):
+        if self.text is None:
+            raise ValueError('conteúdo inválido')
+        return self.text
+
+
+def test_plan_pages_selects_marked_and_unreadable_pages(monkeypatch):
+    pages = [
+        FakePage('15 JAN 2025 Total de\nentradas + 1.500,00'),
+        FakePage('Compra no débito 10,00'),
+        FakePage(''),
+        FakePage(None),
+    ]
+    monkeypatch.setattr(prefilter, 'HAS_PYPDF2', True)
+    monkeypatch.setattr(prefilter, 'PdfReader', lambda path: type('R', (), {'pages': pages})())
+
+    report = prefilter.plan_pages('nubank', 'extrato.pdf')
+    assert report.selected == {1, 3, 4}
+    assert report.skipped == [2]
+    assert [d.reason for d in report.decisions] == ['marker', 'no_marker', 'no_text', 'error']
+
+
+def test_banks_without_markers_are_not_filtered():
+    assert prefilter.plan_pages('itau', 'extrato.pdf') is None
+
+
+def test_parse_page_range():
+    assert prefilter.parse_page_range(' 1-3, 7 ') == {1, 2, 3, 7}
+    assert prefilter.parse_page_range('') is None
+    for bad in ('0', '3-1', 'a', '2-'):
+        with pytest.raises(ValueError):
+            prefilter.parse_page_range(bad)
+
+
+def test_plan_date_pages_uses_line_start_dates_and_stops_early(monkeypatch):
+    header = 'Período: 01/01/2025 a 31/12/2025\n'
+    pages = [FakePage(header + f'01/{m:02d}/2025 PIX 10,00\n20/{m:02d}/2025 TED 5,00\nEmitido em 19/10/2026')
+             for m in range(1, 7)]
+    pages.insert(2, FakePage('Termos e condições'))
+    monkeypatch.setattr(prefilter, 'HAS_PYPDF2', True)
+    monkeypatch.setattr(prefilter, 'PdfReader', lambda path: type('R', (), {'pages': pages})())
+
+    report = prefilter.plan_date_pages('extrato.pdf', DateWindow.parse('01/02/2025', '31/03/2025'))
+    assert report.selected == {2, 3, 4}
+    assert [d.reason for d in report.decisions] == ['before', 'in_window', 'no_date', 'in_window', 'after',
+                                                    'stopped', 'stopped']
+
+    report = prefilter.plan_date_pages('extrato.pdf', DateWindow.parse('01/02/2025', '31/03/2025', stop_early=False),
+                                       pages={5, 6, 7})
+    assert [d.reason for d in report.decisions] == ['after', 'after', 'after']
+
+
+def test_raw_pdf_is_read_once_for_every_plan(monkeypatch):
+    from boilerplate import fingerprint_pages
+
+    class CountingPage(FakePage):
+        reads = 0
+
+        def extract_text(self):
+            CountingPage.reads += 1
+            return super().extract_text()
+
+    pages = [CountingPage('15/01/2025 Total de entradas 1.500,00'), CountingPage('16/01/2025 Compra 10,00')]
+    opened = []
+    monkeypatch.setattr(prefilter, 'HAS_PYPDF2', True)
+    monkeypatch.setattr(prefilter, 'PdfReader', lambda path: opened.append(path) or type('R', (), {'pages': pages})())
+
+    raw = prefilter.RawPdf.open('extrato.pdf')
+    assert prefilter.plan_pages('nubank', 'extrato.pdf', raw).selected == {1}
+    assert fingerprint_pages('extrato.pdf', raw) == [None, None]
+    assert prefilter.date_pages('extrato.pdf', DateWindow.parse('01/01/2025', '31/01/2025'), raw=raw) == {1, 2}
+    assert opened == ['extrato.pdf'] and CountingPage.reads == 2
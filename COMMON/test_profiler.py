@@ -0,0 +1,38 @@
+"""
+Testes do profiler por amostragem.
+"""
+import threading
+
+from profiler import Profile, sample
+
+
+def _busy(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_samples_busy_thread_in_collapsed_format():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy, args=(stop,))
+    worker.start()
+    try:
+        profile = sample(0.3, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert profile.samples > 0
+    assert 0 <= profile.overhead < 1
+    for line in profile.collapsed().splitlines():
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0
+    assert any(item['function'] == 'test_profiler.py:_busy' for item in profile.top(key='total'))
+
+
+def test_top_counts_self_and_total():
+    profile = Profile()
+    profile.stacks['a.py:main;b.py:parse'] = 3
+    profile.stacks['a.py:main'] = 1
+    top = profile.top()
+    assert top[0] == {'function': 'b.py:parse', 'self': 3, 'total': 3}
+    assert {'function': 'a.py:main', 'self': 1, 'total': 4} in top
@@ -0,0 +1,39 @@
+"""
+Testes do recorte da área de lançamentos (páginas sintéticas, sem PDF).
+"""
+from regions import RegionTemplate, extract_transaction_text, transaction_bbox
+
+
+class FakePage:
+    def __init__(self, lines):
+        self.bbox = (0, 0, 600, 800)
+        self.chars = []
+        for n, line in enumerate(lines):
+            top = 20 + n * 14
+            for i, ch in enumerate(line):
+                self.chars.append({'text': ch, 'x0': 40 + 6 * i, 'x1': 46 + 6 * i, 'top': top, 'bottom': top + 10,
+                                   'upright': True, 'doctop': top})
+
+    def extract_text(self, **kwargs):
+        raise AssertionError('página inteira não deveria ser extraída')
+
+
+TEMPLATE = RegionTemplate(start=('Lançamentos valor',), stop=('Ouvidoria',))
+
+
+def test_crops_between_header_and_footer():
+    page = FakePage([
+        'Extrato conta corrente',
+        'data lancamentos valor saldo',
+        '01/01/2025 PIX TRANSF JOAO 10,00',
+        'OUVIDORIA 0800 000 0000',
+    ])
+    _, top, _, bottom = transaction_bbox(page, TEMPLATE)
+    assert 44 < top < 48 and 47 < bottom < 62
+    assert extract_transaction_text(page, TEMPLATE) == '01/01/2025 PIX TRANSF JOAO 10,00'
+
+
+def test_page_without_anchors_is_not_cropped():
+    page = FakePage(['01/01/2025 PIX TRANSF JOAO 10,00'])
+    assert transaction_bbox(page, TEMPLATE) is None
+    assert transaction_bbox(page, None) is None
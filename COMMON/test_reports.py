@@ -0,0 +1,40 @@
+"""
+Testes dos relatórios agregados de entradas.
+"""
+from decimal import Decimal
+
+from reports import build_report, classify_type, payer_name
+
+
+def _row(date, type_, description, value):
+    return {'date': date, 'type': type_, 'description': description, 'value': Decimal(value)}
+
+
+def test_classify_type_across_banks():
+    assert classify_type('PIX', 'PIX TRANSF JOAO') == 'PIX'
+    assert classify_type('CRÉDITO', 'Transferência recebida pelo Pix JOAO') == 'PIX'
+    assert classify_type('CRÉDITO', 'DEPOSITO EM DINHEIRO') == 'DEPÓSITO'
+    assert classify_type('DINHEIRO RECEBIDO', 'BELTRANO') == 'OUTROS'
+
+
+def test_payer_name_drops_operation_words():
+    assert payer_name('PIX TRANSF João Silva 12') == 'JOAO SILVA'
+    assert payer_name('TED RECEBIDA EMPRESA XYZ') == 'EMPRESA XYZ'
+
+
+def test_build_report_single_pass_totals():
+    rows = [
+        _row('05/01/2025', 'PIX', 'PIX TRANSF JOAO', '100.00'),
+        _row('20/01/25', 'TED', 'TED RECEBIDA MARIA', '50.50'),
+        _row('03 FEV 2025', 'CRÉDITO', 'Pix recebido JOAO', '25.25'),
+    ]
+    report = build_report(rows, top_payers=1)
+
+    assert report.count == 3
+    assert report.total == Decimal('175.75')
+    assert [(m['month'], m['count'], m['total']) for m in report.months] == [
+        ('2025-01', 2, Decimal('150.50')),
+        ('2025-02', 1, Decimal('25.25')),
+    ]
+    assert report.payers == [{'payer': 'JOAO', 'count': 2, 'total': Decimal('125.25'), 'average': Decimal('62.62')}]
+    assert {t['type']: t['total'] for t in report.types} == {'PIX': Decimal('125.25'), 'TED': Decimal('50.50')}
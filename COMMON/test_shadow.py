@@ -0,0 +1,35 @@
+"""
+Testes do modo sombra (diferença entre produção e candidata).
+"""
+from decimal import Decimal
+
+import pytest
+
+from shadow import Candidate, diff_rows
+
+
+def _row(date, value, description):
+    return {'bank': 'itau', 'date': date, 'value': Decimal(value), 'description': description,
+            'type': 'PIX', 'page': 1}
+
+
+def test_diff_counts_repeated_rows():
+    primary = [_row('01/06/2025', '10.00', 'PIX JOAO'), _row('01/06/2025', '10.00', 'PIX JOAO'),
+               _row('02/06/2025', '5.00', 'TED MARIA')]
+    candidate = [_row('01/06/2025', '10.00', 'PIX JOAO'), _row('03/06/2025', '7.00', 'PIX ANA')]
+    diff = diff_rows(primary, candidate)
+    assert not diff['identical']
+    assert diff['matched'] == 1
+    assert diff['only_primary_count'] == 2
+    assert [r['description'] for r in diff['only_candidate']] == ['PIX ANA']
+    assert diff_rows(primary, list(reversed(primary)))['identical']
+
+
+def test_candidate_rejects_unknown_settings():
+    with pytest.raises(ValueError):
+        Candidate('typo', {'itau': {'attrs': {'COLOR_MINN': 0.2}}})
+    with pytest.raises(ValueError):
+        Candidate('opt', {'itau': {'options': {'checkpoint_dir': '/tmp'}}})
+    candidate = Candidate('ok', {'itau': {'attrs': {'COLOR_MIN': 0.5}}})
+    extractor = candidate._extractors['itau']
+    assert extractor.COLOR_MIN == 0.5 and type(extractor).__mro__[1].COLOR_MIN == 0.25
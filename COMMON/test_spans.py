@@ -0,0 +1,54 @@
+"""
+Testes da linha do tempo por requisição.
+"""
+import threading
+
+from spans import Trace, activate, current, note_file, span
+
+
+def test_span_without_trace_is_noop():
+    assert current() is None
+    with span('text', page=1) as s:
+        s.set(rows=3)
+
+
+def test_spans_record_file_page_and_errors():
+    trace = Trace('/process', bank='itau')
+    with activate(trace):
+        with span('save'):
+            pass
+        with activate(trace, file='a.pdf'):
+            note_file(pages=2)
+            with span('parse', page=1) as s:
+                s.set(rows=5)
+            try:
+                with span('text', page=2):
+                    raise ValueError
+            except ValueError:
+                pass
+    assert current() is None
+
+    record = trace.to_dict()
+    assert [(s['name'], s['file']) for s in record['spans']] == [('save', None), ('parse', 'a.pdf'), ('text', 'a.pdf')]
+    assert record['spans'][1]['rows'] == 5
+    assert record['spans'][2]['error'] == 'ValueError'
+    assert record['files'] == {'a.pdf': {'pages': 2}}
+    assert set(record['stages']) == {'save', 'parse', 'text'}
+
+
+def test_trace_is_passed_to_other_threads_explicitly():
+    trace = Trace('/process')
+    seen = []
+
+    def worker():
+        seen.append(current())
+        with activate(trace, file='b.pdf'), span('file'):
+            pass
+
+    with activate(trace):
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+    # Threads novas não herdam o ContextVar
+    assert seen == [None]
+    assert trace.spans[0][:2] == ('file', 'b.pdf')
@@ -0,0 +1,76 @@
+"""
+Testes do banco local de transações (SQLite).
+"""
+import sqlite3
+from decimal import Decimal
+
+from store import TransactionStore, build_fts_query
+
+
+def _row(date, description, value, bank='itau'):
+    return {'bank': bank, 'date': date, 'type': 'PIX', 'description': description, 'value': Decimal(value), 'page': 1}
+
+
+def test_build_fts_query():
+    assert build_fts_query('joão silv*') == '"JOAO" "SILV"*'
+    assert build_fts_query('"Maria Souza" ted') == '"MARIA SOUZA" "TED"'
+    assert build_fts_query('  ') == ''
+
+
+def test_reimport_is_idempotent_and_overlap_counts_once(tmp_path):
+    store = TransactionStore(str(tmp_path / 'tx.db'))
+    jan = [_row('05/01/2025', 'PIX TRANSF JOAO', '100.00'), _row('20/01/2025', 'TED RECEBIDA MARIA', '50.00')]
+    quarter = jan + [_row('03/02/2025', 'PIX TRANSF JOAO', '100.00')]
+
+    store.save_file('a' * 64, jan, 'itau', client='c1')
+    store.save_file('a' * 64, jan, 'itau', client='c1')
+    store.save_file('b' * 64, quarter, 'itau', client='c1')
+
+    monthly = store.monthly_totals(client='c1')
+    assert [(m['month'], m['count'], m['total']) for m in monthly] == [
+        ('2025-01', 2, Decimal('150.00')),
+        ('2025-02', 1, Decimal('100.00')),
+    ]
+    assert store.payer_totals(client='c1')[0]['payer'] == 'JOAO'
+
+
+def test_payer_totals_ignore_dates_and_documents(tmp_path):
+    store = TransactionStore(str(tmp_path / 'tx.db'))
+    rows = [_row('02/06/2025', 'PIX TRANSF JOAO02/06', '10.00'), _row('09/06/2025', 'PIX TRANSF JOAO09/06', '20.00'),
+            _row('10/06/2025', 'TED 341.1234 JOAO', '5.00')]
+    store.save_file('d' * 64, rows, 'itau', client='c1')
+
+    assert [(p['payer'], p['count'], p['total']) for p in store.payer_totals(client='c1')] == [
+        ('JOAO', 3, Decimal('35.00')),
+    ]
+    assert len(store.search('joao')) == 3
+    # A busca continua sobre a descrição inteira, não só sobre o pagador
+    assert len(store.search('transf')) == 2 and len(store.search('ted')) == 1
+
+
+def test_search_prefix_and_accents(tmp_path):
+    store = TransactionStore(str(tmp_path / 'tx.db'))
+    store.save_file('c' * 64, [_row('05/01/2025', 'Transferência recebida João Silva', '10.00')], 'nubank', client='c1')
+
+    assert len(store.search('joao silv*')) == 1
+    assert len(store.search('"joão silva"', client='c1')) == 1
+    assert store.search('silva', client='outro') == []
+
+
+def test_version_1_database_gets_description_search_back(tmp_path):
+    path = str(tmp_path / 'tx.db')
+    TransactionStore(path).save_file('e' * 64, [_row('05/01/2025', 'PIX TRANSF JOAO', '10.00')], 'itau')
+    # Banco da versão 1: índice de texto sobre `payer`, sem a descrição normalizada
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        DROP TRIGGER transactions_fts_ai; DROP TRIGGER transactions_fts_ad; DROP TABLE transactions_fts;
+        CREATE VIRTUAL TABLE transactions_fts USING fts5(payer, content='transactions', content_rowid='id');
+        INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild');
+        UPDATE transactions SET normalized = '';
+        PRAGMA user_version = 1;
+    """)
+    conn.close()
+
+    store = TransactionStore(path)
+    assert len(store.search('pix transf')) == 1
+    assert store.payer_totals()[0]['payer'] == 'JOAO'
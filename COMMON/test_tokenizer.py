@@ -0,0 +1,34 @@
+"""
+Testes do tokenizador de linhas compartilhado.
+"""
+from decimal import Decimal
+
+from tokenizer import LineTokenizer, tokenize
+
+
+def test_dates_amounts_and_description():
+    t = tokenize('02/06/2025 PIX TRANSF JOAO 02/06 1.234,56 10.000,00')
+    assert t.first_date == '02/06/2025'
+    assert [a.text for a in t.amounts] == ['1.234,56', '10.000,00']
+    assert t.first_amount.value() == Decimal('1234.56')
+    assert t.description() == 'PIX TRANSF JOAO 02/06'
+
+
+def test_sign_position():
+    assert tokenize('PAGTO -27,00').first_amount.sign == 'before'
+    assert tokenize('Pix Enviado -R$ 20,00').first_amount.sign == 'before'
+    assert tokenize('Tarifa R$ -5,00').first_amount.sign == 'after'
+    assert not tokenize('Pix Recebido R$ 150,00').first_amount.negative
+
+
+def test_text_and_dash_dates():
+    assert tokenize('15 JAN 2025 Total de entradas + 1.500,00').first_date == '15 JAN 2025'
+    t = tokenize('01-02-2025 FULANO R$ 200,00')
+    assert t.find_date('-') == '01-02-2025'
+    assert t.find_date('/') is None
+
+
+def test_noise_is_dropped_from_description():
+    tokenizer = LineTokenizer(noise=r'\b\d{5,}\b|(?i:N\s*[°º]\s*DOCUMENTO)', noise_start=r'\dNn')
+    t = tokenizer.tokenize('02/06/25 PIX RECEBIDO FULANO Nº DOCUMENTO 123456 1.000,00 5.000,00')
+    assert t.description(keep_dates=True) == '02/06/25 PIX RECEBIDO FULANO'
@@ -0,0 +1,149 @@
+"""
+Tokenizador de linhas de extrato compartilhado pelos extratores.
+
+Uma única expressão regular (compilada uma vez por tokenizador) percorre a
+linha uma vez e devolve as datas, os valores (com sinal e "R$") e os trechos
+a descartar da descrição. A descrição limpa é montada a partir desses
+trechos, sem novas substituições por regex.
+
+Formatos reconhecidos:
+- datas: dd/mm/aaaa, dd/mm/aa, dd-mm-aaaa e "DD MMM AAAA" (meses em português);
+- valores: 1.234,56 ou 1234,56, com "R$" e sinal de menos (antes ou depois do "R$").
+"""
+from __future__ import annotations
+
+import re
+from decimal import Decimal
+from typing import List, NamedTuple, Optional, Tuple
+
+_MONTHS = 'JAN|FEV|MAR|ABR|MAI|JUN|JUL|AGO|SET|OUT|NOV|DEZ'
+
+DATE_REGEX = (
+    r'\d{2}/\d{2}/(?:\d{4}|\d{2})'
+    r'|\d{2}-\d{2}-\d{4}'
+    r'|\d{1,2}\s+(?i:' + _MONTHS + r')\s+\d{4}'
+)
+AMOUNT_REGEX = r'(?P<sign>[-−]\s*)?(?P<currency>R\$\s*)?(?P<sign2>[-−]\s*)?(?P<number>\d+(?:\.\d{3})*,\d{2})'
+
+
+class Amount(NamedTuple):
+    """Valor monetário encontrado na linha."""
+    text: str           # somente os dígitos, ex.: "1.234,56"
+    start: int          # início dos dígitos na linha
+    end: int
+    span_start: int     # início incluindo sinal e "R$"
+    sign: str           # '' (sem sinal), 'before' ("-R$ 10,00", "-10,00") ou 'after' ("R$ -10,00")
+    has_currency: bool
+
+    @property
+    def negative(self) -> bool:
+        return bool(self.sign)
+
+    def value(self) -> Decimal:
+        return Decimal(self.text.replace('.', '').replace(',', '.'))
+
+
+class LineTokens:
+    """Resultado da tokenização de uma linha."""
+
+    __slots__ = ('line', 'dates', 'amounts', '_drop', '_upper')
+
+    def __init__(self, line: str, dates: List[Tuple[str, int, int]], amounts: List[Amount],
+                 drop: List[Tuple[str, int, int]]):
+        self.line = line
+        self.dates = dates
+        self.amounts = amounts
+        self._drop = drop
+        self._upper: Optional[str] = None
+
+    @property
+    def upper(self) -> str:
+        """Linha em maiúsculas com espaços colapsados (calculada uma vez)."""
+        if self._upper is None:
+            self._upper = ' '.join(self.line.split()).upper()
+        return self._upper
+
+    @property
+    def first_date(self) -> Optional[str]:
+        return self.dates[0][0] if self.dates else None
+
+    def find_date(self, separator: str) -> Optional[str]:
+        """Primeira data que usa o separador informado ("/" ou "-")."""
+        for text, _, _ in self.dates:
+            if separator in text:
+                return text
+        return None
+
+    @property
+    def first_amount(self) -> Optional[Amount]:
+        return self.amounts[0] if self.amounts else None
+
+    def description(self, keep_dates: bool = False, strip_chars: Optional[str] = None) -> str:
+        """Linha sem valores, sem ruído e (por padrão) sem datas, com espaços colapsados."""
+        parts = []
+        pos = 0
+        for kind, start, end in self._drop:
+            if keep_dates and kind == 'date':
+                continue
+            parts.append(self.line[pos:start])
+            parts.append(' ')
+            pos = end
+        parts.append(self.line[pos:])
+        desc = ' '.join(''.join(parts).split())
+        return desc.strip(strip_chars) if strip_chars else desc
+
+
+class LineTokenizer:
+    """
+    Tokenizador configurável; crie uma instância por extrator (nível de classe).
+
+    Args:
+        noise: Regex opcional de trechos a remover da descrição (ex.: números
+            de documento). É incorporada à expressão principal na construção.
+        noise_start: Caracteres (conteúdo de uma classe de regex) com que um
+            trecho de `noise` pode começar.
+    """
+
+    # Todo token de data/valor começa com dígito, sinal ou "R$"; o lookahead
+    # descarta as demais posições sem testar cada alternativa.
+    TOKEN_START = r'\d\-−R'
+
+    def __init__(self, noise: Optional[str] = None, noise_start: str = r'\d'):
+        pattern = rf'(?P<date>{DATE_REGEX})|(?P<amount>{AMOUNT_REGEX})'
+        start = self.TOKEN_START
+        if noise:
+            pattern += rf'|(?P<noise>{noise})'
+            start += noise_start
+        self.pattern = re.compile(rf'(?=[{start}])(?:{pattern})')
+
+    def tokenize(self, line: str) -> LineTokens:
+        dates: List[Tuple[str, int, int]] = []
+        amounts: List[Amount] = []
+        drop: List[Tuple[str, int, int]] = []
+        for m in self.pattern.finditer(line):
+            kind = m.lastgroup
+            if kind == 'date':
+                start, end = m.span()
+                dates.append((m.group('date'), start, end))
+                drop.append(('date', start, end))
+            elif kind == 'amount':
+                start, end = m.span('number')
+                amounts.append(Amount(
+                    text=m.group('number'),
+                    start=start,
+                    end=end,
+                    span_start=m.start(),
+                    sign='before' if m.group('sign') else ('after' if m.group('sign2') else ''),
+                    has_currency=m.group('currency') is not None
+                ))
+                drop.append(('amount', m.start(), end))
+            else:
+                drop.append(('noise', m.start(), m.end()))
+        return LineTokens(line, dates, amounts, drop)
+
+
+DEFAULT_TOKENIZER = LineTokenizer()
+
+
+def tokenize(line: str) -> LineTokens:
+    return DEFAULT_TOKENIZER.tokenize(line)
@@ -9,13 +9,27 @@ from __future__ import annotations
 import argparse
 import csv
 import json
+import os
 import re
+import sys
+import unicodedata
 from dataclasses import dataclass, asdict
-from typing import List, Optional, Dict, Any
+from typing import Any, Collection, Dict, List, Optional, Tuple
 from decimal import Decimal, ROUND_DOWN, InvalidOperation
 
 import pdfplumber
 
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.checkpoint import PageCheckpoint, open_checkpoint
+from COMMON.dates import DateCutoff, DateWindow, parse_date
+from COMMON.prefilter import RawPdf, date_pages, parse_page_range
+from COMMON.regions import REGION_TEMPLATES, extract_transaction_text
+from COMMON.spans import open_pdf, span
+from COMMON.tokenizer import LineTokenizer, LineTokens
+
 
 @dataclass
 class CreditEntry:
@@ -39,15 +53,68 @@ class CreditEntry:
         }
 
 
+@dataclass
+class ColumnLayout:
+    """Colunas do extrato detectadas pelo cabeçalho: nome -> centro horizontal (x)."""
+    centers: Dict[str, float]
+    signature: str
+
+    # Palavras do cabeçalho (sem acento, minúsculas) e a coluna que representam
+    HEADER_WORDS = {
+        'data': 'date',
+        'lancamentos': 'description',
+        'lancamento': 'description',
+        'historico': 'description',
+        'descricao': 'description',
+        'valor': 'value',
+        'entradas': 'credit',
+        'creditos': 'credit',
+        'saidas': 'debit',
+        'debitos': 'debit',
+        'saldo': 'balance',
+    }
+    AMOUNT_COLUMNS = ('value', 'credit', 'debit', 'balance')
+
+    @classmethod
+    def from_words(cls, words: List[Dict[str, Any]], page_width: float) -> Optional['ColumnLayout']:
+        """Procura a linha de cabeçalho (data + valor/entradas + saldo...) entre as palavras da página."""
+        rows: Dict[int, Dict[str, float]] = {}
+        for w in words:
+            key = cls.HEADER_WORDS.get(_fold(w['text']))
+            if key is None:
+                continue
+            row = rows.setdefault(round(w['top']), {})
+            if key not in row:
+                row[key] = (w['x0'] + w['x1']) / 2
+
+        for top in sorted(rows):
+            centers = rows[top]
+            has_amount = any(c in centers for c in ('value', 'credit'))
+            if 'date' in centers and has_amount and len(centers) >= 3:
+                ordered = sorted(centers.items(), key=lambda item: item[1])
+                signature = f"{round(page_width)}:" + ','.join(f"{name}@{round(x / 5) * 5}" for name, x in ordered)
+                return cls(centers=dict(ordered), signature=signature)
+        return None
+
+    def column_at(self, x: float) -> Optional[str]:
+        """Coluna de valores mais próxima da posição x (faixas divididas no ponto médio entre colunas)."""
+        candidates = [(abs(x - cx), name) for name, cx in self.centers.items() if name in self.AMOUNT_COLUMNS]
+        return min(candidates)[1] if candidates else None
+
+    def is_credit_column(self, column: Optional[str]) -> bool:
+        if 'credit' in self.centers:
+            return column == 'credit'
+        return column == 'value'
+
+
+def _fold(text: str) -> str:
+    folded = unicodedata.normalize('NFKD', text.strip().lower())
+    return ''.join(ch for ch in folded if not unicodedata.combining(ch)).strip('():')
+
+
 class ItauExtractParser:
     """Parser especializado para extratos do Itaú."""
     
-    # Padrões de expressões regulares para extração
-    # Aceita datas nos formatos dd/mm/aaaa e dd/mm/aa (alguns PDFs variam)
-    # Prioriza ano com 4 dígitos; aceita também com 2 dígitos
-    DATE_PATTERN = re.compile(r'(\d{2}/\d{2}/(?:\d{4}|\d{2}))')
-    AMOUNT_PATTERN = re.compile(r'(\d{1,3}(?:\.\d{3})*,\d{2})')
-    
     # Tipos de transação que representam créditos
     CREDIT_TYPES = {
         'PIX QRS': 'PIX',
@@ -57,47 +124,37 @@ class ItauExtractParser:
         'DOC RECEBIDO': 'DOC',
         'DEPOSITO': 'DEPÓSITO'
     }
-    # Color detection thresholds (tweakable)
+    # Tokenizador compartilhado: datas, valores e descrição em uma passada por linha
+    TOKENIZER = LineTokenizer()
+    # Área de lançamentos: o texto é extraído só abaixo do cabeçalho da tabela
+    REGION = REGION_TEMPLATES['itau']
+    # Color detection thresholds (tweakable; lidos via cls, então uma subclasse pode trocá-los)
     COLOR_MIN = 0.25      # componente mínimo para considerar cor predominante (0..1)
     COLOR_DIFF = 0.03     # diferença mínima entre componente predominante e os outros
 
-    @staticmethod
-    def is_credit_line(line: str) -> bool:
+    def __init__(self, column_mode: bool = False):
         """
-        Verifica se uma linha contém uma transação de crédito.
-        No Itaú, créditos são valores positivos (sem sinal de menos).
+        Args:
+            column_mode: Classifica cada linha pela posição x do valor (colunas
+                aprendidas no cabeçalho da primeira página) em vez de palavras-chave
+                e cor. Páginas sem layout conhecido continuam no modo texto.
         """
-        # Remove espaços extras e converte para maiúsculas para comparação
-        line = ' '.join(line.strip().split())
-        line_upper = line.upper()
+        self.column_mode = column_mode
 
-        # Se a linha começa com - ou tem -R$, é um débito
+    @staticmethod
+    def _is_credit_tokens(tokens: LineTokens) -> bool:
+        """
+        Verifica se a linha (já tokenizada) contém uma transação de crédito:
+        um tipo conhecido de crédito, sem começar com "-" nem ter "-R$".
+        """
+        line = tokens.upper
         if line.startswith('-') or '-R$' in line:
             return False
-
-        # Verifica se é um tipo conhecido de crédito
         for credit_type in ItauExtractParser.CREDIT_TYPES:
-            if credit_type in line_upper:
+            if credit_type in line:
                 return True
-
         return False
 
-    @staticmethod
-    def parse_amount(amount_str: str) -> Decimal:
-        """Converte uma string de valor monetário para Decimal."""
-        # Remove R$ e espaços, substitui , por . para conversão
-        clean_amount = amount_str.replace('R$', '').replace('.', '').replace(',', '.').strip()
-        return Decimal(clean_amount)
-
-    @staticmethod
-    def clean_description(line: str) -> str:
-        """Limpa a descrição da transação, removendo dados desnecessários."""
-        # Remove valores monetários, datas e espaços extras
-        desc = ItauExtractParser.AMOUNT_PATTERN.sub('', line)
-        desc = ItauExtractParser.DATE_PATTERN.sub('', desc)
-        desc = re.sub(r'\s+', ' ', desc).strip()
-        return desc
-
     @staticmethod
     def get_transaction_type(line: str) -> str:
         """Identifica o tipo de transação com base no texto da linha."""
@@ -113,19 +170,19 @@ class ItauExtractParser:
         """
         if debug:
             print(f"[DEBUG] Analisando linha: {line[:100]}")
-            
-        if not self.is_credit_line(line):
+
+        tokens = self.TOKENIZER.tokenize(line)
+        if not self._is_credit_tokens(tokens):
             if debug:
                 print(f"[DEBUG] ❌ Não é linha de crédito")
             return None
 
         # Extrai a data
-        date_match = self.DATE_PATTERN.search(line)
-        if not date_match:
+        date = tokens.find_date('/')
+        if not date:
             if debug:
                 print(f"[DEBUG] ❌ Data não encontrada")
             return None
-        date = date_match.group(1)
         # Normaliza ano com 2 dígitos para 20YY
         # Ex.: 02/06/25 -> 02/06/2025
         if len(date.split('/')[-1]) == 2:
@@ -133,29 +190,29 @@ class ItauExtractParser:
             date = f"{d}/{m}/20{yy}"
 
         # Extrai o valor
-        amount_match = self.AMOUNT_PATTERN.search(line)
-        if not amount_match:
+        amount_token = tokens.first_amount
+        if amount_token is None:
             if debug:
                 print(f"[DEBUG] ❌ Valor não encontrado")
             return None
-        
+
         try:
-            amount = self.parse_amount(amount_match.group(1))
+            amount = amount_token.value()
         except (ValueError, InvalidOperation):
             if debug:
                 print(f"[DEBUG] ❌ Erro ao converter valor")
             return None
 
-        # Detecta se há um sinal de menos imediatamente antes do valor no texto bruto
-        # (ex.: "-27,00" ou "- 27,00"). Nesse caso trata como débito e ignora.
-        amt_text = amount_match.group(1)
-        if re.search(r'[-−]\s*' + re.escape(amt_text), line):
+        # Sinal de menos junto do valor do lançamento, o primeiro da linha
+        # (ex.: "-27,00", "- 27,00" ou "R$ -27,00"): trata como débito e ignora.
+        # O sinal de outro valor da linha (ex.: saldo negativo) não conta.
+        if amount_token.negative:
             if debug:
                 print(f"[DEBUG] ❌ Encontrado sinal de menos antes do valor")
             return None
 
         # Identifica o tipo de transação ANTES de checar cor
-        transaction_type = self.get_transaction_type(line)
+        transaction_type = self.get_transaction_type(tokens.upper)
         is_known_credit_type = (transaction_type != 'OUTROS')
 
         # Se disponível, tenta inferir a cor do texto do valor na página PDF.
@@ -163,8 +220,8 @@ class ItauExtractParser:
         # NÃO ignora mesmo se estiver vermelho, pois pode ser erro de formatação do PDF.
         if page_obj is not None and not is_known_credit_type:
             try:
-                amt_text = amount_match.group(1)
-                color = self._find_color_for_text_on_page(page_obj, amt_text)
+                with span('color', page=page):
+                    color = self._find_color_for_text_on_page(page_obj, amount_token.text)
                 if color is not None:
                     if self._is_red(color):
                         # Texto em vermelho = saída (não é crédito)
@@ -180,7 +237,7 @@ class ItauExtractParser:
             return None
 
         # Obtém a descrição limpa
-        description = self.clean_description(line)
+        description = tokens.description()
 
         return CreditEntry(
             date=date,
@@ -191,26 +248,153 @@ class ItauExtractParser:
             page=page
         )
 
-    def extract_credits(self, pdf_path: str) -> List[CreditEntry]:
+    def extract_credits(self, pdf_path: str, pages: Optional[Collection[int]] = None,
+                        checkpoint: Optional[PageCheckpoint] = None,
+                        dates: Optional[DateWindow] = None,
+                        raw: Optional[RawPdf] = None) -> List[CreditEntry]:
         """
         Extrai todas as entradas de crédito de um arquivo PDF de extrato do Itaú.
+
+        Args:
+            pdf_path: Caminho do PDF.
+            pages: Números das páginas (a partir de 1) a processar; None lê todas.
+            checkpoint: Progresso por página (`COMMON.checkpoint`): páginas já
+                concluídas são restauradas, com o layout de colunas aprendido.
+            dates: Só os créditos deste período; páginas com datas todas fora
+                dele são puladas antes do pdfplumber (`COMMON.prefilter.date_pages`).
+            raw: O PDF já aberto no PyPDF2 pelo chamador (`COMMON.prefilter.RawPdf`),
+                reaproveitado para ler as datas.
         """
+        pages = date_pages(pdf_path, dates, pages, raw)
+        cutoff = DateCutoff(dates) if dates is not None else None
         credits = []
+        layout: Optional[ColumnLayout] = None
+        done = ()
+        if checkpoint is not None:
+            done = checkpoint.done
+            saved_layout = checkpoint.state.get('layout')
+            if saved_layout:
+                layout = ColumnLayout(**saved_layout)
         
-        with pdfplumber.open(pdf_path) as pdf:
+        with open_pdf(pdf_path) as pdf:
             for page_num, page in enumerate(pdf.pages, 1):
-                text = page.extract_text()
-                if not text:
+                if pages is not None and page_num not in pages:
                     continue
+                if page_num in done:
+                    page_credits = checkpoint.restore(CreditEntry, page_num)
+                else:
+                    page_credits, layout = self._extract_page(page, page_num, layout)
+                    if checkpoint is not None:
+                        checkpoint.page_done(page_num, page_credits, {'layout': asdict(layout) if layout else None})
+                credits.extend(page_credits)
+                if cutoff is not None and cutoff.past_end(parse_date(c.date) for c in page_credits):
+                    break
 
-                # Carrega caracteres da página (quando disponíveis) para checar cor
-                page_chars = getattr(page, 'chars', None) or []
+        return dates.keep(credits) if dates is not None else credits
+
+    def _extract_page(self, page, page_num: int,
+                      layout: Optional[ColumnLayout]) -> Tuple[List[CreditEntry], Optional[ColumnLayout]]:
+        """Créditos de uma página e o layout de colunas em vigor ao fim dela."""
+        if self.column_mode:
+            with span('text', page=page_num, mode='words'):
+                words = page.extract_words()
+            # O layout da página anterior vale enquanto os valores da página
+            # continuarem alinhados nas colunas dele; só então o cabeçalho é
+            # procurado de novo (primeira página ou modelo trocado no meio).
+            # O layout não passa de um documento para outro: o alinhamento não
+            # confirma quais colunas são entradas e saídas.
+            if layout is not None:
+                page_credits = self.parse_words_by_columns(words, page_num, layout)
+                if page_credits is not None:
+                    return page_credits, layout
+            page_layout = ColumnLayout.from_words(words, page.width)
+            if page_layout is not None and (layout is None or page_layout.signature != layout.signature):
+                layout = page_layout
+                page_credits = self.parse_words_by_columns(words, page_num, layout)
+                if page_credits is not None:
+                    return page_credits, layout
+
+        with span('text', page=page_num):
+            text = extract_transaction_text(page, self.REGION)
+        if not text:
+            return [], layout
 
-                for line in text.splitlines():
-                    credit_entry = self.parse_line(line.strip(), page_num, page_obj=page)
-                    if credit_entry:
-                        credits.append(credit_entry)
+        credits = []
+        with span('parse', page=page_num) as s:
+            for line in text.splitlines():
+                credit_entry = self.parse_line(line.strip(), page_num, page_obj=page)
+                if credit_entry:
+                    credits.append(credit_entry)
+            s.set(rows=len(credits))
+        return credits, layout
+
+    def parse_words_by_columns(self, words: List[Dict[str, Any]], page: int,
+                               layout: ColumnLayout) -> Optional[List[CreditEntry]]:
+        """
+        Monta as linhas da página a partir das palavras e classifica cada uma
+        pela coluna (posição x) em que o valor aparece: valores na coluna de
+        entradas (ou na coluna "valor" sem sinal de menos) são créditos, mesmo
+        sem palavra-chave de `CREDIT_TYPES`; valores na coluna de saldo são ignorados.
+
+        Retorna None quando os valores da página não estão alinhados em colunas
+        (a maioria não cai nas bordas direitas mais frequentes): o cabeçalho
+        casou, mas o PDF é texto corrido e o chamador usa o modo texto.
+        """
+        credits = []
+        edges: Dict[int, int] = {}
+        for row in _group_rows(words):
+            parts = []
+            starts = []
+            pos = 0
+            for w in row:
+                starts.append(pos)
+                parts.append(w['text'])
+                pos += len(w['text']) + 1
+            line = ' '.join(parts)
+
+            tokens = self.TOKENIZER.tokenize(line)
+            date = tokens.find_date('/')
+            if not date or not tokens.amounts or 'SALDO' in tokens.upper:
+                continue
+
+            credit_amount = None
+            for amount_token in tokens.amounts:
+                # palavra que contém os dígitos do valor
+                idx = max(i for i, st in enumerate(starts) if st <= amount_token.start)
+                word = row[idx]
+                edge = round(word['x1'])
+                edges[edge] = edges.get(edge, 0) + 1
+                column = layout.column_at((word['x0'] + word['x1']) / 2)
+                if credit_amount is None and layout.is_credit_column(column) and not amount_token.negative:
+                    credit_amount = amount_token
+            if credit_amount is None:
+                continue
 
+            try:
+                amount = credit_amount.value()
+            except (ValueError, InvalidOperation):
+                continue
+            if amount <= 0:
+                continue
+
+            if len(date.split('/')[-1]) == 2:
+                d, m, yy = date.split('/')
+                date = f"{d}/{m}/20{yy}"
+
+            credits.append(CreditEntry(
+                date=date,
+                description=tokens.description(),
+                amount=amount,
+                transaction_type=self.get_transaction_type(tokens.upper),
+                raw_line=line,
+                page=page
+            ))
+
+        # Em colunas reais os valores se concentram em poucas bordas (uma por coluna)
+        columns = sum(1 for name in layout.centers if name in layout.AMOUNT_COLUMNS)
+        aligned = sum(sorted(edges.values(), reverse=True)[:columns])
+        if edges and aligned * 2 < sum(edges.values()):
+            return None
         return credits
 
     # ---------- cor / cor do texto helpers ----------
@@ -247,23 +431,23 @@ class ItauExtractParser:
             return (val, val, val)
         return None
 
-    @staticmethod
-    def _is_green(color_tuple) -> bool:
+    @classmethod
+    def _is_green(cls, color_tuple) -> bool:
         """Decide se a cor (r,g,b) é verde predominante."""
-        c = ItauExtractParser._normalize_color_value(color_tuple)
+        c = cls._normalize_color_value(color_tuple)
         if not c:
             return False
         r, g, b = c
-        return (g > ItauExtractParser.COLOR_MIN) and (g > r + ItauExtractParser.COLOR_DIFF) and (g > b + ItauExtractParser.COLOR_DIFF)
+        return (g > cls.COLOR_MIN) and (g > r + cls.COLOR_DIFF) and (g > b + cls.COLOR_DIFF)
 
-    @staticmethod
-    def _is_red(color_tuple) -> bool:
+    @classmethod
+    def _is_red(cls, color_tuple) -> bool:
         """Decide se a cor (r,g,b) é vermelha predominante."""
-        c = ItauExtractParser._normalize_color_value(color_tuple)
+        c = cls._normalize_color_value(color_tuple)
         if not c:
             return False
         r, g, b = c
-        return (r > ItauExtractParser.COLOR_MIN) and (r > g + ItauExtractParser.COLOR_DIFF) and (r > b + ItauExtractParser.COLOR_DIFF)
+        return (r > cls.COLOR_MIN) and (r > g + cls.COLOR_DIFF) and (r > b + cls.COLOR_DIFF)
 
     def _find_color_for_text_on_page(self, page, target_text: str):
         """Procura na lista de caracteres (`page.chars`) uma sequência que forme `target_text`.
@@ -309,6 +493,18 @@ class ItauExtractParser:
         return credits
 
 
+def _group_rows(words: List[Dict[str, Any]], tolerance: float = 3) -> List[List[Dict[str, Any]]]:
+    """Agrupa palavras em linhas visuais (mesmo `top`, com tolerância), da esquerda para a direita."""
+    rows: List[List[Dict[str, Any]]] = []
+    current_top = None
+    for w in sorted(words, key=lambda w: (w['top'], w['x0'])):
+        if current_top is None or w['top'] - current_top > tolerance:
+            rows.append([])
+            current_top = w['top']
+        rows[-1].append(w)
+    return [sorted(row, key=lambda w: w['x0']) for row in rows]
+
+
 def save_csv(entries: List[CreditEntry], filepath: str) -> None:
     """Salva as entradas de crédito em um arquivo CSV."""
     with open(filepath, 'w', newline='', encoding='utf-8') as f:
@@ -351,21 +547,43 @@ def main():
         action='store_true',
         help='Imprime/salva somente os valores (um por linha) para copiar/colar no Excel'
     )
+    parser.add_argument(
+        '--columns',
+        action='store_true',
+        help='Classifica créditos pela coluna (posição x) do valor, aprendida no cabeçalho do extrato'
+    )
     parser.add_argument(
         '--decimal-comma', '--br',
         action='store_true',
         help='Usa vírgula como separador decimal (ex: 768,00)'
     )
+    parser.add_argument(
+        '--checkpoint-dir',
+        help='Grava o progresso por página nesta pasta; rodar de novo após uma interrupção retoma da última página concluída'
+    )
+    parser.add_argument('--from', dest='date_from', help='Só lançamentos a partir desta data (dd/mm/aaaa ou aaaa-mm-dd)')
+    parser.add_argument('--to', dest='date_to', help='Só lançamentos até esta data (dd/mm/aaaa ou aaaa-mm-dd)')
+    parser.add_argument('--pages', help='Só estas páginas, a partir de 1 (ex.: 1-3,7)')
+    parser.add_argument('--no-early-stop', action='store_true',
+                        help='Lê até a última página mesmo depois do fim do período (PDF com extratos fora de ordem)')
     
     args = parser.parse_args()
+    try:
+        dates = DateWindow.parse(args.date_from, args.date_to, stop_early=not args.no_early_stop)
+        pages = parse_page_range(args.pages)
+    except ValueError as e:
+        parser.error(str(e))
 
     # Extrai os créditos do PDF
-    parser = ItauExtractParser()
+    parser = ItauExtractParser(column_mode=args.columns)
+    checkpoint = open_checkpoint(args.checkpoint_dir, 'itau', args.pdf, variant='columns' if args.columns else '')
     try:
-        entries = parser.extract_credits(args.pdf)
+        entries = parser.extract_credits(args.pdf, pages=pages, checkpoint=checkpoint, dates=dates)
     except Exception as e:
         print(f'Erro durante a extração: {e}')
         return
+    if checkpoint is not None:
+        checkpoint.discard()
 
     if not entries:
         print('Nenhum crédito encontrado no extrato.')
@@ -0,0 +1,72 @@
+"""
+Testes do extrator Itaú sem PDF: regras de linha e classificação por colunas (palavras sintéticas).
+"""
+from decimal import Decimal
+
+from itau_extractor import ColumnLayout, ItauExtractParser
+
+
+def _word(text, x0, top):
+    return {'text': text, 'x0': x0, 'x1': x0 + 6 * len(text), 'top': top}
+
+
+HEADER = [_word('Data', 40, 100), _word('Lançamentos', 100, 100), _word('Entradas', 330, 100),
+          _word('Saídas', 410, 100), _word('Saldo', 490, 100)]
+
+
+def _amount(text, right, top):
+    return {'text': text, 'x0': right - 6 * len(text), 'x1': right, 'top': top}
+
+
+def test_layout_from_header():
+    layout = ColumnLayout.from_words(HEADER, 595)
+    assert layout is not None
+    assert layout.column_at(375) == 'credit'
+    assert layout.column_at(520) == 'balance'
+    assert layout.is_credit_column('credit') and not layout.is_credit_column('value')
+
+
+def test_columns_catch_keywordless_credits():
+    words = HEADER + [
+        _word('05/01/2025', 40, 120), _word('SALARIO', 100, 120), _amount('5.000,00', 378, 120), _amount('7.000,00', 520, 120),
+        _word('06/01/2025', 40, 140), _word('BOLETO', 100, 140), _amount('200,00', 458, 140), _amount('6.800,00', 520, 140),
+        _word('07/01/2025', 40, 160), _word('SALDO', 100, 160), _amount('6.800,00', 520, 160),
+    ]
+    parser = ItauExtractParser(column_mode=True)
+    credits = parser.parse_words_by_columns(words, 1, ColumnLayout.from_words(words, 595))
+    assert [(c.date, c.amount) for c in credits] == [('05/01/2025', Decimal('5000.00'))]
+
+
+def test_debit_sign_is_read_from_the_first_amount():
+    parser = ItauExtractParser()
+    assert parser.parse_line('05/01/2025 PIX TRANSF JOAO -150,00', 1) is None
+    assert parser.parse_line('05/01/2025 PIX TRANSF JOAO - 150,00', 1) is None
+    assert parser.parse_line('05/01/2025 PIX TRANSF JOAO R$ -150,00', 1) is None
+    # Saldo negativo com o mesmo número depois do lançamento: continua crédito
+    entry = parser.parse_line('05/01/2025 PIX TRANSF JOAO 150,00 -150,00', 1)
+    assert (entry.amount, entry.description) == (Decimal('150.00'), 'PIX TRANSF JOAO')
+
+
+class _Page:
+    width = 595
+
+    def __init__(self, words):
+        self.words = words
+
+    def extract_words(self):
+        return self.words
+
+
+def test_layout_is_detected_once_and_reused(monkeypatch):
+    rows = [_word('05/01/2025', 40, 120), _word('SALARIO', 100, 120), _amount('5.000,00', 378, 120),
+            _amount('7.000,00', 520, 120)]
+    calls = []
+    from_words = ColumnLayout.from_words
+    monkeypatch.setattr(ColumnLayout, 'from_words',
+                        classmethod(lambda cls, *a: calls.append(1) or from_words(*a)))
+    parser = ItauExtractParser(column_mode=True)
+    first, layout = parser._extract_page(_Page(HEADER + rows), 1, None)
+    # página de continuação, sem cabeçalho: o layout da anterior vale
+    second, same = parser._extract_page(_Page(rows), 2, layout)
+    assert len(calls) == 1 and same is layout
+    assert [c.amount for c in first] == [c.amount for c in second] == [Decimal('5000.00')]
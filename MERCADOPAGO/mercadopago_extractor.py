@@ -5,13 +5,25 @@ from __future__ import annotations
 import argparse
 import csv
 import json
-import re
+import os
+import sys
 from dataclasses import dataclass, asdict
-from typing import List, Optional
+from typing import Collection, List, Optional, Tuple
 from decimal import Decimal, ROUND_DOWN, InvalidOperation
 
 import pdfplumber
 
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.checkpoint import PageCheckpoint, open_checkpoint
+from COMMON.dates import DateCutoff, DateWindow, parse_date
+from COMMON.prefilter import RawPdf, date_pages, parse_page_range
+from COMMON.regions import REGION_TEMPLATES, extract_transaction_text
+from COMMON.spans import open_pdf, span
+from COMMON.tokenizer import LineTokenizer, LineTokens
+
 
 @dataclass
 class MercadoPagoTransaction:
@@ -27,9 +39,8 @@ class MercadoPagoTransaction:
 class MercadoPagoExtractor:
     """Extrator especializado para extratos do Mercado Pago."""
     
-    # Padrões de regex
-    DATE_PATTERN = re.compile(r'(\d{2}-\d{2}-\d{4})')
-    AMOUNT_PATTERN = re.compile(r'R\$\s*([-]?\d{1,3}(?:\.\d{3})*,\d{2})')
+    # Tokenizador compartilhado; números longos (IDs de operação) saem da descrição
+    TOKENIZER = LineTokenizer(noise=r'\d{10,}')
     
     # Palavras-chave para identificar créditos
     CREDIT_KEYWORDS = ['PIX RECEBIDA', 'PIX RECEBIDO', 'RECEBIDA', 'RECEBIDO', 'TRANSFERÊNCIA RECEBIDA', 'TRANSFERENCIA RECEBIDA', 'DINHEIRO RECEBIDO']
@@ -37,17 +48,15 @@ class MercadoPagoExtractor:
     # Palavras-chave para excluir (débitos e rendimentos)
     DEBIT_KEYWORDS = ['PIX ENVIADA', 'ENVIADO', 'ENVIADA', 'PAGAMENTO', 'COMPRA', 'SAQUE', 'TARIFA', 'TAXA', 'RENDIMENTOS', 'RENDIMENTO']
     
-    # Palavras de resumo/totais para excluir
+    # Área de lançamentos (abaixo do quadro de resumo, acima do rodapé)
+    REGION = REGION_TEMPLATES['mercadopago']
+    
+    # Palavras de resumo/totais para excluir (páginas sem âncora de recorte)
     SUMMARY_KEYWORDS = ['ENTRADAS:', 'SAIDAS:', 'SALDO INICIAL', 'SALDO FINAL', 'TOTAL']
 
-    @staticmethod
-    def parse_amount(amount_str: str) -> Decimal:
-        """Converte string de valor para Decimal."""
-        # Remove R$ e espaços
-        clean = amount_str.replace('R$', '').strip()
-        # Remove separador de milhares e troca vírgula por ponto
-        clean = clean.replace('.', '').replace(',', '.')
-        return Decimal(clean)
+    # Linhas depois de "Transferência Pix recebida"/"Dinheiro recebido" em que
+    # se procura a linha com data e valor
+    VALUE_LOOKAHEAD = 1
 
     @staticmethod
     def is_credit_line(line: str) -> bool:
@@ -68,85 +77,133 @@ class MercadoPagoExtractor:
         
         return False
 
-    def extract_credits(self, pdf_path: str) -> List[MercadoPagoTransaction]:
-        """Extrai todas as entradas de crédito do PDF."""
+    def extract_credits(self, pdf_path: str, pages: Optional[Collection[int]] = None,
+                        checkpoint: Optional[PageCheckpoint] = None,
+                        dates: Optional[DateWindow] = None,
+                        raw: Optional[RawPdf] = None) -> List[MercadoPagoTransaction]:
+        """
+        Extrai todas as entradas de crédito do PDF (ou só das páginas em `pages`, a partir de 1).
+
+        Com `checkpoint` (`COMMON.checkpoint`), as páginas já concluídas são
+        restauradas e cada página nova é registrada ao terminar. Com `dates`,
+        só os créditos do período, pulando antes do pdfplumber as páginas
+        com datas todas fora dele. `raw` é o PDF já aberto no PyPDF2 pelo
+        chamador (`COMMON.prefilter.RawPdf`), reaproveitado para ler as datas.
+        """
+        pages = date_pages(pdf_path, dates, pages, raw)
+        cutoff = DateCutoff(dates) if dates is not None else None
         credits = []
+        done = ()
+        if checkpoint is not None:
+            done = checkpoint.done
         
-        with pdfplumber.open(pdf_path) as pdf:
+        with open_pdf(pdf_path) as pdf:
             for page_num, page in enumerate(pdf.pages, 1):
-                text = page.extract_text()
-                if not text:
+                if pages is not None and page_num not in pages:
                     continue
-                
-                lines = text.splitlines()
-                i = 0
-                while i < len(lines):
-                    line = lines[i].strip()
-                    if not line:
-                        i += 1
-                        continue
-                    
-                    line_upper = line.upper()
-                    
-                    # Pula linhas de resumo/totais
-                    if any(kw in line_upper for kw in self.SUMMARY_KEYWORDS):
-                        i += 1
-                        continue
-                    
-                    # Pula rendimentos
-                    if 'RENDIMENTO' in line_upper:
-                        i += 1
-                        continue
-                    
-                    # Caso especial: "Transferência Pix recebida" ou "Dinheiro recebido"
-                    # aparece em uma linha, e o valor na linha seguinte
-                    if 'TRANSFERÊNCIA PIX RECEBIDA' in line_upper or 'TRANSFERENCIA PIX RECEBIDA' in line_upper or 'DINHEIRO RECEBIDO' in line_upper:
-                        # Pega a próxima linha que deve conter data e valor
-                        if i + 1 < len(lines):
-                            value_line = lines[i + 1].strip()
-                            
-                            # Extrai data
-                            date_match = self.DATE_PATTERN.search(value_line)
-                            if date_match:
-                                date = date_match.group(1)
-                                
-                                # Extrai valor
-                                amount_match = self.AMOUNT_PATTERN.search(value_line)
-                                if amount_match:
-                                    try:
-                                        amount = self.parse_amount(amount_match.group(1))
-                                        
-                                        # Só aceita valores positivos
-                                        if amount > 0:
-                                            # Identifica tipo
-                                            if 'PIX RECEBIDA' in line_upper:
-                                                transaction_type = 'PIX RECEBIDO'
-                                            elif 'DINHEIRO RECEBIDO' in line_upper:
-                                                transaction_type = 'DINHEIRO RECEBIDO'
-                                            else:
-                                                transaction_type = 'TRANSFERÊNCIA RECEBIDA'
-                                            
-                                            # Monta descrição
-                                            description = value_line
-                                            description = self.AMOUNT_PATTERN.sub('', description)
-                                            description = self.DATE_PATTERN.sub('', description)
-                                            description = re.sub(r'\d{10,}', '', description)
-                                            description = re.sub(r'\s+', ' ', description).strip()
-                                            
-                                            credits.append(MercadoPagoTransaction(
-                                                date=date,
-                                                description=description or transaction_type,
-                                                amount=amount,
-                                                transaction_type=transaction_type,
-                                                raw_line=value_line,
-                                                page=page_num
-                                            ))
-                                    except (ValueError, InvalidOperation):
-                                        pass
-                            i += 2  # Pula a linha atual e a próxima
-                            continue
-                    
+                if page_num in done:
+                    page_credits = checkpoint.restore(MercadoPagoTransaction, page_num)
+                else:
+                    with span('text', page=page_num):
+                        text = extract_transaction_text(page, self.REGION)
+                    with span('parse', page=page_num):
+                        page_credits = self._parse_page_text(text, page_num) if text else []
+                    if checkpoint is not None:
+                        checkpoint.page_done(page_num, page_credits)
+                credits.extend(page_credits)
+                if cutoff is not None and cutoff.past_end(parse_date(c.date) for c in page_credits):
+                    break
+        
+        return dates.keep(credits) if dates is not None else credits
+
+    @staticmethod
+    def _is_credit_header(line_upper: str) -> bool:
+        """Linha "Transferência Pix recebida"/"Dinheiro recebido", com o valor numa linha seguinte."""
+        return ('TRANSFERÊNCIA PIX RECEBIDA' in line_upper or 'TRANSFERENCIA PIX RECEBIDA' in line_upper
+                or 'DINHEIRO RECEBIDO' in line_upper)
+
+    def _find_value_line(self, lines: List[str], i: int) -> Optional[Tuple[int, str, LineTokens, str]]:
+        """
+        Primeira linha com data nas `VALUE_LOOKAHEAD` linhas depois do cabeçalho
+        da linha `i`, como (distância, linha, tokens, data); None se não há, ou
+        se antes dela vem o cabeçalho de outro crédito.
+        """
+        for offset in range(1, min(max(1, self.VALUE_LOOKAHEAD), len(lines) - i - 1) + 1):
+            value_line = lines[i + offset].strip()
+            if self._is_credit_header(value_line.upper()):
+                return None
+            tokens = self.TOKENIZER.tokenize(value_line)
+            date = tokens.find_date('-')
+            if date:
+                return offset, value_line, tokens, date
+        return None
+
+    def _parse_page_text(self, text: str, page_num: int) -> List[MercadoPagoTransaction]:
+        """Créditos encontrados no texto de uma página."""
+        credits = []
+        lines = text.splitlines()
+        i = 0
+        while i < len(lines):
+            line = lines[i].strip()
+            if not line:
+                i += 1
+                continue
+
+            line_upper = line.upper()
+
+            # Pula linhas de resumo/totais
+            if any(kw in line_upper for kw in self.SUMMARY_KEYWORDS):
+                i += 1
+                continue
+
+            # Pula rendimentos
+            if 'RENDIMENTO' in line_upper:
+                i += 1
+                continue
+
+            # Caso especial: "Transferência Pix recebida" ou "Dinheiro recebido"
+            # aparece em uma linha, e o valor numa das linhas seguintes
+            if self._is_credit_header(line_upper):
+                found = self._find_value_line(lines, i)
+                if found is None:
                     i += 1
+                    continue
+                offset, value_line, tokens, date = found
+                # Extrai valor
+                amount_token = next((a for a in tokens.amounts if a.has_currency), None)
+                if amount_token:
+                    try:
+                        amount = amount_token.value()
+                        if amount_token.sign == 'after':
+                            amount = -amount
+
+                        # Só aceita valores positivos
+                        if amount > 0:
+                            # Identifica tipo
+                            if 'PIX RECEBIDA' in line_upper:
+                                transaction_type = 'PIX RECEBIDO'
+                            elif 'DINHEIRO RECEBIDO' in line_upper:
+                                transaction_type = 'DINHEIRO RECEBIDO'
+                            else:
+                                transaction_type = 'TRANSFERÊNCIA RECEBIDA'
+
+                            # Monta descrição
+                            description = tokens.description()
+
+                            credits.append(MercadoPagoTransaction(
+                                date=date,
+                                description=description or transaction_type,
+                                amount=amount,
+                                transaction_type=transaction_type,
+                                raw_line=value_line,
+                                page=page_num
+                            ))
+                    except (ValueError, InvalidOperation):
+                        pass
+                i += 1 + offset  # Pula a linha atual e a do valor
+                continue
+
+            i += 1
         
         return credits
 
@@ -156,14 +213,28 @@ def main():
     parser.add_argument('pdf', help='Caminho para o arquivo PDF')
     parser.add_argument('--out', '-o', help='Arquivo de saída (csv ou json)')
     parser.add_argument('--format', '-f', choices=['csv', 'json'], default='csv')
+    parser.add_argument('--checkpoint-dir', help='Grava o progresso por página nesta pasta; rodar de novo após uma interrupção retoma da última página concluída')
+    parser.add_argument('--from', dest='date_from', help='Só lançamentos a partir desta data (dd/mm/aaaa ou aaaa-mm-dd)')
+    parser.add_argument('--to', dest='date_to', help='Só lançamentos até esta data (dd/mm/aaaa ou aaaa-mm-dd)')
+    parser.add_argument('--pages', help='Só estas páginas, a partir de 1 (ex.: 1-3,7)')
+    parser.add_argument('--no-early-stop', action='store_true',
+                        help='Lê até a última página mesmo depois do fim do período (PDF com extratos fora de ordem)')
     args = parser.parse_args()
+    try:
+        dates = DateWindow.parse(args.date_from, args.date_to, stop_early=not args.no_early_stop)
+        pages = parse_page_range(args.pages)
+    except ValueError as e:
+        parser.error(str(e))
     
     extractor = MercadoPagoExtractor()
+    checkpoint = open_checkpoint(args.checkpoint_dir, 'mercadopago', args.pdf)
     try:
-        credits = extractor.extract_credits(args.pdf)
+        credits = extractor.extract_credits(args.pdf, pages=pages, checkpoint=checkpoint, dates=dates)
     except Exception as e:
         print(f'Erro: {e}')
         return
+    if checkpoint is not None:
+        checkpoint.discard()
     
     if not credits:
         print('Nenhum crédito encontrado.')
@@ -0,0 +1,32 @@
+"""
+Testes do extrator Mercado Pago sem PDF: linha de valor depois do cabeçalho do crédito.
+"""
+from decimal import Decimal
+
+from mercadopago_extractor import MercadoPagoExtractor
+
+TEXT = '\n'.join([
+    'Transferência Pix recebida',
+    'FULANO sem data',
+    'Transferência Pix recebida',
+    '05-01-2025 JOAO R$ 10,00',
+])
+
+
+def _amounts(extractor):
+    return [(c.date, c.amount) for c in extractor._parse_page_text(TEXT, 1)]
+
+
+def test_lookahead_stops_at_the_next_credit_header():
+    wider = MercadoPagoExtractor()
+    wider.VALUE_LOOKAHEAD = 2
+    expected = [('05-01-2025', Decimal('10.00'))]
+    assert _amounts(MercadoPagoExtractor()) == expected
+    assert _amounts(wider) == expected
+
+
+def test_value_found_further_down_skips_only_to_it():
+    extractor = MercadoPagoExtractor()
+    extractor.VALUE_LOOKAHEAD = 2
+    text = 'Dinheiro recebido\nBELTRANO\n06-01-2025 R$ 5,00\nTransferência Pix recebida\n07-01-2025 R$ 7,00'
+    assert [c.amount for c in extractor._parse_page_text(text, 1)] == [Decimal('5.00'), Decimal('7.00')]
@@ -3,13 +3,26 @@ Extrator de créditos do extrato Nubank em PDF.
 """
 from __future__ import annotations
 
-import re
+import argparse
+import os
+import sys
 from dataclasses import dataclass
 from decimal import Decimal, ROUND_DOWN
-from typing import List
+from typing import Collection, List, Optional
 
 import pdfplumber
 
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.checkpoint import PageCheckpoint, open_checkpoint
+from COMMON.dates import DateCutoff, DateWindow, parse_date
+from COMMON.prefilter import RawPdf, date_pages, parse_page_range
+from COMMON.regions import REGION_TEMPLATES, extract_transaction_text
+from COMMON.spans import open_pdf, span
+from COMMON.tokenizer import DEFAULT_TOKENIZER
+
 
 @dataclass
 class NubankTransaction:
@@ -23,30 +36,59 @@ class NubankTransaction:
 class NubankExtractor:
     """Extrai transações de crédito de extratos Nubank em PDF."""
 
-    def __init__(self):
-        self.transactions: List[NubankTransaction] = []
+    # Área de movimentações (sem o resumo do período e o rodapé de atendimento)
+    REGION = REGION_TEMPLATES['nubank']
 
-    def extract_credits(self, pdf_path: str) -> List[NubankTransaction]:
+    def extract_credits(self, pdf_path: str, pages: Optional[Collection[int]] = None,
+                        checkpoint: Optional[PageCheckpoint] = None,
+                        dates: Optional[DateWindow] = None,
+                        raw: Optional[RawPdf] = None) -> List[NubankTransaction]:
         """
         Extrai todas as transações de crédito do PDF do Nubank.
         
         Args:
             pdf_path: Caminho para o arquivo PDF do extrato.
+            pages: Números das páginas (a partir de 1) a processar; None lê todas.
+            checkpoint: Progresso por página (`COMMON.checkpoint`). A seção e a
+                data corrente recomeçam a cada página, então só os créditos
+                das páginas concluídas precisam ser restaurados.
+            dates: Só os créditos deste período; páginas com datas todas fora
+                dele são puladas antes do pdfplumber.
+            raw: O PDF já aberto no PyPDF2 pelo chamador (`COMMON.prefilter.RawPdf`),
+                reaproveitado para ler as datas.
             
         Returns:
             Lista de NubankTransaction com os créditos encontrados.
         """
-        self.transactions = []
+        # Estado da chamada fica em variáveis locais: uma instância pode ser
+        # compartilhada entre threads
+        pages = date_pages(pdf_path, dates, pages, raw)
+        cutoff = DateCutoff(dates) if dates is not None else None
+        transactions: List[NubankTransaction] = []
+        done = ()
+        if checkpoint is not None:
+            done = checkpoint.done
         
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    self._parse_page_text(text)
+        with open_pdf(pdf_path) as pdf:
+            for page_num, page in enumerate(pdf.pages, 1):
+                if pages is not None and page_num not in pages:
+                    continue
+                if page_num in done:
+                    page_transactions = checkpoint.restore(NubankTransaction, page_num)
+                else:
+                    with span('text', page=page_num):
+                        text = extract_transaction_text(page, self.REGION)
+                    with span('parse', page=page_num):
+                        page_transactions = self._parse_page_text(text) if text else []
+                    if checkpoint is not None:
+                        checkpoint.page_done(page_num, page_transactions)
+                transactions.extend(page_transactions)
+                if cutoff is not None and cutoff.past_end(parse_date(t.date) for t in page_transactions):
+                    break
         
-        return self.transactions
+        return dates.keep(transactions) if dates is not None else transactions
 
-    def _parse_page_text(self, text: str) -> None:
+    def _parse_page_text(self, text: str) -> List[NubankTransaction]:
         """
         Processa o texto de uma página buscando transações de crédito.
         
@@ -59,7 +101,11 @@ class NubankExtractor:
         
         Args:
             text: Texto extraído da página.
+            
+        Returns:
+            Créditos encontrados na página.
         """
+        transactions: List[NubankTransaction] = []
         lines = text.split('\n')
         in_credits_section = False
         current_date = None
@@ -69,14 +115,17 @@ class NubankExtractor:
             if not line:
                 continue
             
+            tokens = DEFAULT_TOKENIZER.tokenize(line)
+            
             # Detecta início da seção de créditos
             # Formato: "DD MMM YYYY Total de entradas + valor"
             if 'Total de entradas' in line:
                 in_credits_section = True
-                # Extrai a data da mesma linha
-                date_match = re.match(r'^(\d{1,2}\s+(?:JAN|FEV|MAR|ABR|MAI|JUN|JUL|AGO|SET|OUT|NOV|DEZ)\s+\d{4})', line, re.IGNORECASE)
-                if date_match:
-                    current_date = date_match.group(1).strip()
+                # Extrai a data do início da mesma linha
+                if tokens.dates:
+                    date_text, date_start, _ = tokens.dates[0]
+                    if date_start == 0 and '/' not in date_text and '-' not in date_text:
+                        current_date = date_text
                 continue
             
             # Detecta fim da seção de créditos
@@ -88,14 +137,13 @@ class NubankExtractor:
             # Se estamos na seção de créditos, processa as transações
             if in_credits_section and current_date:
                 # Busca por valores no final da linha (formato: 1.234,56 ou 123,45)
-                value_pattern = r'\s+([\d.]+,\d{2})\s*$'
-                value_match = re.search(value_pattern, line)
+                value = tokens.amounts[-1] if tokens.amounts else None
                 
-                if value_match:
-                    value_str = value_match.group(1)
+                if value and value.end == len(line) and value.start > 0 and line[value.start - 1].isspace():
+                    value_str = value.text
                     
                     # Extrai a descrição (tudo antes do valor)
-                    description = line[:value_match.start()].strip()
+                    description = line[:value.start].strip()
                     
                     # Ignora linhas que não são transações válidas
                     if not description:
@@ -125,36 +173,56 @@ class NubankExtractor:
                                 description=description,
                                 amount=amount.quantize(Decimal('.01'), rounding=ROUND_DOWN)
                             )
-                            self.transactions.append(transaction)
+                            transactions.append(transaction)
                     
                     except (ValueError, ArithmeticError):
                         # Valor inválido, ignora
                         continue
 
+        return transactions
+
 
-def extract_nubank_credits(pdf_path: str) -> List[NubankTransaction]:
+def extract_nubank_credits(pdf_path: str, checkpoint_dir: Optional[str] = None,
+                           pages: Optional[Collection[int]] = None,
+                           dates: Optional[DateWindow] = None) -> List[NubankTransaction]:
     """
     Função auxiliar para extrair créditos do Nubank.
     
     Args:
         pdf_path: Caminho para o arquivo PDF do extrato.
+        checkpoint_dir: Pasta para o progresso por página; uma execução
+            interrompida retoma da última página concluída.
+        pages: Números das páginas (a partir de 1) a processar; None lê todas.
+        dates: Só os créditos deste período.
         
     Returns:
         Lista de NubankTransaction com os créditos.
     """
     extractor = NubankExtractor()
-    return extractor.extract_credits(pdf_path)
+    checkpoint = open_checkpoint(checkpoint_dir, 'nubank', pdf_path)
+    credits = extractor.extract_credits(pdf_path, pages=pages, checkpoint=checkpoint, dates=dates)
+    if checkpoint is not None:
+        checkpoint.discard()
+    return credits
 
 
-if __name__ == '__main__':
-    import sys
-    
-    if len(sys.argv) < 2:
-        print("Uso: python nubank_extractor.py <caminho_do_pdf>")
-        sys.exit(1)
+def main():
+    parser = argparse.ArgumentParser(description='Extrai créditos de extrato do Nubank')
+    parser.add_argument('pdf', help='Caminho para o arquivo PDF')
+    parser.add_argument('checkpoint_dir', nargs='?', help='Pasta de checkpoint (retoma da última página concluída)')
+    parser.add_argument('--from', dest='date_from', help='Só lançamentos a partir desta data (dd/mm/aaaa ou aaaa-mm-dd)')
+    parser.add_argument('--to', dest='date_to', help='Só lançamentos até esta data (dd/mm/aaaa ou aaaa-mm-dd)')
+    parser.add_argument('--pages', help='Só estas páginas, a partir de 1 (ex.: 1-3,7)')
+    parser.add_argument('--no-early-stop', action='store_true',
+                        help='Lê até a última página mesmo depois do fim do período (PDF com extratos fora de ordem)')
+    args = parser.parse_args()
+    try:
+        dates = DateWindow.parse(args.date_from, args.date_to, stop_early=not args.no_early_stop)
+        pages = parse_page_range(args.pages)
+    except ValueError as e:
+        parser.error(str(e))
     
-    pdf_file = sys.argv[1]
-    credits = extract_nubank_credits(pdf_file)
+    credits = extract_nubank_credits(args.pdf, args.checkpoint_dir, pages=pages, dates=dates)
     
     print(f"\n{'='*80}")
     print(f"EXTRATO NUBANK - CRÉDITOS")
@@ -171,3 +239,7 @@ if __name__ == '__main__':
         print(f"\n{'-'*80}")
         print(f"{'TOTAL':54} | R$ {str(total.quantize(Decimal('.01'))).replace('.', ','):>12}")
         print(f"{'='*80}\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -22,17 +22,17 @@ def test_parse():
     01 MAR    Rendimento da conta                    R$ 12,34
     """
     
-    extractor._parse_page_text(sample_text)
+    transactions = extractor._parse_page_text(sample_text)
     
     print(f"\n{'='*70}")
     print("TESTE DO EXTRATOR NUBANK")
     print(f"{'='*70}\n")
     
-    if extractor.transactions:
-        print(f"✅ Encontradas {len(extractor.transactions)} transações de crédito:\n")
+    if transactions:
+        print(f"✅ Encontradas {len(transactions)} transações de crédito:\n")
         
         total = Decimal('0')
-        for t in extractor.transactions:
+        for t in transactions:
             print(f"  {t.date:10} | {t.description:35} | R$ {str(t.amount).replace('.', ','):>10}")
             total += t.amount
         
@@ -5,11 +5,23 @@ from __future__ import annotations
 import argparse
 import csv
 import json
-import re
+import os
+import sys
 from dataclasses import dataclass, asdict
-from typing import List
+from typing import Collection, List, Optional
 from decimal import Decimal, InvalidOperation
 
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.checkpoint import PageCheckpoint, open_checkpoint
+from COMMON.dates import DateCutoff, DateWindow, parse_date
+from COMMON.prefilter import RawPdf, date_pages, parse_page_range
+from COMMON.regions import REGION_TEMPLATES, extract_transaction_text
+from COMMON.spans import note_file, open_pdf, span
+from COMMON.tokenizer import DEFAULT_TOKENIZER
+
 try:
     import pdfplumber
     HAS_PDFPLUMBER = True
@@ -17,7 +29,7 @@ except ImportError:
     HAS_PDFPLUMBER = False
 
 try:
-    from PyPDF2 import PdfReader
+    import PyPDF2
     HAS_PYPDF2 = True
 except ImportError:
     HAS_PYPDF2 = False
@@ -37,48 +49,97 @@ class PicPayTransaction:
 class PicPayExtractor:
     """Extrator especializado para extratos do PicPay."""
     
-    # Padrões de regex
-    DATE_PATTERN = re.compile(r'(\d{2}/\d{2}/\d{4})')
-    # Captura valores SEM sinal de menos no início
-    AMOUNT_PATTERN = re.compile(r'(?<![-\−])\s*R\$\s*(\d{1,3}(?:\.\d{3})*,\d{2})')
+    # Área de lançamentos no caminho pdfplumber (sem o rodapé)
+    REGION = REGION_TEMPLATES['picpay']
+    # Lê primeiro com o PyPDF2 e só cai no pdfplumber se ele não achar nada
+    PYPDF2_FIRST = True
     
-    @staticmethod
-    def parse_amount(amount_str: str) -> Decimal:
-        """Converte string de valor para Decimal."""
-        clean = amount_str.replace('.', '').replace(',', '.')
-        return Decimal(clean)
+    def extract_credits(self, pdf_path: str, pages: Optional[Collection[int]] = None,
+                        checkpoint: Optional[PageCheckpoint] = None,
+                        dates: Optional[DateWindow] = None,
+                        raw: Optional[RawPdf] = None) -> List[PicPayTransaction]:
+        """
+        Extrai todas as entradas de crédito do PDF (ou só das páginas em `pages`, a partir de 1).
+
+        Com `checkpoint` (`COMMON.checkpoint`), as páginas já concluídas são
+        restauradas; o estado guarda qual leitor (PyPDF2 ou pdfplumber) as leu.
+        Com `dates`, só os créditos do período, pulando as páginas com datas
+        todas fora dele. `raw` é o PDF já aberto no PyPDF2 pelo chamador
+        (`COMMON.prefilter.RawPdf`): datas e leitura pelo PyPDF2 reaproveitam
+        o texto cru já lido pelo pré-filtro.
+        """
+        pages = date_pages(pdf_path, dates, pages, raw)
+        credits = self._extract(pdf_path, pages, checkpoint, dates, raw)
+        return dates.keep(credits) if dates is not None else credits
 
-    def extract_credits(self, pdf_path: str) -> List[PicPayTransaction]:
-        """Extrai todas as entradas de crédito do PDF."""
+    def _extract(self, pdf_path: str, pages: Optional[Collection[int]], checkpoint: Optional[PageCheckpoint],
+                 dates: Optional[DateWindow], raw: Optional[RawPdf] = None) -> List[PicPayTransaction]:
         credits = []
+        done = ()
+        engine = None
+        if checkpoint is not None:
+            done = checkpoint.done
+            engine = checkpoint.state.get('engine')
         
         # Tenta PyPDF2 primeiro (mais robusto para PDFs problemáticos)
-        if HAS_PYPDF2:
+        if HAS_PYPDF2 and self.PYPDF2_FIRST and engine != 'pdfplumber':
             try:
-                reader = PdfReader(pdf_path)
-                for page_num, page in enumerate(reader.pages, 1):
-                    try:
-                        text = page.extract_text()
-                        if text:
-                            credits.extend(self._process_text(text, page_num))
-                    except Exception:
+                with span('open', engine='pypdf2'):
+                    if raw is None:
+                        raw = RawPdf(pdf_path)
+                    note_file(pages=raw.count)
+                cutoff = DateCutoff(dates) if dates is not None else None
+                for page_num in range(1, raw.count + 1):
+                    if pages is not None and page_num not in pages:
                         continue
+                    if page_num in done:
+                        page_credits = checkpoint.restore(PicPayTransaction, page_num)
+                    else:
+                        try:
+                            with span('text', page=page_num, engine='pypdf2'):
+                                text = raw.text(page_num)
+                            with span('parse', page=page_num):
+                                page_credits = self._process_text(text, page_num) if text else []
+                        except Exception:
+                            continue
+                        if checkpoint is not None:
+                            checkpoint.page_done(page_num, page_credits, {'engine': 'pypdf2'})
+                    credits.extend(page_credits)
+                    if cutoff is not None and cutoff.past_end(parse_date(c.date) for c in page_credits):
+                        break
                 if credits:
                     return credits
             except Exception:
                 pass
+            # Nada lido pelo PyPDF2: o pdfplumber recomeça do zero
+            credits = []
+            done = ()
+            if checkpoint is not None:
+                checkpoint.reset({'engine': 'pdfplumber'})
         
         # Fallback para pdfplumber
         if HAS_PDFPLUMBER:
             try:
-                with pdfplumber.open(pdf_path) as pdf:
+                with open_pdf(pdf_path) as pdf:
+                    cutoff = DateCutoff(dates) if dates is not None else None
                     for page_num, page in enumerate(pdf.pages, 1):
-                        try:
-                            text = page.extract_text(x_tolerance=3, y_tolerance=3)
-                            if text:
-                                credits.extend(self._process_text(text, page_num))
-                        except Exception:
+                        if pages is not None and page_num not in pages:
                             continue
+                        if page_num in done:
+                            page_credits = checkpoint.restore(PicPayTransaction, page_num)
+                        else:
+                            try:
+                                with span('text', page=page_num):
+                                    text = extract_transaction_text(page, self.REGION, x_tolerance=3, y_tolerance=3)
+                                with span('parse', page=page_num):
+                                    page_credits = self._process_text(text, page_num) if text else []
+                            except Exception:
+                                continue
+                            if checkpoint is not None:
+                                checkpoint.page_done(page_num, page_credits, {'engine': 'pdfplumber'})
+                        credits.extend(page_credits)
+                        if cutoff is not None and cutoff.past_end(parse_date(c.date) for c in page_credits):
+                            break
             except Exception:
                 pass
         
@@ -104,21 +165,22 @@ class PicPayExtractor:
             if 'ENVIADO' in line_upper:
                 continue
             
+            tokens = DEFAULT_TOKENIZER.tokenize(line)
+            
             # Verifica se tem sinal de menos ANTES do R$ (débito)
-            if re.search(r'[-\−]\s*R\$', line):
+            if any(a.negative and a.has_currency for a in tokens.amounts):
                 continue
             
             # Extrai data
-            date_match = self.DATE_PATTERN.search(line)
-            date = date_match.group(1) if date_match else '-'
+            date = tokens.find_date('/') or '-'
             
             # Extrai valor (sem sinal de menos)
-            amount_match = self.AMOUNT_PATTERN.search(line)
-            if not amount_match:
+            amount_token = next((a for a in tokens.amounts if a.has_currency), None)
+            if amount_token is None:
                 continue
             
             try:
-                amount = self.parse_amount(amount_match.group(1))
+                amount = amount_token.value()
             except (ValueError, InvalidOperation):
                 continue
             
@@ -145,14 +207,28 @@ def main():
     parser.add_argument('pdf', help='Caminho para o arquivo PDF')
     parser.add_argument('--out', '-o', help='Arquivo de saída (csv ou json)')
     parser.add_argument('--format', '-f', choices=['csv', 'json'], default='csv')
+    parser.add_argument('--checkpoint-dir', help='Grava o progresso por página nesta pasta; rodar de novo após uma interrupção retoma da última página concluída')
+    parser.add_argument('--from', dest='date_from', help='Só lançamentos a partir desta data (dd/mm/aaaa ou aaaa-mm-dd)')
+    parser.add_argument('--to', dest='date_to', help='Só lançamentos até esta data (dd/mm/aaaa ou aaaa-mm-dd)')
+    parser.add_argument('--pages', help='Só estas páginas, a partir de 1 (ex.: 1-3,7)')
+    parser.add_argument('--no-early-stop', action='store_true',
+                        help='Lê até a última página mesmo depois do fim do período (PDF com extratos fora de ordem)')
     args = parser.parse_args()
+    try:
+        dates = DateWindow.parse(args.date_from, args.date_to, stop_early=not args.no_early_stop)
+        pages = parse_page_range(args.pages)
+    except ValueError as e:
+        parser.error(str(e))
     
     extractor = PicPayExtractor()
+    checkpoint = open_checkpoint(args.checkpoint_dir, 'picpay', args.pdf)
     try:
-        credits = extractor.extract_credits(args.pdf)
+        credits = extractor.extract_credits(args.pdf, pages=pages, checkpoint=checkpoint, dates=dates)
     except Exception as e:
         print(f'Erro: {e}')
         return
+    if checkpoint is not None:
+        checkpoint.discard()
     
     if not credits:
         print('Nenhum crédito encontrado.')
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark do OCR de extratos Santander escaneados: tempo por página e acerto.
+
+Gera páginas "escaneadas" (imagens sem camada de texto, com logotipo no topo e
+letras miúdas no rodapé), passa o PDF pelo extrator com cada configuração de
+OCR e compara os créditos reconhecidos com os créditos gerados.
+
+Requer pdf2image + poppler, pytesseract + tesseract (com o idioma "por") e Pillow.
+
+Uso:
+    python SANTANDER/bench_ocr.py [--pages 5] [--dpi 150]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from typing import Set, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BASE_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from SANTANDER.income_extractor import OCR_MODES, _OCR_AVAILABLE, extract_incomes_from_pdf
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None  # type: ignore
+
+# A4 a 200 DPI
+PAGE_SIZE = (1654, 2339)
+NAMES = ['JOAO SILVA', 'MARIA SOUZA', 'EMPRESA XYZ LTDA', 'JOSE PEREIRA', 'ANA LIMA']
+
+
+def _font(size: int):
+    for name in ('DejaVuSans.ttf', 'Arial.ttf', 'LiberationSans-Regular.ttf'):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def _brl(cents: int) -> str:
+    return f'{cents / 100:,.2f}'.replace(',', '@').replace('.', ',').replace('@', '.')
+
+
+def make_scanned_pdf(path: str, pages: int, seed: int = 7) -> Set[Tuple[str, str]]:
+    """Gera o PDF escaneado e devolve os créditos esperados (data, valor "1.234,56")."""
+    random.seed(seed)
+    body = _font(26)
+    small = _font(14)
+    expected: Set[Tuple[str, str]] = set()
+    images = []
+    balance = 500000
+    for p in range(pages):
+        img = Image.new('L', PAGE_SIZE, 255)
+        draw = ImageDraw.Draw(img)
+        # cabeçalho: logotipo e dados da conta
+        draw.rectangle((80, 60, 420, 200), fill=40)
+        draw.text((460, 90), 'Santander - Extrato de conta corrente', font=_font(40), fill=0)
+        draw.text((460, 150), f'Agência 1234 Conta 01.012345-6   Página {p + 1}', font=body, fill=60)
+
+        y = 320
+        for i in range(40):
+            day = f'{(i % 28) + 1:02d}/{(p % 12) + 1:02d}/25'
+            cents = random.randint(1000, 500000)
+            if i % 3 == 0:
+                balance += cents
+                line = f'{day} PIX RECEBIDO {random.choice(NAMES)} {random.randint(100000, 999999)} {_brl(cents)} {_brl(balance)}'
+                expected.add((day, _brl(cents)))
+            else:
+                balance -= cents
+                line = f'{day} PAGAMENTO BOLETO {random.randint(100000, 999999)} {_brl(cents)} {_brl(balance)}'
+            draw.text((80, y), line, font=body, fill=0)
+            y += 46
+
+        # rodapé: letras miúdas
+        for i in range(12):
+            draw.text((80, 2170 + i * 13), 'Central de atendimento 4004 3535 - SAC 0800 762 7777 - Ouvidoria 0800 726 0322 '
+                      '- texto legal sobre tarifas, limites e condições gerais ' * 2, font=small, fill=90)
+        images.append(img)
+
+    images[0].save(path, save_all=True, append_images=images[1:], resolution=200)
+    return expected
+
+
+def _recognized(entries) -> Set[Tuple[str, str]]:
+    return {(e.date, _brl(round(e.amount * 100))) for e in entries if e.date}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo por página e acerto do OCR (full x table)')
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--dpi', type=int, help='DPI do modo table (padrão: o de TABLE_OCR)')
+    args = parser.parse_args()
+
+    if Image is None or not _OCR_AVAILABLE:
+        print('Requer Pillow, pdf2image (poppler) e pytesseract (tesseract com idioma "por").')
+        sys.exit(1)
+
+    modes = dict(OCR_MODES)
+    if args.dpi:
+        modes['table'] = replace(modes['table'], dpi=args.dpi)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, 'escaneado.pdf')
+        expected = make_scanned_pdf(pdf_path, args.pages)
+
+        print(f'{args.pages} páginas, {len(expected)} créditos esperados\n')
+        print(f'{"Modo":<8} {"DPI":>5} {"s/página":>10} {"acertos":>9} {"recall":>8} {"falsos":>7}')
+        print('-' * 52)
+        for name, settings in modes.items():
+            start = time.perf_counter()
+            entries = extract_incomes_from_pdf(pdf_path, ocr=True, ocr_settings=settings)
+            per_page = (time.perf_counter() - start) / args.pages
+            found = _recognized(entries)
+            hits = len(found & expected)
+            print(f'{name:<8} {settings.dpi:>5} {per_page:>10.2f} {hits:>9} {hits / len(expected):>8.1%} '
+                  f'{len(found - expected):>7}')
+
+
+if __name__ == '__main__':
+    main()
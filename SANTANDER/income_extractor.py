@@ -9,27 +9,41 @@ from __future__ import annotations
 import argparse
 import csv
 import json
-import re
-from dataclasses import dataclass, asdict
-from typing import List, Optional
+import os
+import sys
+from dataclasses import dataclass, asdict, replace
+from typing import BinaryIO, Collection, List, Optional, Tuple
 
 import pdfplumber
 from typing import Union
 
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from COMMON.checkpoint import PageCheckpoint, open_checkpoint
+from COMMON.dates import DateCutoff, DateWindow, parse_date
+from COMMON.prefilter import RawPdf, date_pages, parse_page_range
+from COMMON.regions import REGION_TEMPLATES, extract_transaction_text
+from COMMON.spans import open_pdf, span
+from COMMON.tokenizer import LineTokenizer
+
 try:
-    from pdf2image import convert_from_path
+    from pdf2image import convert_from_bytes, convert_from_path
     from PIL import Image
     import pytesseract
     _OCR_AVAILABLE = True
 except Exception:
-    convert_from_path = None  # type: ignore
+    convert_from_bytes = convert_from_path = None  # type: ignore
     Image = None  # type: ignore
     pytesseract = None  # type: ignore
     _OCR_AVAILABLE = False
 
 
-AMOUNT_RE = re.compile(r"(\d{1,3}(?:\.\d{3})*,\d{2})")
-DATE_RE = re.compile(r"\b(\d{2}/\d{2}/(?:\d{2,4}))\b")
+# Números de documento e o rótulo "Nº DOCUMENTO" não fazem parte da descrição
+TOKENIZER = LineTokenizer(noise=r"\b\d{5,}\b|(?i:N\s*[°º]\s*DOCUMENTO)", noise_start=r"\dNn")
+# Área de movimentação da conta (sem cabeçalho e rodapé)
+REGION = REGION_TEMPLATES['santander']
 
 
 def br_to_float(s: str) -> float:
@@ -73,70 +87,165 @@ class IncomeEntry:
     page: int
 
 
-def _ocr_pdf_to_text(path: str, poppler_path: Optional[str] = None, tesseract_cmd: Optional[str] = None) -> List[str]:
+@dataclass(frozen=True)
+class OcrSettings:
+    """
+    Parâmetros do OCR de páginas escaneadas.
+
+    Attributes:
+        dpi: Resolução da rasterização (pdf2image).
+        grayscale: Rasteriza em tons de cinza (1 canal em vez de 3).
+        roi: Região da tabela de lançamentos em frações da página
+            (esquerda, topo, direita, base); None usa a página inteira.
+        whitelist: Caracteres aceitos pelo tesseract; None aceita todos.
+        psm: Modo de segmentação de página do tesseract; None usa o padrão (3).
+    """
+    dpi: int = 200
+    grayscale: bool = False
+    roi: Optional[Tuple[float, float, float, float]] = None
+    whitelist: Optional[str] = None
+    psm: Optional[int] = None
+
+    def tesseract_config(self) -> str:
+        options = []
+        if self.psm is not None:
+            options.append(f'--psm {self.psm}')
+        if self.whitelist:
+            options.append(f'-c tessedit_char_whitelist={self.whitelist}')
+            # com whitelist o tesseract descarta os espaços entre palavras se não for instruído
+            options.append('-c preserve_interword_spaces=1')
+        return ' '.join(options)
+
+
+# Comportamento original: página inteira, DPI padrão do pdf2image, colorida
+FULL_PAGE_OCR = OcrSettings()
+
+# Modo "tabela": 150 DPI em cinza, só a faixa de lançamentos (sem logotipo no
+# topo e letras miúdas no rodapé), caracteres de datas/valores/descrições e
+# psm 6 (um bloco uniforme de texto, linhas de tabela em ordem).
+TABLE_OCR = OcrSettings(
+    dpi=150,
+    grayscale=True,
+    roi=(0.0, 0.12, 1.0, 0.92),
+    whitelist=('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+               'ÁÀÂÃÉÊÍÓÔÕÚÇáàâãéêíóôõúç0123456789/.,-+()$°º:'),
+    psm=6,
+)
+
+OCR_MODES = {'full': FULL_PAGE_OCR, 'table': TABLE_OCR}
+
+
+def ocr_variant(mode: str, settings: OcrSettings) -> str:
+    """Variante do checkpoint para o OCR: modo e DPI mudam o texto lido."""
+    return f'{mode}-{settings.dpi}dpi'
+
+
+def _ocr_page(path: Union[str, BinaryIO], page_num: int, settings: OcrSettings = FULL_PAGE_OCR,
+              poppler_path: Optional[str] = None, tesseract_cmd: Optional[str] = None) -> str:
+    """Rasteriza uma única página (1 = primeira) e devolve o texto reconhecido."""
     if not _OCR_AVAILABLE:
         raise RuntimeError('OCR dependencies (pdf2image/pytesseract/Pillow) are not installed')
 
     if tesseract_cmd:
         pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
 
-    images = convert_from_path(path, poppler_path=poppler_path) if poppler_path else convert_from_path(path)
-    texts: List[str] = []
-    for img in images:
-        txt = pytesseract.image_to_string(img, lang='por')
-        texts.append(txt)
-    return texts
-
-
-def extract_incomes_from_pdf(path: str, ocr: bool = False, poppler_path: Optional[str] = None, tesseract_cmd: Optional[str] = None) -> List[IncomeEntry]:
+    kwargs = {'dpi': settings.dpi, 'first_page': page_num, 'last_page': page_num, 'grayscale': settings.grayscale}
+    if poppler_path:
+        kwargs['poppler_path'] = poppler_path
+    if isinstance(path, str):
+        images = convert_from_path(path, **kwargs)
+    else:
+        # PDF em memória (membro de um ZIP): o poppler recebe os bytes
+        images = convert_from_bytes(path.getvalue(), **kwargs)
+    if not images:
+        return ''
+    img = images[0]
+
+    if settings.roi is not None:
+        left, top, right, bottom = settings.roi
+        width, height = img.size
+        img = img.crop((int(left * width), int(top * height), int(right * width), int(bottom * height)))
+
+    return pytesseract.image_to_string(img, lang='por', config=settings.tesseract_config())
+
+
+def extract_incomes_from_pdf(path: Union[str, BinaryIO], ocr: bool = False, poppler_path: Optional[str] = None, tesseract_cmd: Optional[str] = None,
+                             pages: Optional[Collection[int]] = None,
+                             ocr_settings: OcrSettings = FULL_PAGE_OCR,
+                             checkpoint: Optional[PageCheckpoint] = None,
+                             dates: Optional[DateWindow] = None,
+                             raw: Optional[RawPdf] = None) -> List[IncomeEntry]:
+    # Com `dates`, páginas com datas todas fora do período são puladas antes do
+    # pdfplumber; as escaneadas (sem texto cru) só param pela ordem cronológica.
+    # `raw` é o PDF já aberto no PyPDF2 pelo chamador (`COMMON.prefilter.RawPdf`)
+    pages = date_pages(path, dates, pages, raw)
+    cutoff = DateCutoff(dates) if dates is not None else None
     incomes: List[IncomeEntry] = []
+    done = ()
+    if checkpoint is not None:
+        # Páginas já concluídas (inclusive as lidas por OCR) não são refeitas
+        done = checkpoint.done
 
-    with pdfplumber.open(path) as pdf:
+    with open_pdf(path) as pdf:
         for i, page in enumerate(pdf.pages, start=1):
-            text = page.extract_text()
-
-            if not text and ocr:
-                try:
-                    ocr_texts = _ocr_pdf_to_text(path, poppler_path=poppler_path, tesseract_cmd=tesseract_cmd)
-                except Exception as exc:
-                    raise RuntimeError(f'OCR failed: {exc}')
-
-                if i - 1 < len(ocr_texts):
-                    text = ocr_texts[i - 1]
-
-            if not text:
+            if pages is not None and i not in pages:
                 continue
+            if i in done:
+                page_incomes = checkpoint.restore(IncomeEntry, i)
+            else:
+                with span('text', page=i):
+                    text = extract_transaction_text(page, REGION)
+
+                if not text and ocr:
+                    # Só a página sem texto é rasterizada (antes o PDF inteiro era
+                    # convertido e lido de novo a cada página escaneada)
+                    try:
+                        with span('ocr', page=i):
+                            text = _ocr_page(path, i, ocr_settings, poppler_path=poppler_path, tesseract_cmd=tesseract_cmd)
+                    except Exception as exc:
+                        raise RuntimeError(f'OCR failed: {exc}')
+
+                with span('parse', page=i):
+                    page_incomes = _parse_page_text(text, i) if text else []
+                if checkpoint is not None:
+                    checkpoint.page_done(i, page_incomes)
+            incomes.extend(page_incomes)
+            if cutoff is not None and cutoff.past_end(parse_date(e.date) for e in page_incomes):
+                break
+
+    return dates.keep(incomes) if dates is not None else incomes
+
+
+def _parse_page_text(text: str, page_num: int) -> List[IncomeEntry]:
+    entries: List[IncomeEntry] = []
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    for ln in lines:
+        # Filtro por palavras-chave primeiro: é mais barato que tokenizar
+        if not is_incoming(ln):
+            continue
+
+        tokens = TOKENIZER.tokenize(ln)
+        amounts = tokens.amounts
+        if not amounts:
+            continue
+
+        # Com valor e saldo na linha, o valor da transação é o penúltimo
+        if len(amounts) >= 2:
+            amt_str = amounts[-2].text
+        else:
+            amt_str = amounts[0].text
+        try:
+            amt = br_to_float(amt_str)
+        except ValueError:
+            continue
 
-            lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-            for ln in lines:
-                amounts = AMOUNT_RE.findall(ln)
-                if not amounts:
-                    continue
-
-                if not is_incoming(ln):
-                    continue
-
-                if len(amounts) >= 2:
-                    amt_str = amounts[-2]
-                else:
-                    amt_str = amounts[0]
-                try:
-                    amt = br_to_float(amt_str)
-                except ValueError:
-                    continue
-
-                date_match = DATE_RE.search(ln)
-                date = date_match.group(1) if date_match else None
+        date = tokens.find_date('/')
 
-                cleaned = ln
-                cleaned = AMOUNT_RE.sub('', cleaned)
-                cleaned = re.sub(r"\b\d{5,}\b", '', cleaned)
-                cleaned = re.sub(r"N\s*[°º]\s*DOCUMENTO", '', cleaned, flags=re.IGNORECASE)
-                cleaned = re.sub(r"\s+", ' ', cleaned).strip(' -–—:;,.')
+        cleaned = tokens.description(keep_dates=True, strip_chars=' -–—:;,.')
 
-                incomes.append(IncomeEntry(date=date, description=cleaned, amount=amt, raw_line=cleaned, page=i))
+        entries.append(IncomeEntry(date=date, description=cleaned, amount=amt, raw_line=cleaned, page=page_num))
 
-    return incomes
+    return entries
 
 
 def save_csv(entries: List[IncomeEntry], outpath: str) -> None:
@@ -158,17 +267,39 @@ def main():
     parser.add_argument('--out', '-o', help='Arquivo de saída (csv ou json). Se omitido, imprime no stdout')
     parser.add_argument('--format', '-f', choices=['csv', 'json'], default='csv')
     parser.add_argument('--ocr', action='store_true', help='Ativa fallback por OCR quando o PDF for escaneado (requer tesseract+poppler)')
+    parser.add_argument('--ocr-mode', choices=sorted(OCR_MODES), default='full',
+                        help='full: página inteira (padrão); table: só a tabela de lançamentos, em cinza, com menos DPI e whitelist')
+    parser.add_argument('--ocr-dpi', type=int, help='DPI da rasterização para OCR (padrão: 200 em full, 150 em table)')
     parser.add_argument('--poppler-path', help='Caminho para binários do poppler (somente Windows). Ex: C:/poppler/bin')
     parser.add_argument('--tesseract-cmd', help='Caminho para executável do tesseract (ex: C:/Program Files/Tesseract-OCR/tesseract.exe)')
     parser.add_argument('--amounts-only', action='store_true', help='Imprime/salva somente os valores (um por linha) para copiar/colar no Excel')
     parser.add_argument('--decimal-comma', '--br', action='store_true', dest='decimal_comma', help='Usa vírgula como separador decimal (ex: 768,00)')
+    parser.add_argument('--checkpoint-dir', help='Grava o progresso por página nesta pasta; rodar de novo após uma interrupção retoma da última página concluída')
+    parser.add_argument('--from', dest='date_from', help='Só lançamentos a partir desta data (dd/mm/aaaa ou aaaa-mm-dd)')
+    parser.add_argument('--to', dest='date_to', help='Só lançamentos até esta data (dd/mm/aaaa ou aaaa-mm-dd)')
+    parser.add_argument('--pages', help='Só estas páginas, a partir de 1 (ex.: 1-3,7)')
+    parser.add_argument('--no-early-stop', action='store_true',
+                        help='Lê até a última página mesmo depois do fim do período (PDF com extratos fora de ordem)')
     args = parser.parse_args()
+    try:
+        dates = DateWindow.parse(args.date_from, args.date_to, stop_early=not args.no_early_stop)
+        pages = parse_page_range(args.pages)
+    except ValueError as e:
+        parser.error(str(e))
+
+    ocr_settings = OCR_MODES[args.ocr_mode]
+    if args.ocr_dpi:
+        ocr_settings = replace(ocr_settings, dpi=args.ocr_dpi)
 
+    checkpoint = open_checkpoint(args.checkpoint_dir, 'santander', args.pdf, variant=ocr_variant(args.ocr_mode, ocr_settings) if args.ocr else '')
     try:
-        entries = extract_incomes_from_pdf(args.pdf, ocr=args.ocr, poppler_path=args.poppler_path, tesseract_cmd=args.tesseract_cmd)
+        entries = extract_incomes_from_pdf(args.pdf, ocr=args.ocr, poppler_path=args.poppler_path, tesseract_cmd=args.tesseract_cmd,
+                                           pages=pages, ocr_settings=ocr_settings, checkpoint=checkpoint, dates=dates)
     except RuntimeError as e:
         print(f'Erro durante extração: {e}')
         return
+    if checkpoint is not None:
+        checkpoint.discard()
 
     if not entries:
         print('Nenhuma entrada encontrada com as heurísticas aplicadas. Tente revisar o arquivo ou usar OCR se o PDF for escaneado.')
@@ -0,0 +1,307 @@
+"""Estimativa de custo e controle de admissão das requisições de extração.
+
+Antes de extrair, cada PDF enviado passa por uma leitura rápida (PyPDF2, sem
+extrair texto): quantidade de páginas e se há camada de texto (fontes nas
+páginas amostradas). Com isso a requisição recebe um custo em "páginas de
+texto equivalentes" e uma faixa. PDF que o PyPDF2 não consegue ler
+(protegido, danificado, PyPDF2 ausente) não sai de graça: as páginas são
+estimadas pelo tamanho do arquivo, ao custo de página escaneada.
+
+
+- `light`: até `ADMISSION_BUDGET`; roda direto.
+- `heavy`: até `ADMISSION_LIMIT`; roda na faixa lenta, com no máximo
+  `HEAVY_SLOTS` requisições pesadas ao mesmo tempo por worker. Sem vaga,
+  é recusada na hora com "ocupado, tente novamente".
+- acima de `ADMISSION_LIMIT`: recusada (divida o envio em partes menores).
+
+Cada decisão vai para o log e para os contadores de `stats()`
+(`GET /api/v1/metrics`).
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Tuple, Union
+
+from flask import current_app
+
+try:
+    from PyPDF2 import PdfReader
+    HAS_PYPDF2 = True
+except ImportError:
+    HAS_PYPDF2 = False
+
+# Custo relativo por página: texto = 1; página escaneada com OCR custa dezenas
+# de vezes mais, e sem OCR ela só é lida e descartada.
+TEXT_PAGE_COST = 1.0
+OCR_PAGE_COST = 30.0
+SCANNED_PAGE_COST = 0.2
+
+# Páginas amostradas para decidir se o PDF tem camada de texto
+TEXT_LAYER_SAMPLE = 3
+
+# Tamanho de uma página escaneada típica, para estimar as páginas de um PDF
+# que não pôde ser inspecionado (menor que o real = estimativa conservadora)
+UNKNOWN_PAGE_BYTES = 100 * 1024
+
+
+@dataclass
+class FileCost:
+    filename: str
+    pages: int
+    scanned_pages: int
+    cost: float
+    inspect_ms: float
+    # Páginas estimadas pelo tamanho: o PDF não pôde ser inspecionado
+    unknown: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'filename': self.filename, 'pages': self.pages, 'scanned_pages': self.scanned_pages,
+                'cost': round(self.cost, 1), 'unknown': self.unknown}
+
+
+@dataclass
+class RequestCost:
+    files: List[FileCost] = field(default_factory=list)
+
+    @property
+    def total(self) -> float:
+        return sum(f.cost for f in self.files)
+
+    @property
+    def pages(self) -> int:
+        return sum(f.pages for f in self.files)
+
+    @property
+    def scanned_pages(self) -> int:
+        return sum(f.scanned_pages for f in self.files)
+
+    @property
+    def unknown(self) -> int:
+        return sum(1 for f in self.files if f.unknown)
+
+
+class AdmissionRejected(RuntimeError):
+    """Requisição recusada pelo controle de admissão."""
+
+    def __init__(self, code: str, message: str, status: int, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _page_has_text_layer(page) -> bool:
+    resources = page.get('/Resources')
+    if resources is None:
+        return False
+    resources = resources.get_object()
+    if resources.get('/Font'):
+        return True
+    # Formulários (XObject) também podem carregar o texto
+    xobjects = resources.get('/XObject')
+    if xobjects:
+        for ref in xobjects.get_object().values():
+            xobj = ref.get_object()
+            if xobj.get('/Subtype') == '/Form' and _page_has_text_layer(xobj):
+                return True
+    return False
+
+
+def inspect_pdf(filepath: Union[str, BinaryIO]) -> Optional[Tuple[int, int]]:
+    """
+    (páginas, páginas estimadas sem camada de texto), sem extrair texto.
+
+    None se o PDF não pôde ser inspecionado: PyPDF2 ausente, PDF protegido
+    por senha, danificado ou sem páginas legíveis.
+    """
+    if not HAS_PYPDF2:
+        return None
+    try:
+        reader = PdfReader(filepath)
+        if reader.is_encrypted:
+            return None
+        pages = len(reader.pages)
+        if not pages:
+            return None
+        step = max(1, pages // TEXT_LAYER_SAMPLE)
+        sample = list(range(0, pages, step))[:TEXT_LAYER_SAMPLE]
+        without_text = sum(1 for i in sample if not _page_has_text_layer(reader.pages[i]))
+    except Exception:
+        return None
+    return pages, round(pages * without_text / len(sample))
+
+
+def _file_size(filepath: Union[str, BinaryIO]) -> int:
+    if isinstance(filepath, str):
+        try:
+            return os.path.getsize(filepath)
+        except OSError:
+            return 0
+    position = filepath.tell()
+    size = filepath.seek(0, os.SEEK_END)
+    filepath.seek(position)
+    return size
+
+
+def unknown_cost(size: int, bank: str, use_ocr: bool) -> Tuple[int, float]:
+    """
+    (páginas, custo) conservadores de um PDF de `size` bytes que não foi
+    inspecionado: páginas pelo tamanho de uma página escaneada típica, cada
+    uma ao custo da mais cara entre página de texto e escaneada.
+    """
+    scanned_cost = OCR_PAGE_COST if use_ocr and bank == 'santander' else SCANNED_PAGE_COST
+    pages = max(1, -(-size // UNKNOWN_PAGE_BYTES))
+    return pages, pages * max(TEXT_PAGE_COST, scanned_cost)
+
+
+def estimate_cost(saved: Iterable[Tuple[str, Union[str, BinaryIO]]], bank: str, use_ocr: bool,
+                  logger=None, sizes: Iterable[Tuple[str, int]] = ()) -> RequestCost:
+    """
+    Custo estimado de extrair os arquivos [(nome original, caminho ou PDF em memória)].
+
+    `sizes` [(nome, bytes)] são PDFs que ainda não foram lidos (membros de
+    ZIP, pelo diretório central): entram com o custo conservador de `unknown_cost`.
+    """
+    scanned_cost = OCR_PAGE_COST if use_ocr and bank == 'santander' else SCANNED_PAGE_COST
+    estimate = RequestCost()
+    for filename, size in sizes:
+        pages, cost = unknown_cost(size, bank, use_ocr)
+        estimate.files.append(FileCost(filename, pages, pages, cost, 0.0, unknown=True))
+    for filename, filepath in saved:
+        start = time.perf_counter()
+        inspected = inspect_pdf(filepath)
+        if inspected is None:
+            size = _file_size(filepath)
+            pages, cost = unknown_cost(size, bank, use_ocr)
+            if logger:
+                logger.warning('Admissão: %s não pôde ser inspecionado (PyPDF2 ausente, PDF protegido ou '
+                               'danificado); %d páginas estimadas por %d KB, custo %.0f',
+                               filename, pages, size // 1024, cost)
+            estimate.files.append(FileCost(filename, pages, pages, cost, (time.perf_counter() - start) * 1000,
+                                           unknown=True))
+            continue
+        pages, scanned = inspected
+        cost = (pages - scanned) * TEXT_PAGE_COST + scanned * scanned_cost
+        estimate.files.append(FileCost(filename, pages, scanned, cost, (time.perf_counter() - start) * 1000))
+    return estimate
+
+
+class Ticket:
+    """Vaga concedida a uma requisição; `release()` devolve a vaga da faixa lenta."""
+
+    def __init__(self, controller: 'AdmissionController', lane: str, estimate: RequestCost):
+        self.controller = controller
+        self.lane = lane
+        self.estimate = estimate
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.controller._release(self.lane)
+
+    def __enter__(self) -> 'Ticket':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """Decide a faixa de cada requisição e limita as pesadas simultâneas (por processo)."""
+
+    def __init__(self, budget: float = 300, limit: float = 3000, heavy_slots: int = 1, retry_after: int = 30):
+        self.budget = budget
+        self.limit = limit
+        self.heavy_slots = max(1, heavy_slots)
+        self.retry_after = retry_after
+        self._heavy = threading.BoundedSemaphore(self.heavy_slots)
+        self._lock = threading.Lock()
+        self._counters = {'light': 0, 'heavy': 0, 'rejected_busy': 0, 'rejected_limit': 0, 'heavy_running': 0}
+
+    def _count(self, key: str, delta: int = 1) -> None:
+        with self._lock:
+            self._counters[key] += delta
+
+    def _release(self, lane: str) -> None:
+        if lane == 'heavy':
+            self._count('heavy_running', -1)
+            self._heavy.release()
+
+    def admit(self, estimate: RequestCost, logger=None) -> Ticket:
+        """
+        Concede a vaga ou levanta `AdmissionRejected` (sem esperar).
+
+        Use como context manager (`with controller.admit(...)`) ou chame
+        `ticket.release()` quando a extração terminar.
+        """
+        cost = estimate.total
+        detail = (f'custo={cost:.0f} páginas={estimate.pages} escaneadas={estimate.scanned_pages} '
+                  f'arquivos={len(estimate.files)} desconhecidos={estimate.unknown} inspeção={sum(f.inspect_ms for f in estimate.files):.0f}ms')
+
+        if cost > self.limit:
+            self._count('rejected_limit')
+            if logger:
+                logger.warning('Admissão recusada (limite %.0f): %s', self.limit, detail)
+            raise AdmissionRejected(
+                'request_too_expensive',
+                f'Envio grande demais para uma requisição ({estimate.pages} páginas, '
+                f'{estimate.scanned_pages} escaneadas). Divida os arquivos em envios menores.',
+                413)
+
+        if cost <= self.budget:
+            self._count('light')
+            if logger:
+                logger.info('Admissão light: %s', detail)
+            return Ticket(self, 'light', estimate)
+
+        if not self._heavy.acquire(blocking=False):
+            self._count('rejected_busy')
+            if logger:
+                logger.warning('Admissão recusada (faixa lenta ocupada): %s', detail)
+            raise AdmissionRejected(
+                'heavy_lane_busy',
+                f'Servidor ocupado com outros extratos grandes. Tente novamente em {self.retry_after}s.',
+                503, retry_after=self.retry_after)
+        self._count('heavy')
+        self._count('heavy_running')
+        if logger:
+            logger.info('Admissão heavy: %s', detail)
+        return Ticket(self, 'heavy', estimate)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        return {'budget': self.budget, 'limit': self.limit, 'heavy_slots': self.heavy_slots, **counters}
+
+
+_controllers: Dict[int, AdmissionController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_admission() -> AdmissionController:
+    key = id(current_app._get_current_object())
+    controller = _controllers.get(key)
+    if controller is not None:
+        return controller
+    # Um controle por app: dois controles dividiriam as vagas e o orçamento ao meio
+    with _controllers_lock:
+        if key not in _controllers:
+            config = current_app.config
+            _controllers[key] = AdmissionController(
+                budget=config.get('ADMISSION_BUDGET', 300),
+                limit=config.get('ADMISSION_LIMIT', 3000),
+                heavy_slots=config.get('HEAVY_SLOTS', 1),
+            )
+        return _controllers[key]
+
+
+def admit_uploads(saved: List[Tuple[str, Union[str, BinaryIO]]], bank: str, use_ocr: bool,
+                  sizes: Iterable[Tuple[str, int]] = ()) -> Ticket:
+    """Estima o custo dos arquivos salvos (e dos membros de ZIP em `sizes`) e pede a vaga ao controle de admissão do app."""
+    estimate = estimate_cost(saved, bank, use_ocr, logger=current_app.logger, sizes=sizes)
+    return get_admission().admit(estimate, logger=current_app.logger)
@@ -0,0 +1,273 @@
+"""
+API JSON versionada (`/api/v1`) para extração programática.
+
+Diferente de `/process`, não usa `flash()`, redirecionamentos nem sessão:
+toda resposta é JSON (ou NDJSON no modo streaming) e os erros de cada
+arquivo vêm com um código estável em `error.code`.
+"""
+from __future__ import annotations
+
+import json
+from decimal import Decimal
+from itertools import chain
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+
+from COMMON.dedup import DedupIndex
+from COMMON.reports import build_report
+from COMMON.extraction import (
+    BANK_LABELS,
+    available_banks,
+    bank_label,
+    exclude_rows,
+    parse_exclude_names,
+    row_to_json,
+)
+from WEBAPP.admission import AdmissionRejected, Ticket, admit_uploads, get_admission
+from WEBAPP.file_uploads import (
+    ArchiveUploads,
+    allowed_file,
+    archive_limits,
+    open_archives,
+    remove_files,
+    save_uploads,
+    split_uploads,
+)
+from WEBAPP.ocr_pool import extract_many, get_ocr_pool
+from WEBAPP.persistence import get_store, persist_rows
+from WEBAPP.shadow import get_shadow, shadow_uploads
+from WEBAPP.tracing import get_memory_tracker, get_slow_log
+
+api_v1 = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Segundos sugeridos no Retry-After quando o pool de OCR está cheio
+OCR_RETRY_AFTER = 30
+
+
+def _error(code: str, message: str, status: int):
+    return jsonify({'error': {'code': code, 'message': message}}), status
+
+
+def _wants_stream() -> bool:
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def _wants_dedup() -> bool:
+    return request.form.get('dedup', '1').lower() not in ('0', 'false', 'no')
+
+
+def _wants_ocr() -> bool:
+    return request.form.get('ocr', '').lower() in ('1', 'true', 'yes')
+
+
+def _file_result(bank: str, filename: str, filepath: Union[str, BinaryIO], status: str, result: Any,
+                 exclude_names: List[str], dedup_index: Optional[DedupIndex] = None,
+                 client: str = '') -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Resumo do arquivo e transações em JSON, a partir do resultado de `extract_many`."""
+    if status == 'error':
+        if result['code'] == 'ocr_busy':
+            result = {'code': 'ocr_busy', 'message': f'Fila de OCR cheia; tente novamente em {OCR_RETRY_AFTER}s.'}
+        return {'filename': filename, 'status': 'error', 'error': result}, []
+    rows, used_ocr = result
+
+    persist_rows(filepath, filename, bank, rows, client)
+    rows, excluded = exclude_rows(rows, exclude_names)
+
+    merged = 0
+    if dedup_index is not None:
+        before = dedup_index.merged
+        rows = dedup_index.add_file(rows)
+        merged = dedup_index.merged - before
+
+    total = sum((r['value'] for r in rows), Decimal('0'))
+    summary = {
+        'filename': filename,
+        'status': 'ok',
+        'count': len(rows),
+        'excluded': excluded,
+        'merged_duplicates': merged,
+        'ocr': used_ocr,
+        'total': str(total.quantize(Decimal('.01')))
+    }
+    transactions = []
+    for r in rows:
+        item = row_to_json(r)
+        item['file'] = filename
+        transactions.append(item)
+    return summary, transactions
+
+
+@api_v1.errorhandler(413)
+def _too_large(exc):
+    return _error('payload_too_large', 'Arquivos excedem o tamanho máximo permitido.', 413)
+
+
+@api_v1.route('/banks', methods=['GET'])
+def banks():
+    return jsonify({
+        'banks': [
+            {'id': bank, 'label': bank_label(bank), 'available': available}
+            for bank, available in available_banks().items()
+        ]
+    })
+
+
+@api_v1.route('/metrics', methods=['GET'])
+def metrics():
+    """Contadores do processo atual (cada worker do gunicorn tem os seus)."""
+    pool = get_ocr_pool()
+    shadow = get_shadow()
+    slow_log = get_slow_log()
+    tracker = get_memory_tracker()
+    return jsonify({
+        'admission': get_admission().stats(),
+        'ocr': pool.stats() if pool is not None else None,
+        'shadow': shadow.stats() if shadow is not None else None,
+        'slow_requests': slow_log.stats() if slow_log is not None else None,
+        'memory': tracker.stats() if tracker is not None else None
+    })
+
+
+@api_v1.route('/search', methods=['GET'])
+def search():
+    store = get_store()
+    if store is None:
+        return _error('store_disabled', 'Histórico local desativado (defina TRANSACTION_DB).', 503)
+
+    query = request.args.get('q', '').strip()
+    if not query:
+        return _error('missing_query', 'Informe o termo de busca no parâmetro "q".', 400)
+
+    results = store.search(
+        query,
+        client=request.args.get('client'),
+        bank=request.args.get('bank'),
+        since=request.args.get('since'),
+        until=request.args.get('until'),
+        limit=request.args.get('limit', 100, type=int)
+    )
+    for r in results:
+        r['amount'] = str(r.pop('value'))
+    return jsonify({'query': query, 'count': len(results), 'transactions': results})
+
+
+@api_v1.route('/extract', methods=['POST'])
+def extract():
+    bank = request.form.get('bank', '').strip()
+    files = request.files.getlist('statement') + request.files.getlist('files')
+    exclude_names = parse_exclude_names(request.form.get('exclude_names'))
+    client = request.form.get('client', '').strip()
+
+    if not bank:
+        return _error('missing_bank', 'Informe o banco no campo "bank".', 400)
+    if bank not in BANK_LABELS:
+        return _error('unsupported_bank', f'Banco "{bank}" não suportado.', 400)
+    if not files or all(f.filename == '' for f in files):
+        return _error('no_files', 'Envie pelo menos um arquivo PDF ou ZIP no campo "statement".', 400)
+
+    rejected = []
+    accepted = []
+    for f in files:
+        if not f.filename:
+            continue
+        if allowed_file(f.filename):
+            accepted.append(f)
+        else:
+            rejected.append({
+                'filename': f.filename,
+                'status': 'error',
+                'error': {'code': 'invalid_format', 'message': 'Envie apenas arquivos .pdf ou .zip'}
+            })
+
+    pdfs, archives = split_uploads(accepted)
+    # Só o diretório central dos ZIPs é lido aqui; os membros são descompactados um a um na extração
+    members, archive_errors = open_archives(archives, archive_limits(current_app.config))
+    rejected.extend(archive_errors)
+    saved = save_uploads(pdfs, current_app.config['UPLOAD_FOLDER'])
+    dedup_index = DedupIndex() if _wants_dedup() else None
+    use_ocr = _wants_ocr()
+
+    try:
+        ticket = admit_uploads(saved, bank, use_ocr, members.sizes())
+    except AdmissionRejected as exc:
+        remove_files(fp for _, fp in saved)
+        headers = {'Retry-After': str(exc.retry_after)} if exc.retry_after else {}
+        return jsonify({'error': {'code': exc.code, 'message': exc.message}}), exc.status, headers
+
+    shadow_uploads(bank, saved, members)
+
+    if _wants_stream():
+        return Response(stream_with_context(_stream(bank, saved, members, rejected, exclude_names, dedup_index, client,
+                                                     use_ocr, ticket)),
+                        mimetype=NDJSON_MIMETYPE)
+
+    try:
+        file_results = list(rejected)
+        transactions = []
+        total = Decimal('0')
+        for filename, filepath, status, result in extract_many(bank, chain(saved, members), use_ocr,
+                                                               current_app.config.get('EXTRACT_WORKERS', 1)):
+            summary, items = _file_result(bank, filename, filepath, status, result, exclude_names, dedup_index, client)
+            file_results.append(summary)
+            transactions.extend(items)
+            if summary['status'] == 'ok':
+                total += Decimal(summary['total'])
+    finally:
+        ticket.release()
+        remove_files(fp for _, fp in saved)
+
+    payload = {
+        'bank': bank,
+        'bank_label': bank_label(bank),
+        'count': len(transactions),
+        'total': str(total.quantize(Decimal('.01'))),
+        'merged_duplicates': dedup_index.merged if dedup_index else 0,
+        'files': file_results,
+        'transactions': transactions
+    }
+    if request.args.get('report', '').lower() in ('1', 'true', 'yes'):
+        payload['report'] = build_report(
+            {'date': t['date'], 'type': t['type'], 'description': t['description'], 'value': Decimal(t['amount'])}
+            for t in transactions
+        ).to_dict()
+    if any(f.get('error', {}).get('code') == 'ocr_busy' for f in file_results):
+        # Resultados dos demais arquivos seguem no corpo; o cliente reenvia os recusados
+        return jsonify(payload), 503, {'Retry-After': str(OCR_RETRY_AFTER)}
+    return jsonify(payload)
+
+
+def _stream(bank: str, saved: List[Tuple[str, Union[str, BinaryIO]]], members: ArchiveUploads,
+            rejected: List[Dict[str, Any]], exclude_names: List[str], dedup_index: Optional[DedupIndex], client: str,
+            use_ocr: bool = False, ticket: Optional[Ticket] = None) -> Iterator[str]:
+    """Gera NDJSON: uma linha por transação, um resumo por arquivo e um resumo final."""
+    total = Decimal('0')
+    count = 0
+    try:
+        for result in rejected:
+            yield json.dumps({'event': 'file', **result}, ensure_ascii=False) + '\n'
+        for filename, filepath, status, result in extract_many(bank, chain(saved, members), use_ocr,
+                                                               current_app.config.get('EXTRACT_WORKERS', 1)):
+            summary, items = _file_result(bank, filename, filepath, status, result, exclude_names, dedup_index, client)
+            for item in items:
+                yield json.dumps({'event': 'transaction', **item}, ensure_ascii=False) + '\n'
+            yield json.dumps({'event': 'file', **summary}, ensure_ascii=False) + '\n'
+            if summary['status'] == 'ok':
+                total += Decimal(summary['total'])
+                count += summary['count']
+        yield json.dumps({
+            'event': 'summary',
+            'bank': bank,
+            'count': count,
+            'total': str(total.quantize(Decimal('.01'))),
+            'merged_duplicates': dedup_index.merged if dedup_index else 0
+        }, ensure_ascii=False) + '\n'
+    finally:
+        # A vaga da faixa lenta fica presa até o último arquivo ser enviado
+        if ticket is not None:
+            ticket.release()
+        remove_files(fp for _, fp in saved)
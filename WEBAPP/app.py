@@ -1,8 +1,8 @@
 from __future__ import annotations
 
 import os
-import uuid
-from decimal import Decimal, ROUND_DOWN
+from decimal import Decimal
+from itertools import chain
 from typing import List, Dict, Any
 
 from flask import Flask, render_template, request, redirect, url_for, flash
@@ -14,236 +14,213 @@ REPO_ROOT = os.path.dirname(BASE_DIR)
 if REPO_ROOT not in sys.path:
     sys.path.insert(0, REPO_ROOT)
 
-try:
-    from ITAU.itau_extractor import ItauExtractParser
-except Exception:
-    ItauExtractParser = None
-
-try:
-    from SANTANDER.income_extractor import extract_incomes_from_pdf as santander_extract
-except Exception:
-    santander_extract = None
-
-try:
-    from NUBANK.nubank_extractor import NubankExtractor
-except Exception:
-    NubankExtractor = None
-
-try:
-    from PICPAY.picpay_extractor import PicPayExtractor
-except Exception:
-    PicPayExtractor = None
-
-try:
-    from MERCADOPAGO.mercadopago_extractor import MercadoPagoExtractor
-except Exception:
-    MercadoPagoExtractor = None
+from COMMON.dates import DateWindow
+from COMMON.dedup import deduplicate
+from COMMON.prefilter import parse_page_range
+from COMMON.reports import build_report
+from COMMON.extraction import ExtractionError, bank_label, exclude_rows, format_brl, parse_exclude_names
+from COMMON.spans import span
+from WEBAPP.admission import AdmissionRejected, admit_uploads
+from WEBAPP.api import api_v1
+from WEBAPP.debug import debug_bp
+from WEBAPP.file_uploads import allowed_file, archive_limits, open_archives, remove_files, save_uploads, split_uploads
+from WEBAPP.ocr_pool import OcrBusy, extract_many
+from WEBAPP.persistence import get_store, persist_rows
+from WEBAPP.shadow import shadow_uploads
+from WEBAPP.tracing import note_hashes, traced
 
 
 UPLOAD_DIR = os.path.join(BASE_DIR, 'uploads')
-ALLOWED_EXTENSIONS = {'.pdf'}
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY', 'dev-secret-change-in-production')
 app.config['UPLOAD_FOLDER'] = UPLOAD_DIR
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
-
-
-def allowed_file(filename: str) -> bool:
-    _, ext = os.path.splitext(filename.lower())
-    return ext in ALLOWED_EXTENSIONS
-
-
-def should_exclude_transaction(description: str, exclude_names: List[str]) -> bool:
-    if not exclude_names:
-        return False
-    
-    description_lower = description.lower()
-    for name in exclude_names:
-        if name in description_lower:
-            return True
-    return False
+# Banco SQLite opcional para guardar o histórico de transações (ver COMMON/store.py)
+app.config['TRANSACTION_DB'] = os.environ.get('TRANSACTION_DB')
+# OCR de extratos escaneados (Santander) em um pool de processos separado (ver ocr_pool.py)
+app.config['OCR_ENABLED'] = os.environ.get('OCR_ENABLED', '').lower() in ('1', 'true', 'yes')
+app.config['OCR_WORKERS'] = int(os.environ.get('OCR_WORKERS', 1))
+app.config['OCR_QUEUE'] = int(os.environ.get('OCR_QUEUE', 0))
+app.config['OCR_TIMEOUT'] = float(os.environ.get('OCR_TIMEOUT', 100))
+app.config['OCR_MODE'] = os.environ.get('OCR_MODE', 'full')
+# Controle de admissão por custo estimado (páginas de texto equivalentes; ver admission.py)
+app.config['ADMISSION_BUDGET'] = float(os.environ.get('ADMISSION_BUDGET', 300))
+app.config['ADMISSION_LIMIT'] = float(os.environ.get('ADMISSION_LIMIT', 3000))
+app.config['HEAVY_SLOTS'] = int(os.environ.get('HEAVY_SLOTS', 1))
+# Checkpoint por página: reenviar um PDF cuja extração foi interrompida retoma
+# da última página concluída (ver COMMON/checkpoint.py). Vazio desativa.
+app.config['CHECKPOINT_DIR'] = os.environ.get('CHECKPOINT_DIR', os.path.join(BASE_DIR, 'checkpoints'))
+# Páginas sem lançamentos aprendidas por banco, puladas antes do layout (ver COMMON/boilerplate.py). Vazio desativa.
+app.config['BOILERPLATE_DIR'] = os.environ.get('BOILERPLATE_DIR', os.path.join(BASE_DIR, 'boilerplate'))
+# Arquivos de um mesmo envio (PDFs e membros de ZIP) extraídos em paralelo, em threads
+app.config['EXTRACT_WORKERS'] = int(os.environ.get('EXTRACT_WORKERS', 2))
+# Limites dos ZIPs enviados: PDFs por ZIP e tamanho descompactado (MB) por PDF e no total
+app.config['ZIP_MAX_MEMBERS'] = int(os.environ.get('ZIP_MAX_MEMBERS', 100))
+app.config['ZIP_MAX_MEMBER_MB'] = int(os.environ.get('ZIP_MAX_MEMBER_MB', 50))
+app.config['ZIP_MAX_TOTAL_MB'] = int(os.environ.get('ZIP_MAX_TOTAL_MB', 200))
+# Modo sombra: JSON da configuração candidata dos extratores (vazio desativa), fração
+# das requisições comparadas depois da resposta e log das comparações (ver shadow.py)
+app.config['SHADOW_CONFIG'] = os.environ.get('SHADOW_CONFIG', '')
+app.config['SHADOW_SAMPLE'] = float(os.environ.get('SHADOW_SAMPLE', 0.05))
+app.config['SHADOW_QUEUE'] = int(os.environ.get('SHADOW_QUEUE', 4))
+app.config['SHADOW_LOG'] = os.environ.get('SHADOW_LOG', os.path.join(BASE_DIR, 'logs', 'shadow.jsonl'))
+# Endpoints de diagnóstico em /debug (profiler por amostragem; ver debug.py). Sem token ficam desligados (404)
+app.config['DEBUG_TOKEN'] = os.environ.get('DEBUG_TOKEN', '')
+app.config['PROFILE_MAX_SECONDS'] = float(os.environ.get('PROFILE_MAX_SECONDS', 60))
+# Requisições de /process acima de TRACE_SLOW_SECONDS vão para TRACE_LOG com a linha do
+# tempo de cada etapa (ver tracing.py); 0 grava todas, TRACE_LOG vazio desativa
+app.config['TRACE_SLOW_SECONDS'] = float(os.environ.get('TRACE_SLOW_SECONDS', 10))
+app.config['TRACE_LOG'] = os.environ.get('TRACE_LOG', os.path.join(BASE_DIR, 'logs', 'slow.jsonl'))
+# Memória por requisição, arquivo e página (tracemalloc; deixa a extração ~2x mais lenta, só para diagnóstico)
+app.config['MEMORY_TRACE'] = os.environ.get('MEMORY_TRACE', '').lower() in ('1', 'true', 'yes')
+app.config['MEMORY_TRACE_FRAMES'] = int(os.environ.get('MEMORY_TRACE_FRAMES', 1))
+app.register_blueprint(api_v1)
+app.register_blueprint(debug_bp)
 
 
 @app.route('/', methods=['GET'])
 def index():
-    return render_template('index.html')
+    return render_template('index.html', store_enabled=bool(app.config['TRANSACTION_DB']),
+                           ocr_enabled=app.config['OCR_ENABLED'])
 
 
 @app.route('/process', methods=['POST'])
+@traced
 def process():
     bank = request.form.get('bank')
     files = request.files.getlist('statement')
-    exclude_names_input = request.form.get('exclude_names', '').strip()
-
-    exclude_names = []
-    if exclude_names_input:
-        exclude_names = [name.strip().lower() for name in exclude_names_input.split(',') if name.strip()]
+    exclude_names = parse_exclude_names(request.form.get('exclude_names', '').strip())
+    client = request.form.get('client', '').strip()
+    use_ocr = request.form.get('ocr') == '1'
 
     if not bank:
         flash('Selecione o banco.')
         return redirect(url_for('index'))
 
+    # Período e páginas opcionais: o resto do PDF nem passa pelo pdfplumber
+    try:
+        dates = DateWindow.parse(request.form.get('date_from'), request.form.get('date_to'))
+        page_range = parse_page_range(request.form.get('pages'))
+    except ValueError as exc:
+        flash(str(exc))
+        return redirect(url_for('index'))
+
     if not files or all(f.filename == '' for f in files):
         flash('Selecione pelo menos um arquivo PDF para enviar.')
         return redirect(url_for('index'))
 
     for f in files:
         if f.filename and not allowed_file(f.filename):
-            flash(f'Formato inválido: {f.filename}. Envie apenas arquivos .pdf')
+            flash(f'Formato inválido: {f.filename}. Envie apenas arquivos .pdf ou .zip')
             return redirect(url_for('index'))
 
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-    filepaths = []
-    for f in files:
-        if f.filename:
-            unique_name = f"{uuid.uuid4().hex}.pdf"
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_name)
-            f.save(filepath)
-            filepaths.append(filepath)
+    # PDFs soltos vão para uploads/; os de um ZIP são descompactados para a memória um a um, na extração
+    pdfs, archives = split_uploads(files)
+    with span('unzip', archives=len(archives)):
+        members, archive_errors = open_archives(archives, archive_limits(app.config))
+    for error in archive_errors:
+        flash(f"{error['filename']}: {error['error']['message']}")
+    with span('save', files=len(pdfs)):
+        saved = save_uploads(pdfs, app.config['UPLOAD_FOLDER'])
+    filepaths = [fp for _, fp in saved]
+    file_count = len(saved) + len(members)
+    if not file_count:
+        return redirect(url_for('index'))
 
     try:
-        all_rows: List[Dict[str, Any]] = []
-        total = Decimal('0') if bank != 'santander' else 0.0
+        with span('admission'):
+            ticket = admit_uploads(saved, bank, use_ocr, members.sizes())
+    except AdmissionRejected as exc:
+        remove_files(filepaths)
+        flash(exc.message)
+        return redirect(url_for('index'))
+
+    shadow_uploads(bank, saved, members)
+
+    try:
+        files_rows: List[List[Dict[str, Any]]] = []
         excluded_count = 0
-        
-        for filepath in filepaths:
-            if bank in ('itau', 'itau_new'):
-                if ItauExtractParser is None:
-                    raise RuntimeError('Módulo ITAU.itau_extractor não disponível')
-                parser = ItauExtractParser()
-                credits = parser.extract_credits(filepath)
-
-                for e in credits:
-                    if should_exclude_transaction(e.description, exclude_names):
-                        excluded_count += 1
-                        continue
-                        
-                    amt = e.amount.quantize(Decimal('.01'), rounding=ROUND_DOWN)
-                    total += amt
-                    all_rows.append({
-                        'date': e.date,
-                        'type': e.transaction_type,
-                        'description': e.description,
-                        'amount': f"R$ {str(amt).replace('.', ',')}",
-                        'amount_plain': str(amt).replace('.', ',')
-                    })
-
-            elif bank == 'santander':
-                if santander_extract is None:
-                    raise RuntimeError('Módulo SANTANDER.income_extractor não disponível')
-                incomes = santander_extract(filepath)
-
-                for e in incomes:
-                    if should_exclude_transaction(e.description, exclude_names):
-                        excluded_count += 1
-                        continue
-                        
-                    total += float(e.amount)
-                    amount_str = f"R$ {float(e.amount):.2f}".replace('.', ',')
-                    all_rows.append({
-                        'date': e.date or '-',
-                        'type': 'CRÉDITO',
-                        'description': e.description,
-                        'amount': amount_str,
-                        'amount_plain': f"{float(e.amount):.2f}".replace('.', ',')
-                    })
-
-            elif bank == 'nubank':
-                if NubankExtractor is None:
-                    raise RuntimeError('Módulo NUBANK.nubank_extractor não disponível')
-                extractor = NubankExtractor()
-                credits = extractor.extract_credits(filepath)
-
-                for e in credits:
-                    if should_exclude_transaction(e.description, exclude_names):
-                        excluded_count += 1
-                        continue
-                        
-                    amt = e.amount.quantize(Decimal('.01'), rounding=ROUND_DOWN)
-                    total += amt
-                    all_rows.append({
-                        'date': e.date,
-                        'type': e.transaction_type,
-                        'description': e.description,
-                        'amount': f"R$ {str(amt).replace('.', ',')}",
-                        'amount_plain': str(amt).replace('.', ',')
-                    })
-
-            elif bank == 'picpay':
-                if PicPayExtractor is None:
-                    raise RuntimeError('Módulo PICPAY.picpay_extractor não disponível')
-                extractor = PicPayExtractor()
-                credits = extractor.extract_credits(filepath)
-
-                for e in credits:
-                    if should_exclude_transaction(e.description, exclude_names):
-                        excluded_count += 1
-                        continue
-                        
-                    amt = e.amount.quantize(Decimal('.01'), rounding=ROUND_DOWN)
-                    total += amt
-                    all_rows.append({
-                        'date': e.date,
-                        'type': e.transaction_type,
-                        'description': e.description,
-                        'amount': f"R$ {str(amt).replace('.', ',')}",
-                        'amount_plain': str(amt).replace('.', ',')
-                    })
-
-            elif bank == 'mercadopago':
-                if MercadoPagoExtractor is None:
-                    raise RuntimeError('Módulo MERCADOPAGO.mercadopago_extractor não disponível')
-                extractor = MercadoPagoExtractor()
-                credits = extractor.extract_credits(filepath)
-
-                for e in credits:
-                    if should_exclude_transaction(e.description, exclude_names):
-                        excluded_count += 1
-                        continue
-                        
-                    amt = e.amount.quantize(Decimal('.01'), rounding=ROUND_DOWN)
-                    total += amt
-                    all_rows.append({
-                        'date': e.date,
-                        'type': e.transaction_type,
-                        'description': e.description,
-                        'amount': f"R$ {str(amt).replace('.', ',')}",
-                        'amount_plain': str(amt).replace('.', ',')
-                    })
-            else:
-                raise ValueError(f'Banco "{bank}" não suportado.')
-        
-        if bank == 'santander':
-            total_str = f"R$ {total:.2f}".replace('.', ',')
-        else:
-            total_str = f"R$ {str(total.quantize(Decimal('.01'))).replace('.', ',')}"
-        
+
+        for filename, filepath, status, result in extract_many(bank, chain(saved, members), use_ocr,
+                                                               app.config['EXTRACT_WORKERS'], page_range, dates):
+            if status == 'error':
+                if result['code'] == 'ocr_busy':
+                    raise OcrBusy(result['message'])
+                if file_count == 1:
+                    raise ExtractionError(result['code'], result['message'])
+                # Num lote, o arquivo com problema não derruba os demais
+                flash(f"Erro ao processar {filename}: {result['message']}")
+                continue
+            rows, _ = result
+            # O histórico guarda o arquivo inteiro (reimportar substitui as linhas): parte dele não é gravada
+            if dates is None and page_range is None:
+                with span('persist', file=filename):
+                    persist_rows(filepath, filename, bank, rows, client)
+            with span('exclude', file=filename, names=len(exclude_names)):
+                rows, excluded = exclude_rows(rows, exclude_names)
+            excluded_count += excluded
+            files_rows.append(rows)
+
+        if not files_rows:
+            return redirect(url_for('index'))
+
+        with span('dedup'):
+            all_rows, merged_count = deduplicate(files_rows)
+        total = sum((row['value'] for row in all_rows), Decimal('0'))
+
+        total_str = f"R$ {str(total.quantize(Decimal('.01'))).replace('.', ',')}"
+
         if excluded_count > 0:
             flash(f'{excluded_count} transação(ões) excluída(s) pelos nomes informados.', 'info')
-        
-        bank_labels = {
-            'itau': 'Itaú',
-            'itau_new': 'Itaú',
-            'santander': 'Santander',
-            'nubank': 'Nubank',
-            'picpay': 'PicPay',
-            'mercadopago': 'Mercado Pago'
-        }
-        bank_label = bank_labels.get(bank, bank.capitalize())
-        
-        return render_template('results.html', bank_label=bank_label, rows=all_rows, total=total_str)
 
+        if merged_count > 0:
+            flash(f'{merged_count} transação(ões) repetida(s) entre extratos sobrepostos foram mescladas.', 'info')
+
+        if dates is not None:
+            flash(f'Somente transações {dates.label()}.', 'info')
+
+        with span('render', rows=len(all_rows)):
+            return render_template('results.html', bank_label=bank_label(bank), rows=all_rows, total=total_str,
+                                   report=build_report(all_rows))
+
+    except OcrBusy:
+        flash('O OCR está ocupado com outros extratos escaneados. Tente novamente em alguns instantes.')
+        return redirect(url_for('index'))
     except Exception as exc:
         flash(f'Erro ao processar: {exc}')
         return redirect(url_for('index'))
     finally:
-        for fp in filepaths:
-            if os.path.exists(fp):
-                try:
-                    os.remove(fp)
-                except Exception:
-                    pass
+        ticket.release()
+        note_hashes(chain(saved, members))
+        remove_files(filepaths)
+
+
+@app.route('/search', methods=['GET'])
+def search():
+    store = get_store()
+    if store is None:
+        flash('Busca indisponível: defina TRANSACTION_DB para ativar o histórico local.')
+        return redirect(url_for('index'))
+
+    query = request.args.get('q', '').strip()
+    client = request.args.get('client', '').strip() or None
+    if not query:
+        flash('Digite um nome ou termo para buscar.')
+        return redirect(url_for('index'))
+
+    results = store.search(query, client=client)
+    rows = [{
+        'date': r['date'] or '-',
+        'type': r['type'],
+        'description': r['description'],
+        'amount': format_brl(r['value']),
+        'amount_plain': str(r['value']).replace('.', ',')
+    } for r in results]
+    total = sum((r['value'] for r in results), Decimal('0'))
+    total_str = f"R$ {str(total.quantize(Decimal('.01'))).replace('.', ',')}"
+
+    return render_template('results.html', bank_label=f'Busca "{query}"', rows=rows, total=total_str)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,78 @@
+"""
+Endpoints de diagnóstico para operadores (`/debug`).
+
+Desligados por padrão: sem `DEBUG_TOKEN` configurado, todas as rotas
+respondem 404. Com ele, cada requisição precisa mandar o mesmo valor no
+cabeçalho `X-Debug-Token` (ou `Authorization: Bearer ...`).
+
+Cada requisição cai em um único worker do gunicorn (o que atendeu a
+conexão), então o resultado é do processo que respondeu; o PID vem no
+cabeçalho `X-Worker-Pid`.
+"""
+from __future__ import annotations
+
+import hmac
+import os
+import threading
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+
+from COMMON.profiler import sample
+
+debug_bp = Blueprint('debug', __name__, url_prefix='/debug')
+
+# Um profiler por processo de cada vez
+_profile_lock = threading.Lock()
+
+
+def _token_ok() -> bool:
+    token = request.headers.get('X-Debug-Token', '')
+    auth = request.headers.get('Authorization', '')
+    if not token and auth.startswith('Bearer '):
+        token = auth[len('Bearer '):]
+    return hmac.compare_digest(token.encode(), current_app.config['DEBUG_TOKEN'].encode())
+
+
+@debug_bp.before_request
+def _protect():
+    if not current_app.config.get('DEBUG_TOKEN'):
+        abort(404)
+    if not _token_ok():
+        abort(403)
+
+
+@debug_bp.route('/profile', methods=['GET'])
+def profile():
+    """
+    Amostra as pilhas das outras threads do worker por `seconds` segundos.
+
+    Parâmetros: `seconds` (padrão 10, até `PROFILE_MAX_SECONDS`), `interval`
+    em ms (padrão 10), `idle=1` para manter threads paradas e `format=json`
+    para o resumo (funções com mais amostras) em vez das pilhas collapsed.
+    """
+    seconds = request.args.get('seconds', 10, type=float)
+    interval = request.args.get('interval', 10, type=float)
+    max_seconds = current_app.config.get('PROFILE_MAX_SECONDS', 60)
+    if not 0 < seconds <= max_seconds:
+        return jsonify({'error': {'code': 'invalid_seconds',
+                                  'message': f'seconds deve estar entre 0 e {max_seconds}.'}}), 400
+    if not 1 <= interval <= 1000:
+        return jsonify({'error': {'code': 'invalid_interval', 'message': 'interval deve estar entre 1 e 1000 ms.'}}), 400
+
+    if not _profile_lock.acquire(blocking=False):
+        return jsonify({'error': {'code': 'profiler_busy', 'message': 'Já há um profiler rodando neste worker.'}}), 409
+    try:
+        result = sample(seconds, interval / 1000, include_idle=request.args.get('idle') == '1')
+    finally:
+        _profile_lock.release()
+
+    current_app.logger.info('Profiler: %d amostras em %.1fs (custo %.2f%%)',
+                            result.samples, result.seconds, result.overhead * 100)
+    headers = {
+        'X-Worker-Pid': str(os.getpid()),
+        'X-Profile-Samples': str(result.samples),
+        'X-Profile-Overhead': f'{result.overhead:.4f}',
+    }
+    if request.args.get('format') == 'json':
+        return jsonify({'pid': os.getpid(), **result.to_dict()}), 200, headers
+    return Response(result.collapsed(), mimetype='text/plain', headers=headers)
@@ -0,0 +1,120 @@
+"""Helpers para salvar e limpar os PDFs enviados ao app."""
+from __future__ import annotations
+
+import io
+import os
+import uuid
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from COMMON.archive import ArchiveError, ArchiveLimits, is_archive, iter_members, scan_members
+
+ALLOWED_EXTENSIONS = {'.pdf', '.zip'}
+
+
+def allowed_file(filename: str) -> bool:
+    _, ext = os.path.splitext(filename.lower())
+    return ext in ALLOWED_EXTENSIONS
+
+
+def save_uploads(files, upload_dir: str) -> List[Tuple[str, str]]:
+    """Salva os arquivos com nomes aleatórios e retorna pares (nome original, caminho)."""
+    os.makedirs(upload_dir, exist_ok=True)
+    saved = []
+    for f in files:
+        if f.filename:
+            unique_name = f"{uuid.uuid4().hex}.pdf"
+            filepath = os.path.join(upload_dir, unique_name)
+            f.save(filepath)
+            saved.append((f.filename, filepath))
+    return saved
+
+
+def archive_limits(config) -> ArchiveLimits:
+    """Limites dos ZIPs enviados, a partir da configuração do app (`ZIP_MAX_*`)."""
+    return ArchiveLimits(
+        max_members=config.get('ZIP_MAX_MEMBERS', 100),
+        max_member_size=config.get('ZIP_MAX_MEMBER_MB', 50) * 1024 * 1024,
+        max_total_size=config.get('ZIP_MAX_TOTAL_MB', 200) * 1024 * 1024,
+    )
+
+
+class ArchiveUploads:
+    """
+    PDFs dos ZIPs enviados, descompactados sob demanda.
+
+    Na criação só o diretório central de cada ZIP é lido: limites e tamanhos
+    dos membros (`sizes()`, para a admissão). Os membros são descompactados
+    um a um enquanto o objeto é iterado, direto do upload para a memória,
+    sem gravar em `uploads/`; passando a iteração para `extract_many`, só os
+    membros em extração ficam na memória. Cada iteração relê os ZIPs.
+
+    Iterar devolve (zip/membro, PDF em memória) ou, para o membro que não
+    pôde ser lido, (zip/membro, ArchiveError).
+    """
+
+    def __init__(self, archives: List[Tuple[str, BinaryIO, List[Tuple[str, Optional[int]]]]], limits: ArchiveLimits):
+        self._archives = archives
+        self.limits = limits
+
+    def __len__(self) -> int:
+        return sum(len(members) for _, _, members in self._archives)
+
+    def sizes(self) -> List[Tuple[str, int]]:
+        """[(zip/membro, tamanho descompactado)] dos PDFs, pelo diretório central."""
+        return [(f'{filename}/{name}', size) for filename, _, members in self._archives
+                for name, size in members if size is not None]
+
+    def detached(self) -> 'ArchiveUploads':
+        """Cópia com os ZIPs (compactados) em memória, para ler depois que o upload for fechado."""
+        copies = []
+        for filename, stream, members in self._archives:
+            stream.seek(0)
+            copies.append((filename, io.BytesIO(stream.read()), members))
+        return ArchiveUploads(copies, self.limits)
+
+    def __iter__(self) -> Iterator[Tuple[str, Union[BinaryIO, ArchiveError]]]:
+        for filename, stream, _ in self._archives:
+            try:
+                for member in iter_members(stream, self.limits):
+                    name = f'{filename}/{member.name}'
+                    if member.error:
+                        yield name, ArchiveError(member.error['code'], member.error['message'])
+                    else:
+                        yield name, member.open()
+            except ArchiveError as exc:
+                yield filename, exc
+
+
+def open_archives(files, limits: ArchiveLimits) -> Tuple[ArchiveUploads, List[Dict[str, Any]]]:
+    """
+    Confere o diretório central de cada ZIP enviado. Retorna (membros lidos
+    sob demanda, [resultados de erro no formato da API, um por ZIP recusado
+    inteiro]); erros de um membro só aparecem ao iterar.
+    """
+    archives = []
+    rejected = []
+    for f in files:
+        try:
+            archives.append((f.filename, f.stream, scan_members(f.stream, limits)))
+        except ArchiveError as exc:
+            rejected.append({'filename': f.filename, 'status': 'error', 'error': exc.to_dict()})
+    return ArchiveUploads(archives, limits), rejected
+
+
+def split_uploads(files) -> Tuple[list, list]:
+    """Separa os uploads em (PDFs, ZIPs)."""
+    pdfs, archives = [], []
+    for f in files:
+        if f.filename:
+            (archives if is_archive(f.filename) else pdfs).append(f)
+    return pdfs, archives
+
+
+def remove_files(filepaths: Iterable[Union[str, BinaryIO]]) -> None:
+    for fp in filepaths:
+        # Membros de ZIP ficam só na memória
+        if isinstance(fp, str) and os.path.exists(fp):
+            try:
+                os.remove(fp)
+            except Exception:
+                pass
@@ -8,7 +8,10 @@ bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
 # Workers (processos)
 workers = 2
 
-# Threads por worker
+# Threads por worker. Os extratores são instâncias únicas por banco e sem
+# estado por chamada (COMMON/extraction.get_extractor), seguros entre threads.
+# Com OCR_ENABLED, mantenha OCR_WORKERS + OCR_QUEUE
+# menor que este valor: cada OCR aceito ocupa uma thread esperando o pool.
 threads = 2
 
 # Timeout (em segundos)
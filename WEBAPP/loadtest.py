@@ -0,0 +1,549 @@
+#!/usr/bin/env python3
+"""
+Teste de carga local do `/process`, para dimensionar `workers`/`threads` do gunicorn.
+
+Sobe o app localmente (gunicorn com `workers`, `threads` e `worker_class`
+escolhidos na linha de comando, ou o servidor do Flask), dispara envios de
+`/process` com uma mistura de bancos, tamanhos de arquivo e lotes de vários
+arquivos e mede:
+
+- vazão (respostas 200 por segundo) e latência p50/p95/p99;
+- taxa de erro (redirecionamento com mensagem, 5xx, conexão derrubada) e de timeout;
+- CPU e RSS de cada processo do servidor (mestre e workers), lidos de /proc
+  (ou psutil, se instalado) durante a carga.
+
+Dois modos de carga:
+
+- `--concurrency N` (padrão): N clientes em laço fechado, cada um envia o
+  próximo assim que recebe a resposta;
+- `--rate R`: chegadas de Poisson a R requisições/s, independentes das
+  respostas. A latência conta a partir da hora marcada para o envio, então
+  a espera por um cliente livre (`--max-inflight`) também aparece nela.
+
+Cada execução é gravada em JSON (`WEBAPP/logs/loadtest/`) com a
+configuração, o resumo, os processos e cada requisição; `compare` põe várias
+lado a lado.
+
+A mistura vem de `--file BANCO=PDF[,PDF...]` (repetível, peso 1 cada) ou de um JSON:
+    {"requests": [
+      {"bank": "itau", "files": ["itau.pdf"], "weight": 5},
+      {"bank": "itau", "files": ["itau_grande.pdf", "itau.pdf"], "weight": 1},
+      {"bank": "nubank", "files": ["lote.zip"], "form": {"exclude_names": "fulano"}}
+    ]}
+(caminhos relativos ao JSON).
+
+Uso:
+    python WEBAPP/loadtest.py run --mix mistura.json --workers 2 --threads 2 -c 4 --duration 60 --label gthread-2x2
+    python WEBAPP/loadtest.py run --file itau=extratos/itau.pdf --server flask --rate 0.5
+    python WEBAPP/loadtest.py compare WEBAPP/logs/loadtest/*.json
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BASE_DIR)
+RUNS_DIR = os.path.join(BASE_DIR, 'logs', 'loadtest')
+_CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+@dataclass
+class RequestSpec:
+    """Um tipo de envio da mistura: banco, arquivos e campos extras do formulário."""
+    bank: str
+    files: List[str]
+    weight: float = 1.0
+    form: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b''
+    content_type: str = ''
+
+    @property
+    def label(self) -> str:
+        return f"{self.bank}:{'+'.join(os.path.basename(f) for f in self.files)}"
+
+    def encode(self) -> None:
+        """Monta o corpo multipart uma vez (os arquivos são lidos aqui, não a cada envio)."""
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in [('bank', self.bank)] + sorted(self.form.items()):
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        for path in self.files:
+            filename = os.path.basename(path)
+            mime = 'application/zip' if filename.lower().endswith('.zip') else 'application/pdf'
+            with open(path, 'rb') as f:
+                data = f.read()
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="statement"; '
+                         f'filename="{filename}"\r\nContent-Type: {mime}\r\n\r\n'.encode() + data + b'\r\n')
+        parts.append(f'--{boundary}--\r\n'.encode())
+        self.body = b''.join(parts)
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+
+
+def load_mix(path: Optional[str], file_args: List[str]) -> List[RequestSpec]:
+    specs = []
+    if path:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        base = os.path.dirname(os.path.abspath(path))
+        for item in data['requests']:
+            specs.append(RequestSpec(item['bank'], [os.path.join(base, p) for p in item['files']],
+                                     float(item.get('weight', 1)), dict(item.get('form', {}))))
+    for arg in file_args:
+        bank, _, paths = arg.partition('=')
+        if not paths:
+            raise ValueError(f'--file espera BANCO=PDF[,PDF...]: {arg}')
+        specs.append(RequestSpec(bank, paths.split(',')))
+    if not specs:
+        raise ValueError('Informe --mix ou ao menos um --file.')
+    for spec in specs:
+        spec.encode()
+    return specs
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+# Estado local que o app grava; no teste de carga vai para uma pasta temporária
+# da execução, para não misturar com o de produção em WEBAPP/
+STATE_PATHS = {
+    'CHECKPOINT_DIR': 'checkpoints',
+    'BOILERPLATE_DIR': 'boilerplate',
+    'TRACE_LOG': os.path.join('logs', 'slow.jsonl'),
+    'SHADOW_LOG': os.path.join('logs', 'shadow.jsonl'),
+}
+
+
+class Server:
+    """
+    O app rodando num subprocesso (gunicorn ou Flask), com a saída em `server.log`.
+
+    Checkpoints, páginas aprendidas e logs do app ficam numa pasta temporária
+    apagada no `stop()`, e o histórico (`TRANSACTION_DB`) fica desligado;
+    `env` pode apontar qualquer um deles para outro lugar.
+    """
+
+    def __init__(self, kind: str, workers: int, threads: int, worker_class: str, env: Dict[str, str],
+                 log_path: str):
+        self.kind = kind
+        self.workers = workers
+        self.threads = threads
+        self.worker_class = worker_class
+        self.env = env
+        self.port = _free_port()
+        self.log_path = log_path
+        self.proc: Optional[subprocess.Popen] = None
+        self.state_dir: Optional[str] = None
+
+    def command(self) -> List[str]:
+        if self.kind == 'flask':
+            return [sys.executable, os.path.join(BASE_DIR, 'app.py')]
+        return [sys.executable, '-m', 'gunicorn', '-c', os.path.join(BASE_DIR, 'gunicorn_config.py'),
+                '--chdir', REPO_ROOT, '--bind', f'127.0.0.1:{self.port}',
+                '--workers', str(self.workers), '--threads', str(self.threads),
+                '--worker-class', self.worker_class, 'WEBAPP.app:app']
+
+    def start(self, wait: float = 60) -> None:
+        self.state_dir = tempfile.mkdtemp(prefix='loadtest-')
+        state = {key: os.path.join(self.state_dir, path) for key, path in STATE_PATHS.items()}
+        env = dict(os.environ, PORT=str(self.port), FLASK_ENV='production', TRANSACTION_DB='', **state)
+        env.update(self.env)
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        log = open(self.log_path, 'wb')
+        self.proc = subprocess.Popen(self.command(), cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+        log.close()
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                self.stop()
+                raise RuntimeError(f'O servidor terminou ao iniciar (código {self.proc.returncode}); veja {self.log_path}')
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=2)
+                conn.request('GET', '/')
+                if conn.getresponse().status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.3)
+        self.stop()
+        raise RuntimeError(f'O servidor não respondeu em {wait:.0f}s; veja {self.log_path}')
+
+    def stop(self) -> None:
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        if self.state_dir is not None:
+            shutil.rmtree(self.state_dir, ignore_errors=True)
+            self.state_dir = None
+
+
+def _children(pid: int) -> List[int]:
+    if psutil is not None:
+        try:
+            return [c.pid for c in psutil.Process(pid).children(recursive=True)]
+        except psutil.Error:
+            return []
+    children = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, ValueError, IndexError):
+                continue
+            if ppid == pid:
+                children.append(int(entry))
+    return children
+
+
+def _usage(pid: int) -> Optional[Tuple[float, int]]:
+    """(segundos de CPU, RSS em bytes) do processo, ou None se ele já terminou."""
+    if psutil is not None:
+        try:
+            p = psutil.Process(pid)
+            times = p.cpu_times()
+            return times.user + times.system, p.memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/statm') as f:
+            rss = int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+    return (int(fields[11]) + int(fields[12])) / _CLK_TCK, rss
+
+
+class ProcessSampler(threading.Thread):
+    """Lê CPU e RSS do mestre e dos workers a cada `interval` segundos."""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples: Dict[int, List[Tuple[float, float, int]]] = {}
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            for pid in [self.pid] + _children(self.pid):
+                usage = _usage(pid)
+                if usage is not None:
+                    self.samples.setdefault(pid, []).append((now, usage[0], usage[1]))
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def summary(self, start: float, end: float) -> List[Dict[str, Any]]:
+        """CPU média (% de um núcleo) e RSS de cada processo dentro da janela medida."""
+        result = []
+        for pid, samples in self.samples.items():
+            window = [s for s in samples if start <= s[0] <= end] or samples[-1:]
+            first, last = window[0], window[-1]
+            elapsed = last[0] - first[0]
+            result.append({
+                'pid': pid,
+                'role': 'mestre' if pid == self.pid else 'worker',
+                'cpu_seconds': round(last[1] - first[1], 2),
+                'cpu_pct': round(100 * (last[1] - first[1]) / elapsed, 1) if elapsed > 0 else None,
+                'rss_avg_mb': round(sum(s[2] for s in window) / len(window) / 2 ** 20, 1),
+                'rss_peak_mb': round(max(s[2] for s in window) / 2 ** 20, 1),
+            })
+        return sorted(result, key=lambda p: (p['role'] != 'mestre', p['pid']))
+
+
+def send(host: str, port: int, spec: RequestSpec, timeout: float) -> Tuple[Optional[int], Optional[str]]:
+    """Envia um `/process` e lê a resposta inteira. Devolve (status HTTP, tipo de erro)."""
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request('POST', '/process', body=spec.body, headers={'Content-Type': spec.content_type})
+        response = conn.getresponse()
+        response.read()
+    except socket.timeout:
+        return None, 'timeout'
+    except (OSError, http.client.HTTPException):
+        return None, 'connection'
+    finally:
+        conn.close()
+    if response.status == 200:
+        return 200, None
+    # /process responde com redirecionamento + mensagem quando recusa ou falha
+    return response.status, 'redirect' if response.status in (302, 303) else f'http_{response.status}'
+
+
+def run_load(host: str, port: int, specs: List[RequestSpec], concurrency: int, rate: Optional[float],
+             duration: float, max_requests: Optional[int], timeout: float, max_inflight: int,
+             seed: Optional[int]) -> List[Dict[str, Any]]:
+    """Gera a carga e devolve um registro por requisição (`t` = segundos desde o início)."""
+    rng = random.Random(seed)
+    weights = [s.weight for s in specs]
+    lock = threading.Lock()
+    records: List[Dict[str, Any]] = []
+    start = time.monotonic()
+    end = start + duration
+    issued = [0]
+
+    def take_slot() -> bool:
+        with lock:
+            if max_requests is not None and issued[0] >= max_requests:
+                return False
+            issued[0] += 1
+            return True
+
+    def one(spec: RequestSpec, scheduled: float) -> None:
+        status, error = send(host, port, spec, timeout)
+        done = time.monotonic()
+        with lock:
+            records.append({'t': round(scheduled - start, 3), 'spec': spec.label, 'files': len(spec.files),
+                            'bytes': len(spec.body), 'status': status, 'error': error,
+                            'latency_ms': round((done - scheduled) * 1000, 1)})
+
+    if rate is None:
+        def client() -> None:
+            while time.monotonic() < end and take_slot():
+                with lock:
+                    spec = rng.choices(specs, weights)[0]
+                one(spec, time.monotonic())
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    else:
+        with ThreadPoolExecutor(max_workers=max_inflight) as executor:
+            scheduled = start
+            while True:
+                scheduled += rng.expovariate(rate)
+                if scheduled >= end or not take_slot():
+                    break
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(one, rng.choices(specs, weights)[0], scheduled)
+    return sorted(records, key=lambda r: r['t'])
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarize(records: List[Dict[str, Any]], warmup: float) -> Dict[str, Any]:
+    """Vazão, latências e erros das requisições enviadas depois do aquecimento."""
+    measured = [r for r in records if r['t'] >= warmup]
+    ok = [r for r in measured if r['error'] is None]
+    errors: Dict[str, int] = {}
+    for r in measured:
+        if r['error'] is not None:
+            errors[r['error']] = errors.get(r['error'], 0) + 1
+    window = (max(r['t'] + r['latency_ms'] / 1000 for r in measured) - warmup) if measured else 0
+    latencies = [r['latency_ms'] for r in ok]
+    by_spec: Dict[str, Dict[str, Any]] = {}
+    for r in measured:
+        g = by_spec.setdefault(r['spec'], {'requests': 0, 'errors': 0, 'latencies': []})
+        g['requests'] += 1
+        if r['error'] is None:
+            g['latencies'].append(r['latency_ms'])
+        else:
+            g['errors'] += 1
+    for g in by_spec.values():
+        lat = g.pop('latencies')
+        g['p50_ms'] = _percentile(lat, 50)
+        g['p95_ms'] = _percentile(lat, 95)
+    return {
+        'requests': len(measured),
+        'ok': len(ok),
+        'window_seconds': round(window, 2),
+        'throughput_rps': round(len(ok) / window, 3) if window > 0 else None,
+        'files_per_second': round(sum(r['files'] for r in ok) / window, 3) if window > 0 else None,
+        'p50_ms': _percentile(latencies, 50),
+        'p95_ms': _percentile(latencies, 95),
+        'p99_ms': _percentile(latencies, 99),
+        'max_ms': max(latencies) if latencies else None,
+        'error_rate': round((len(measured) - len(ok)) / len(measured), 4) if measured else None,
+        'timeout_rate': round(errors.get('timeout', 0) / len(measured), 4) if measured else None,
+        'errors': errors,
+        'by_spec': by_spec,
+    }
+
+
+def _print_summary(run: Dict[str, Any]) -> None:
+    s = run['summary']
+    print(f"{run['label']}: {s['requests']} requisições ({s['ok']} ok) em {s['window_seconds']}s")
+    print(f"  vazão {s['throughput_rps']} req/s, {s['files_per_second']} arquivos/s")
+    if s['ok']:
+        print(f"  latência p50 {s['p50_ms']} ms, p95 {s['p95_ms']} ms, p99 {s['p99_ms']} ms, máx {s['max_ms']} ms")
+    if s['requests']:
+        detail = ' (' + ', '.join(f'{k} {v}' for k, v in s['errors'].items()) + ')' if s['errors'] else ''
+        print(f"  erros {s['error_rate']:.1%}{detail}, timeouts {s['timeout_rate']:.1%}")
+    for label, g in s['by_spec'].items():
+        latency = f", p50 {g['p50_ms']} ms, p95 {g['p95_ms']} ms" if g['p50_ms'] is not None else ''
+        print(f"    {label}: {g['requests']} req, {g['errors']} erros{latency}")
+    for p in run['processes']:
+        print(f"  {p['role']} {p['pid']}: CPU {p['cpu_pct']}% ({p['cpu_seconds']}s), "
+              f"RSS médio {p['rss_avg_mb']} MB, pico {p['rss_peak_mb']} MB")
+
+
+def _row(run: Dict[str, Any]) -> List[str]:
+    s, cfg = run['summary'], run['config']
+    workers = [p for p in run['processes'] if p['role'] == 'worker'] or run['processes']
+    server = cfg['server'] if cfg['server'] == 'externo' else (
+        f"{cfg['server']} {cfg['workers']}x{cfg['threads']} {cfg['worker_class']}" if cfg['server'] == 'gunicorn'
+        else cfg['server'])
+    load = f"rate {cfg['rate']}" if cfg['rate'] else f"c {cfg['concurrency']}"
+
+    def fmt(v, spec='{:.0f}'):
+        return '-' if v is None else spec.format(v)
+
+    return [run['label'], server, load, fmt(s['throughput_rps'], '{:.2f}'), fmt(s['p50_ms']), fmt(s['p95_ms']),
+            fmt(s['p99_ms']), fmt(s['error_rate'], '{:.1%}'), fmt(s['timeout_rate'], '{:.1%}'),
+            fmt(sum(p['cpu_pct'] or 0 for p in workers) if workers else None),
+            fmt(max((p['rss_peak_mb'] for p in workers), default=None))]
+
+
+def compare(paths: List[str]) -> None:
+    header = ['execução', 'servidor', 'carga', 'req/s', 'p50', 'p95', 'p99', 'erros', 'timeout', 'CPU%', 'RSS MB']
+    rows = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            rows.append(_row(json.load(f)))
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+    for r in [header] + rows:
+        print('  '.join(v.ljust(w) if i < 3 else v.rjust(w) for i, (v, w) in enumerate(zip(r, widths))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga local do /process')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_run = sub.add_parser('run', help='Sobe o app, gera a carga e grava o resultado')
+    p_run.add_argument('--mix', help='JSON com a mistura de envios')
+    p_run.add_argument('--file', action='append', default=[], metavar='BANCO=PDF[,PDF...]',
+                       help='Um tipo de envio (repetível)')
+    p_run.add_argument('--server', choices=('gunicorn', 'flask'), default='gunicorn')
+    p_run.add_argument('--url', help='Usa um servidor já rodando (ex.: http://127.0.0.1:5000) em vez de subir um')
+    p_run.add_argument('--pid', type=int, help='Com --url: PID do mestre para medir CPU/RSS')
+    p_run.add_argument('--workers', '-w', type=int, default=2)
+    p_run.add_argument('--threads', '-t', type=int, default=2)
+    p_run.add_argument('--worker-class', default='gthread')
+    p_run.add_argument('--env', action='append', default=[], metavar='CHAVE=VALOR',
+                       help='Variável de ambiente do app (ex.: EXTRACT_WORKERS=1)')
+    p_run.add_argument('--concurrency', '-c', type=int, default=4, help='Clientes em laço fechado')
+    p_run.add_argument('--rate', type=float, help='Chegadas por segundo (laço aberto) em vez de --concurrency')
+    p_run.add_argument('--max-inflight', type=int, default=64, help='Com --rate: requisições abertas ao mesmo tempo')
+    p_run.add_argument('--duration', '-d', type=float, default=60, help='Segundos gerando carga')
+    p_run.add_argument('--requests', '-n', type=int, help='Para depois de N requisições')
+    p_run.add_argument('--warmup', type=float, default=5, help='Segundos iniciais fora das estatísticas')
+    p_run.add_argument('--timeout', type=float, default=130, help='Timeout do cliente por requisição')
+    p_run.add_argument('--seed', type=int)
+    p_run.add_argument('--label', help='Nome da execução (padrão: servidor e carga)')
+    p_run.add_argument('--out', help=f'Arquivo JSON do resultado (padrão: {os.path.relpath(RUNS_DIR, REPO_ROOT)}/)')
+    p_cmp = sub.add_parser('compare', help='Compara execuções gravadas')
+    p_cmp.add_argument('runs', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        compare(args.runs)
+        return
+
+    try:
+        specs = load_mix(args.mix, args.file)
+        env = dict(item.split('=', 1) for item in args.env)
+    except (OSError, ValueError, KeyError) as exc:
+        print(f'Mistura inválida: {exc}')
+        sys.exit(1)
+
+    at = datetime.datetime.now()
+    server_name = 'externo' if args.url else args.server
+    label = args.label or (f"{server_name}-{args.workers}x{args.threads}" if server_name == 'gunicorn' else server_name)
+    label += f"-r{args.rate:g}" if args.rate else f"-c{args.concurrency}"
+    out = args.out or os.path.join(RUNS_DIR, f"{at:%Y%m%d-%H%M%S}-{label}.json")
+
+    server = None
+    if args.url:
+        target = args.url.split('://', 1)[-1].rstrip('/')
+        host, _, port = target.partition(':')
+        port = int(port or 80)
+        master = args.pid
+    else:
+        server = Server(args.server, args.workers, args.threads, args.worker_class, env,
+                        os.path.splitext(out)[0] + '.server.log')
+        try:
+            server.start()
+        except RuntimeError as exc:
+            print(exc)
+            sys.exit(1)
+        host, port, master = '127.0.0.1', server.port, server.proc.pid
+
+    sampler = ProcessSampler(master) if master else None
+    if sampler is not None:
+        sampler.start()
+    print(f'{label}: {len(specs)} tipos de envio contra {host}:{port} por {args.duration:.0f}s...')
+    try:
+        start = time.monotonic()
+        records = run_load(host, port, specs, args.concurrency, args.rate, args.duration, args.requests,
+                           args.timeout, args.max_inflight, args.seed)
+        end = time.monotonic()
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        if server is not None:
+            server.stop()
+
+    run = {
+        'label': label,
+        'at': at.isoformat(timespec='seconds'),
+        'config': {
+            'server': server_name, 'workers': args.workers, 'threads': args.threads,
+            'worker_class': args.worker_class, 'env': env, 'concurrency': args.concurrency, 'rate': args.rate,
+            'max_inflight': args.max_inflight, 'duration': args.duration, 'warmup': args.warmup,
+            'timeout': args.timeout, 'seed': args.seed, 'cpus': os.cpu_count(),
+            'mix': [{'spec': s.label, 'weight': s.weight, 'bytes': len(s.body), 'form': s.form} for s in specs],
+        },
+        'summary': summarize(records, args.warmup),
+        'processes': sampler.summary(start + args.warmup, end) if sampler is not None else [],
+        'records': records,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(run, f, ensure_ascii=False, indent=1)
+    _print_summary(run)
+    print(f'Gravado em {out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""Pool dedicado de processos para OCR, com fila limitada.
+
+O OCR de um extrato escaneado leva minutos de CPU. Ele nunca roda na thread
+da requisição: vai para um `ProcessPoolExecutor` próprio, com poucos
+processos (`OCR_WORKERS`) e uma fila curta (`OCR_QUEUE`). Quando processos e
+fila estão ocupados, `submit()` recusa na hora com `OcrBusy` e a requisição
+responde "ocupado, tente novamente" em vez de esperar.
+
+A requisição que conseguiu vaga espera o resultado até `OCR_TIMEOUT`
+segundos. Cada processo do gunicorn tem o seu pool; mantenha
+`OCR_WORKERS + OCR_QUEUE` menor que `threads` do gunicorn para sempre
+sobrar thread para a extração de texto.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, BinaryIO, Collection, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from flask import current_app
+
+from COMMON.archive import ordered_map
+from COMMON.dates import DateWindow
+from COMMON.extraction import ExtractionError, extract_rows
+from COMMON import spans
+
+
+class OcrBusy(RuntimeError):
+    """Todos os processos e vagas da fila de OCR estão ocupados."""
+
+
+def _ocr_job(bank: str, filepath: str, ocr_mode: str, checkpoint_dir: Optional[str] = None,
+             page_range: Optional[Collection[int]] = None, dates: Optional[DateWindow] = None) -> Tuple[str, Any]:
+    """Roda no processo de OCR; devolve ('ok', linhas) ou ('error', {code, message})."""
+    try:
+        rows, _ = extract_rows(bank, filepath, prefilter=False, ocr_mode=ocr_mode, checkpoint_dir=checkpoint_dir,
+                               page_range=page_range, dates=dates)
+    except ExtractionError as exc:
+        return 'error', exc.to_dict()
+    return 'ok', rows
+
+
+class OcrPool:
+    """Pool de processos de OCR com no máximo `workers + queue_size` trabalhos em andamento."""
+
+    def __init__(self, workers: int = 1, queue_size: int = 0, timeout: float = 100.0, mode: str = 'full',
+                 checkpoint_dir: Optional[str] = None):
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue_size)
+        self.timeout = timeout
+        self.mode = mode
+        # Páginas já lidas por OCR ficam no checkpoint: reenviar após ocr_timeout retoma delas
+        self.checkpoint_dir = checkpoint_dir
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Criado no primeiro uso, já dentro do processo do gunicorn (depois do fork);
+        # "spawn" evita herdar threads e locks do processo web.
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def submit(self, bank: str, filepath: str, page_range: Optional[Collection[int]] = None,
+               dates: Optional[DateWindow] = None):
+        """Enfileira o OCR do arquivo ou levanta `OcrBusy` se não houver vaga (nunca bloqueia)."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise OcrBusy('Fila de OCR cheia.')
+        try:
+            future = self._get_executor().submit(_ocr_job, bank, filepath, self.mode, self.checkpoint_dir,
+                                                 page_range, dates)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_flight += 1
+        # A vaga só é devolvida quando o processo termina, mesmo se a requisição desistir antes
+        future.add_done_callback(self._release)
+        return future
+
+    def extract(self, bank: str, filepath: str, page_range: Optional[Collection[int]] = None,
+                dates: Optional[DateWindow] = None) -> List[Dict[str, Any]]:
+        """
+        OCR síncrono para a requisição: espera o resultado até `timeout`.
+
+        Raises:
+            OcrBusy: sem vaga no pool.
+            ExtractionError: falha no OCR ou tempo esgotado (`ocr_timeout`).
+        """
+        future = self.submit(bank, filepath, page_range, dates)
+        try:
+            status, result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise ExtractionError('ocr_timeout', f'OCR excedeu {self.timeout:.0f}s; tente novamente mais tarde.')
+        except Exception as exc:
+            raise ExtractionError('extraction_failed', f'Falha no OCR: {exc}') from exc
+        if status == 'error':
+            raise ExtractionError(result['code'], result['message'])
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'capacity': self.capacity, 'in_flight': self.in_flight, 'rejected': self.rejected}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_pools: Dict[int, OcrPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_ocr_pool() -> Optional[OcrPool]:
+    """Pool do app atual, ou None com `OCR_ENABLED` desligado."""
+    config = current_app.config
+    if not config.get('OCR_ENABLED'):
+        return None
+    key = id(current_app._get_current_object())
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+    # Duas requisições simultâneas (gthread) não podem criar dois pools para o mesmo app
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = OcrPool(
+                workers=config.get('OCR_WORKERS', 1),
+                queue_size=config.get('OCR_QUEUE', 0),
+                timeout=config.get('OCR_TIMEOUT', 100),
+                mode=config.get('OCR_MODE', 'full'),
+                checkpoint_dir=config.get('CHECKPOINT_DIR'),
+            )
+        return _pools[key]
+
+
+def extract_rows_with_ocr(bank: str, filepath: Union[str, BinaryIO], use_ocr: bool,
+                          page_range: Optional[Collection[int]] = None,
+                          dates: Optional[DateWindow] = None) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Extração normal (texto) e, se ela não achou nada num PDF do Santander com
+    OCR pedido, OCR no pool dedicado. Devolve (linhas, se usou OCR).
+
+    `page_range` e `dates` restringem páginas e período (`extract_rows`),
+    também no OCR.
+
+    Raises:
+        OcrBusy, ExtractionError
+    """
+    config = current_app.config
+    rows, _ = extract_rows(bank, filepath, checkpoint_dir=config.get('CHECKPOINT_DIR'),
+                           boilerplate_dir=config.get('BOILERPLATE_DIR'), page_range=page_range, dates=dates)
+    if rows or not use_ocr or bank != 'santander':
+        return rows, False
+    pool = get_ocr_pool()
+    if pool is None:
+        raise ExtractionError('ocr_unavailable', 'OCR desativado neste servidor (OCR_ENABLED).')
+    with spans.span('ocr', pool=True):
+        return pool.extract(bank, filepath, page_range, dates), True
+
+
+def _size(source: Union[str, BinaryIO]) -> Optional[int]:
+    if isinstance(source, str):
+        try:
+            return os.path.getsize(source)
+        except OSError:
+            return None
+    return source.getbuffer().nbytes
+
+
+def extract_many(bank: str, sources: Iterable[Tuple[str, Union[str, BinaryIO]]], use_ocr: bool,
+                 workers: int = 1, page_range: Optional[Collection[int]] = None,
+                 dates: Optional[DateWindow] = None) -> Iterator[Tuple[str, Union[str, BinaryIO], str, Any]]:
+    """
+    `extract_rows_with_ocr` de vários arquivos [(nome, PDF)] em paralelo, em
+    `workers` threads (os extratores são seguros entre threads), devolvendo os
+    resultados na ordem de envio.
+
+    `sources` é consumido sob demanda (no máximo `2 x workers` adiante), então
+    pode ser um gerador de membros de ZIP. Um item cujo PDF é um
+    `ExtractionError` (membro que não pôde ser lido) volta como erro.
+
+    Yields:
+        (nome, PDF, 'ok', (linhas, usou OCR)) ou (nome, PDF, 'error', {code, message});
+        sem vaga no OCR, o erro tem code 'ocr_busy'.
+    """
+    app = current_app._get_current_object()
+    # As threads do pool não herdam o trace da requisição (ContextVar)
+    request_trace = spans.current()
+
+    def job(item):
+        name, source = item
+        if isinstance(source, ExtractionError):
+            return 'error', source.to_dict()
+        with app.app_context(), spans.activate(request_trace, file=name), spans.span('file'):
+            if request_trace is not None:
+                spans.note_file(bank=bank, size=_size(source))
+            try:
+                rows, used_ocr = extract_rows_with_ocr(bank, source, use_ocr, page_range, dates)
+            except ExtractionError as exc:
+                spans.note_file(error=exc.code)
+                return 'error', exc.to_dict()
+            except OcrBusy:
+                spans.note_file(error='ocr_busy')
+                return 'error', {'code': 'ocr_busy', 'message': 'Fila de OCR cheia.'}
+            spans.note_file(rows=len(rows), ocr=used_ocr)
+            return 'ok', (rows, used_ocr)
+
+    for (name, source), (status, result) in ordered_map(job, sources, workers):
+        yield name, source, status, result
@@ -0,0 +1,39 @@
+"""Gravação opcional dos resultados no banco local (`COMMON/store.py`).
+
+Ativada quando `TRANSACTION_DB` aponta para um arquivo SQLite. Falhas na
+gravação nunca impedem a resposta da extração; apenas são registradas no log.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, BinaryIO, Dict, List, Optional, Union
+
+from flask import current_app
+
+from COMMON.store import TransactionStore, file_sha256
+
+_stores: Dict[str, TransactionStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store() -> Optional[TransactionStore]:
+    path = current_app.config.get('TRANSACTION_DB')
+    if not path:
+        return None
+    store = _stores.get(path)
+    if store is not None:
+        return store
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = TransactionStore(path)
+        return _stores[path]
+
+
+def persist_rows(filepath: Union[str, BinaryIO], filename: str, bank: str, rows: List[Dict[str, Any]], client: str = '') -> None:
+    store = get_store()
+    if store is None:
+        return
+    try:
+        store.save_file(file_sha256(filepath), rows, bank, client=client, filename=filename)
+    except Exception:
+        current_app.logger.exception('Falha ao gravar %s no banco local', filename)
@@ -0,0 +1,82 @@
+"""Modo sombra no app web: amostra de envios comparada em segundo plano.
+
+Com `SHADOW_CONFIG` apontando para o JSON de uma configuração candidata
+(`COMMON/shadow.py`), uma fração `SHADOW_SAMPLE` das requisições de extração
+tem os PDFs copiados para a memória antes da limpeza de `uploads/`. Depois
+que a resposta termina de ser enviada, cada PDF vai para a fila do modo
+sombra, que roda produção e candidata numa thread de fundo e grava a
+comparação em `SHADOW_LOG`. O usuário não vê nada disso: a fila é curta
+(`SHADOW_QUEUE`), descarta quando cheia e nenhum erro da candidata chega à
+resposta.
+"""
+from __future__ import annotations
+
+import random
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+from flask import after_this_request, current_app
+
+from COMMON.shadow import Candidate, ShadowLog, ShadowRunner
+from WEBAPP.file_uploads import ArchiveUploads
+
+_runners: Dict[int, Optional[ShadowRunner]] = {}
+
+
+def get_shadow() -> Optional[ShadowRunner]:
+    """Modo sombra do app atual, ou None sem `SHADOW_CONFIG` (ou com a candidata inválida)."""
+    key = id(current_app._get_current_object())
+    if key not in _runners:
+        config = current_app.config
+        runner = None
+        if config.get('SHADOW_CONFIG'):
+            try:
+                candidate = Candidate.load(config['SHADOW_CONFIG'])
+            except (OSError, ValueError) as exc:
+                current_app.logger.error('Modo sombra desativado: %s', exc)
+            else:
+                runner = ShadowRunner(candidate, ShadowLog(config['SHADOW_LOG']), config.get('SHADOW_QUEUE', 4))
+        _runners[key] = runner
+    return _runners[key]
+
+
+def _read(source: Union[str, BinaryIO]) -> bytes:
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            return f.read()
+    return source.getvalue()
+
+
+def shadow_uploads(bank: str, saved: List[Tuple[str, Union[str, BinaryIO]]],
+                   archives: Optional[ArchiveUploads] = None) -> None:
+    """
+    Sorteia a requisição e, se ela entra na amostra, agenda a comparação dos
+    arquivos para depois da resposta. Chamar antes de apagar os uploads.
+
+    Dos ZIPs (`archives`) só o arquivo compactado é copiado; os membros são
+    descompactados um a um depois da resposta, até a fila encher.
+    """
+    runner = get_shadow()
+    if runner is None or not runner.candidate.covers(bank) or not runner.has_room():
+        return
+    if random.random() >= current_app.config.get('SHADOW_SAMPLE', 0.0):
+        return
+    try:
+        jobs = [(name, _read(source)) for name, source in saved]
+        members = archives.detached() if archives else None
+    except OSError:
+        return
+
+    def _submit_all():
+        for name, data in jobs:
+            runner.submit(bank, name, data)
+        for name, source in members or ():
+            if isinstance(source, Exception):
+                continue
+            if not runner.submit(bank, name, source.getvalue()):
+                break
+
+    @after_this_request
+    def _schedule(response):
+        # call_on_close: roda quando o servidor termina de enviar (inclusive NDJSON)
+        response.call_on_close(_submit_all)
+        return response
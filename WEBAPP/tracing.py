@@ -0,0 +1,140 @@
+"""Log das requisições lentas do app web, com a linha do tempo de cada etapa.
+
+Toda requisição de `/process` grava os trechos da extração em memória
+(`COMMON/spans.py`): salvar o upload, abrir o PDF, texto, parse, cor e OCR
+por página, exclusão por nomes e o template. No fim, se ela levou mais que
+`TRACE_SLOW_SECONDS`, a linha do tempo vai para `TRACE_LOG` (JSONL), com
+tamanho, páginas, banco e SHA-256 de cada arquivo, para reproduzir o caso
+com o mesmo PDF. Requisições rápidas só custam os trechos em memória.
+
+Com `MEMORY_TRACE` ligado, cada trecho (e a requisição inteira) também mede
+pico de memória, memória retida e RSS (`COMMON/memory.py`); o resumo vai
+para o log do app a cada requisição e para `GET /api/v1/metrics`.
+"""
+from __future__ import annotations
+
+import functools
+import threading
+from typing import BinaryIO, Dict, Iterable, Optional, Tuple, Union
+
+from flask import current_app, request
+
+from COMMON.memory import MemoryTracker, format_breakdown
+from COMMON.store import file_sha256
+from COMMON.spans import Trace, TraceLog, activate, current, set_memory_tracker
+
+_logs: Dict[int, Optional['SlowRequestLog']] = {}
+_trackers: Dict[int, Optional[MemoryTracker]] = {}
+
+
+class SlowRequestLog:
+    """Grava no log os traces acima do limite e conta quantos foram gravados."""
+
+    def __init__(self, path: str, threshold: float):
+        self.log = TraceLog(path)
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.traced = 0
+        self.slow = 0
+
+    def is_slow(self, trace: Trace) -> bool:
+        return trace.elapsed >= self.threshold
+
+    def record(self, trace: Trace) -> bool:
+        slow = self.is_slow(trace)
+        with self._lock:
+            self.traced += 1
+            self.slow += slow
+        if slow:
+            try:
+                self.log.append(trace)
+            except OSError as exc:
+                current_app.logger.warning('Log de requisições lentas não gravado: %s', exc)
+        return slow
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {'threshold': self.threshold, 'traced': self.traced, 'slow': self.slow}
+
+
+def get_slow_log() -> Optional[SlowRequestLog]:
+    """Log do app atual, ou None com `TRACE_LOG` vazio."""
+    key = id(current_app._get_current_object())
+    if key not in _logs:
+        config = current_app.config
+        path = config.get('TRACE_LOG')
+        _logs[key] = SlowRequestLog(path, config.get('TRACE_SLOW_SECONDS', 10.0)) if path else None
+    return _logs[key]
+
+
+def get_memory_tracker() -> Optional[MemoryTracker]:
+    """Medição de memória do app atual (liga o tracemalloc na primeira chamada), ou None sem `MEMORY_TRACE`."""
+    key = id(current_app._get_current_object())
+    if key not in _trackers:
+        config = current_app.config
+        tracker = None
+        if config.get('MEMORY_TRACE'):
+            tracker = MemoryTracker(frames=config.get('MEMORY_TRACE_FRAMES', 1))
+            tracker.start()
+            set_memory_tracker(tracker)
+        _trackers[key] = tracker
+    return _trackers[key]
+
+
+def _log_memory(trace: Trace) -> None:
+    lines = format_breakdown(trace.attrs)
+    current_app.logger.info('Memória %s: %s', trace.name, '; '.join(lines[:2]))
+    for item in trace.attrs.get('mem_top', [])[:3]:
+        current_app.logger.info('Memória %s:   %d KB em %s', trace.name, item['kb'], item['site'])
+    for name, file, _, _, attrs in trace.spans:
+        if name == 'file' and 'mem_peak_kb' in attrs:
+            current_app.logger.info('Memória %s: %s', file, '; '.join(format_breakdown(attrs)[:2]))
+
+
+def traced(view):
+    """Mede a view com um trace da requisição e grava no log se ela foi lenta."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        slow_log = get_slow_log()
+        tracker = get_memory_tracker()
+        if slow_log is None and tracker is None:
+            return view(*args, **kwargs)
+        # O snapshot do tracemalloc fica fora da duração da requisição
+        window = tracker.enter('request') if tracker is not None else None
+        trace = Trace(request.path, bank=request.form.get('bank'), ocr=request.form.get('ocr') == '1',
+                      content_length=request.content_length)
+        status = 500
+        try:
+            with activate(trace):
+                response = view(*args, **kwargs)
+            status = getattr(response, 'status_code', 200)
+            return response
+        finally:
+            trace.finish()
+            trace.attrs['status'] = status
+            if window is not None:
+                trace.attrs.update(tracker.exit(window))
+                _log_memory(trace)
+            if slow_log is not None and slow_log.record(trace):
+                current_app.logger.warning('Requisição lenta %s: %.1fs (%s)', trace.name, trace.seconds,
+                                           ', '.join(f'{k} {v:.1f}s' for k, v in list(trace.stages().items())[:3]))
+    return wrapper
+
+
+def note_hashes(saved: Iterable[Tuple[str, Union[str, BinaryIO]]]) -> None:
+    """
+    Acrescenta o SHA-256 dos arquivos ao trace ativo, só se a requisição já
+    passou do limite (chamar antes de apagar os uploads). `saved` pode
+    incluir um `ArchiveUploads`: os membros são relidos um a um.
+    """
+    trace = current()
+    slow_log = get_slow_log()
+    if trace is None or slow_log is None or not slow_log.is_slow(trace):
+        return
+    for name, source in saved:
+        if isinstance(source, Exception):
+            continue
+        try:
+            trace.files.setdefault(name, {})['sha256'] = file_sha256(source)
+        except OSError:
+            continue